@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Finance import snapshots
+
+
+class Command(BaseCommand):
+    help = "Write a consistent snapshot of the database to DB_SNAPSHOT_DIR and prune old ones (schedule it with cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-compress', action='store_true', help="Keep SQLite snapshots uncompressed")
+        parser.add_argument('--keep', type=int, default=snapshots.DEFAULT_KEEP, help="Snapshots to keep")
+
+    def handle(self, *args, **options):
+        if options['keep'] < 1:
+            raise CommandError("--keep must be at least 1")
+        try:
+            path = snapshots.take(compress=not options['no_compress'])
+        except (NotImplementedError, RuntimeError) as e:
+            raise CommandError(str(e))
+        removed = snapshots.prune(options['keep'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {path} ({path.stat().st_size} bytes), removed {removed} old snapshots"
+        ))
@@ -0,0 +1,141 @@
+"""
+Database snapshots.
+
+take() writes a consistent copy of the default database into
+DB_SNAPSHOT_DIR without stopping the tills:
+
+- SQLite: the online backup API, from its own connection. In WAL mode the
+  copy reads one snapshot of the database while checkouts keep writing.
+- PostgreSQL: pg_dump (custom format), which reads from a single MVCC
+  snapshot and takes no locks that block inserts or updates.
+
+Snapshots are written under a temporary name and renamed when complete, so
+a reader never sees a partial file. current() reuses the newest snapshot
+while it is younger than DB_SNAPSHOT_MAX_AGE. Repeated and resumed (Range)
+downloads therefore get the same bytes rather than a new copy each time.
+`manage.py snapshot_db` takes one on a schedule (cron) and prunes old ones.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# Seconds a snapshot is served again before a download takes a new one
+DEFAULT_MAX_AGE = 5 * 60
+
+# Snapshots kept by prune()
+DEFAULT_KEEP = 7
+
+CONTENT_TYPES = {
+    '.sqlite3': 'application/x-sqlite3',
+    '.gz': 'application/gzip',
+    '.dump': 'application/octet-stream',
+}
+
+
+def snapshot_dir():
+    path = Path(getattr(settings, 'DB_SNAPSHOT_DIR', Path(settings.BASE_DIR) / 'snapshots'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def content_type(path):
+    return CONTENT_TYPES.get(Path(path).suffix, 'application/octet-stream')
+
+
+def snapshots():
+    """Finished snapshots, newest first"""
+    files = [path for path in snapshot_dir().glob('db-*') if not path.name.endswith('.part')]
+    return sorted(files, key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def current(compress=True):
+    """The newest snapshot if recent enough, else a new one"""
+    max_age = getattr(settings, 'DB_SNAPSHOT_MAX_AGE', DEFAULT_MAX_AGE)
+    for path in snapshots():
+        if path.name.endswith('.gz') != compress and connection.vendor == 'sqlite':
+            continue
+        if time.time() - path.stat().st_mtime < max_age:
+            return path
+        break
+    return take(compress)
+
+
+def take(compress=True):
+    """Write a snapshot of the default database and return its path"""
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S-%f')
+    if connection.vendor == 'sqlite':
+        name = f"db-{stamp}.sqlite3" + ('.gz' if compress else '')
+        writer = _sqlite_backup
+    elif connection.vendor == 'postgresql':
+        name = f"db-{stamp}.dump"
+        writer = _pg_dump
+    else:
+        raise NotImplementedError(f"Snapshots are not supported on {connection.vendor}")
+
+    path = snapshot_dir() / name
+    partial = path.with_name(path.name + '.part')
+    try:
+        writer(partial, compress)
+        os.replace(partial, path)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return path
+
+
+def prune(keep=DEFAULT_KEEP):
+    """Delete all but the ``keep`` newest snapshots; returns how many went"""
+    old = snapshots()[keep:]
+    for path in old:
+        path.unlink(missing_ok=True)
+    return len(old)
+
+
+def _sqlite_backup(target, compress):
+    source = sqlite3.connect(connection.settings_dict['NAME'], timeout=20, uri=True)
+    try:
+        if not compress:
+            _backup_to(source, target)
+            return
+        with tempfile.TemporaryDirectory(dir=snapshot_dir()) as scratch:
+            copy = Path(scratch) / 'db.sqlite3'
+            _backup_to(source, copy)
+            with open(copy, 'rb') as raw, gzip.open(target, 'wb', compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, 1024 * 1024)
+    finally:
+        source.close()
+
+
+def _backup_to(source, path):
+    # One step: the copy is read from a single snapshot, which in WAL mode does
+    # not hold up writers; stepping page by page would restart on every write
+    destination = sqlite3.connect(path)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+
+
+def _pg_dump(target, compress):
+    db = connection.settings_dict
+    command = ['pg_dump', '--format=custom', f"--compress={6 if compress else 0}", f"--file={target}"]
+    if db.get('HOST'):
+        command.append(f"--host={db['HOST']}")
+    if db.get('PORT'):
+        command.append(f"--port={db['PORT']}")
+    if db.get('USER'):
+        command.append(f"--username={db['USER']}")
+    command.append(db['NAME'])
+    env = {**os.environ, 'PGPASSWORD': db.get('PASSWORD') or ''}
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"pg_dump failed: {completed.stderr.strip()}")
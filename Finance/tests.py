@@ -1,3 +1,102 @@
-from django.test import TestCase
+import gzip
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+
+from authentication import store_cache
+from authentication.models import CustomUser, Store
+
+from . import snapshots
+
+# Tests run against a private in-memory cache, never the configured shared one
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@skipUnless(connection.vendor == 'sqlite', "Snapshots are read back with sqlite3")
+@override_settings(CACHES=TEST_CACHES)
+class DatabaseSnapshotTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        # Hand the hit/miss counts to the test cache, not to the exit-time flush
+        self.addCleanup(store_cache.flush_stats)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(DB_SNAPSHOT_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        Store.objects.create(name='Cafe', store_code='CAFE1', owner_name='Owner', business_type='cafe')
+        self.user = CustomUser.objects.create_user(email='admin@example.com', first_name='Ad', last_name='Min')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def make_super_admin(self):
+        self.user.is_super_admin = True
+        self.user.save()
+
+    def download(self, **headers):
+        response = self.client.get('/Finance/download_db', **headers)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_only_super_admins_download(self):
+        self.assertEqual(self.client.get('/Finance/download_db').status_code, 403)
+
+    def test_download_is_a_consistent_reused_snapshot(self):
+        self.make_super_admin()
+
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        copy = self.directory / 'copy.sqlite3'
+        copy.write_bytes(gzip.decompress(body))
+        with sqlite3.connect(copy) as db:
+            self.assertEqual(db.execute('SELECT name FROM stores').fetchall(), [('Cafe',)])
+
+        # A resumed download gets the same bytes
+        response, part = self.download(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(part, body[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(body)}')
+        self.assertEqual(self.download(HTTP_RANGE=f'bytes={len(body)}-')[0].status_code, 416)
+        self.assertEqual(len(snapshots.snapshots()), 1)
+
+        _, raw = self.download(QUERY_STRING='compress=0')
+        self.assertTrue(raw.startswith(b'SQLite format 3'))
+
+    def test_range_forms(self):
+        self.make_super_admin()
+        response, body = self.download()
+        etag = response['ETag']
+
+        response, tail = self.download(HTTP_RANGE='bytes=-5')
+        self.assertEqual((response.status_code, tail), (206, body[-5:]))
+        response, rest = self.download(HTTP_RANGE=f'bytes={len(body) - 3}-{len(body) + 100}')
+        self.assertEqual((response.status_code, rest), (206, body[-3:]))
+        self.assertEqual(response['Content-Length'], '3')
+
+        # A range against another snapshot, or one that cannot be parsed, gets the whole file
+        for headers in ({'HTTP_RANGE': 'bytes=0-9', 'HTTP_IF_RANGE': '"stale"'}, {'HTTP_RANGE': 'bytes=0-9,20-29'}):
+            response, whole = self.download(**headers)
+            self.assertEqual((response.status_code, whole), (200, body))
+        response, part = self.download(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, part), (206, body[:10]))
+
+    def test_old_snapshots_are_replaced(self):
+        self.make_super_admin()
+        self.download()
+        with override_settings(DB_SNAPSHOT_MAX_AGE=0):
+            self.download()
+        self.assertEqual(len(snapshots.snapshots()), 2)
+
+    def test_snapshot_command_prunes_old_snapshots(self):
+        for _ in range(3):
+            call_command('snapshot_db', keep=2, stdout=io.StringIO())
+        self.assertEqual(len(snapshots.snapshots()), 2)
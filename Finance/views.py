@@ -10,12 +10,25 @@ from itertools import chain
 from operator import attrgetter
 from django.template.loader import get_template
 from django.contrib.auth.decorators import login_required 
+from dashboard.exports import CHUNK_SIZE, csv_response
+
+
+LEDGER_COLUMNS = ['Date', 'Particulars', 'Amount', 'Bill Number', 'Other']
+
+
+def _ledger_csv(entries, filename):
+    """Stream Income/Expence rows as CSV"""
+    rows = entries.values_list('date', 'perticulers', 'amount', 'bill_number', 'other').iterator(chunk_size=CHUNK_SIZE)
+    return csv_response(filename, LEDGER_COLUMNS, rows)
 
 
 @login_required(login_url="SignIn")
 def income(request):
     income = Income.objects.all().order_by("-id")
 
+    if request.GET.get('export') == 'csv':
+        return _ledger_csv(income, "income.csv")
+
     context = {
         "income":income
     }
@@ -62,6 +75,8 @@ def delete_income(request,pk):
 @login_required(login_url="SignIn")
 def expence(request):
     ex = Expence.objects.all().order_by("-id")
+    if request.GET.get('export') == 'csv':
+        return _ledger_csv(ex, "expense.csv")
     context = {
         "expence":ex
     }
@@ -192,9 +207,16 @@ from django.template.loader import render_to_string
 from xhtml2pdf import pisa
 from django.http import HttpResponse
 from io import BytesIO
-import pandas as pd
-from openpyxl.styles import Border, Side
 from django.db.models import Sum
+from dashboard.exports import ExcelExport
+
+def _ledger_excel(entries, title, filename):
+    """Stream Income/Expence rows as an Excel sheet"""
+    export = ExcelExport(title)
+    export.header(['Date', 'Particulars', 'Amount', 'Other'])
+    export.rows(entries.order_by('date', 'id').values_list('date', 'perticulers', 'amount', 'other').iterator(chunk_size=CHUNK_SIZE))
+    return export.response(filename)
+
 
 def expence_report_excel(request):
     if request.method == "POST":
@@ -205,23 +227,7 @@ def expence_report_excel(request):
         # Filter expenses based on the date range
         expenses = Expence.objects.filter(date__range=[start_date, end_date])
 
-        # Convert expenses to a Pandas DataFrame
-        data = {
-            'Date': [exp.date for exp in expenses],
-            'Particulars': [exp.perticulers for exp in expenses],
-            'Amount': [exp.amount for exp in expenses],
-            'Other': [exp.other for exp in expenses],
-        }
-        df = pd.DataFrame(data)
-
-        # Create an HttpResponse object with Excel content type
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="expense_report_{start_date}_to_{end_date}.xlsx"'
-
-        # Write the DataFrame to an Excel file
-        df.to_excel(response, index=False, engine='openpyxl')
-
-        return response
+        return _ledger_excel(expenses, "Expenses", f"expense_report_{start_date}_to_{end_date}.xlsx")
 
 
 def expence_report_pdf(request):
@@ -271,26 +277,10 @@ def income_report_excel(request):
         start_date = request.POST['sdate']
         end_date = request.POST['edate']
 
-        # Filter expenses based on the date range
-        expenses = Income.objects.filter(date__range=[start_date, end_date])
-        
-        # Convert expenses to a Pandas DataFrame
-        data = {
-            'Date': [exp.date for exp in expenses],
-            'Particulars': [exp.perticulers for exp in expenses],
-            'Amount': [exp.amount for exp in expenses],
-            'Other': [exp.other for exp in expenses],
-        }
-        df = pd.DataFrame(data)
-
-        # Create an HttpResponse object with Excel content type
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="Income_report_{start_date}_to_{end_date}.xlsx"'
-
-        # Write the DataFrame to an Excel file
-        df.to_excel(response, index=False, engine='openpyxl')
+        # Filter income based on the date range
+        income = Income.objects.filter(date__range=[start_date, end_date])
 
-        return response
+        return _ledger_excel(income, "Income", f"Income_report_{start_date}_to_{end_date}.xlsx")
 
 
 def income_report_pdf(request):
@@ -336,22 +326,67 @@ def income_report_pdf(request):
 
 
 
-from django.http import HttpResponse, Http404
-import os
-from django.conf import settings
-
-def download_db(request):
-    # Path to your SQLite database file
-    db_path = os.path.join(settings.BASE_DIR, 'db.sqlite3')
-    
-    # Check if the file exists
-    if os.path.exists(db_path):
-        with open(db_path, 'rb') as db_file:
-            response = HttpResponse(db_file.read(), content_type='application/x-sqlite3')
-            response['Content-Disposition'] = 'attachment; filename="db.sqlite3"'
+import re
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
+from . import snapshots
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _read_range(path, start, length, block_size=64 * 1024):
+    with open(path, 'rb') as snapshot:
+        snapshot.seek(start)
+        while length > 0:
+            block = snapshot.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _ranged_file_response(request, path, content_type):
+    """
+    The file as an attachment, or the single byte range asked for with a
+    Range header (206), so interrupted downloads can resume
+    """
+    stat = path.stat()
+    etag = f'"{path.name}-{stat.st_size}"'
+    match = _RANGE_RE.match(request.headers.get('Range', ''))
+    if match and request.headers.get('If-Range', etag) == etag and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(int(last), stat.st_size - 1) if last else stat.st_size - 1
+        else:
+            start, end = max(stat.st_size - int(last), 0), stat.st_size - 1
+        if start > end or start >= stat.st_size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
             return response
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = f'attachment; filename="{path.name}"'
     else:
-        raise Http404("Database not found.")
+        response = FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name, content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+@login_required(login_url="SignIn")
+def download_db(request):
+    """
+    A consistent snapshot of the whole database (every store), for super
+    admins. Recent snapshots are reused; ?compress=0 asks for an uncompressed
+    SQLite file.
+    """
+    if not (request.user.is_superuser or request.user.is_super_admin):
+        raise PermissionDenied
+    path = snapshots.current(compress=request.GET.get('compress') != '0')
+    return _ranged_file_response(request, path, snapshots.content_type(path))
 
 
 
@@ -0,0 +1,39 @@
+"""
+Authentication backend for the dashboard web UI.
+
+Every page behind login_required resolves the session's user, which
+ModelBackend reads from the database on each request. CachedModelBackend
+serves it from the shared cache for ``SESSION_USER_TTL`` seconds instead.
+Saving or deleting a user drops the cached row (see signals.py), so password
+changes, which also end the user's sessions, and deactivation apply at once.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from . import store_cache
+
+CACHE_PREFIX = 'session_user'
+
+# Seconds a session's user is served from the cache
+DEFAULT_TTL = 300
+
+
+def _cache_key(user_id):
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def invalidate(user_ids):
+    """Drop the cached users with these ids"""
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    store_cache.delete_on_commit(keys)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user() reads through the shared cache"""
+
+    def get_user(self, user_id):
+        return store_cache.fetch(
+            'session_user', _cache_key(user_id),
+            lambda: super(CachedModelBackend, self).get_user(user_id),
+            getattr(settings, 'SESSION_USER_TTL', DEFAULT_TTL),
+        )
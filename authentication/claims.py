@@ -0,0 +1,137 @@
+"""
+Store claims in JWTs.
+
+Sign-in stamps the user's membership into the token: store id and code, role,
+permissions, the membership id, an auth version and, for staff, the moment
+their store's subscription or license runs out. Store.auth_version and
+StoreUser.auth_version are bumped whenever status, role, permissions,
+subscription or license change (see signals.py), which makes every token
+issued before the change fail authentication.
+
+StoreClaimsAuthentication is opted into per view. With ``STORE_CLAIMS_AUTH``
+on, safe requests are authenticated as a ClaimsUser built from the token and
+request.store_ctx is built from the claims, so permission checks need no user
+or membership rows; the only lookup is the cached auth version.
+"""
+import time
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from . import store_cache
+
+MEMBERSHIP_CLAIM = 'membership_id'
+AUTH_VERSION_CLAIM = 'auth_version'
+ACCESS_UNTIL_CLAIM = 'access_until'
+
+CACHE_PREFIX = 'auth_version'
+
+# Seconds a membership's current auth version is served from the cache
+DEFAULT_TTL = 300
+
+
+def _cache_key(membership_id):
+    return f'{CACHE_PREFIX}:{membership_id}'
+
+
+def _stamp(store_version, membership_version):
+    return f'{store_version}.{membership_version}'
+
+
+def _access_until(store_user):
+    """Epoch seconds after which staff may no longer log in; None for owners"""
+    if store_user.role == 'store_owner':
+        return None
+    store = store_user.store
+    license = store.license_key
+    if store.subscription_expires_at is None or license is None or not license.is_active:
+        return 0
+    return int(min(store.subscription_expires_at, license.expires_at).timestamp())
+
+
+def add_store_claims(token, store_user):
+    """Stamp a membership into a token at sign-in"""
+    store = store_user.store
+    token['store_code'] = store.store_code
+    token['store_id'] = str(store.id)
+    token['role'] = store_user.role
+    token['permissions'] = store_user.permissions
+    token[MEMBERSHIP_CLAIM] = str(store_user.id)
+    token[AUTH_VERSION_CLAIM] = _stamp(store.auth_version, store_user.auth_version)
+    token[ACCESS_UNTIL_CLAIM] = _access_until(store_user)
+
+
+def current_auth_version(membership_id):
+    """The stamp a valid token for this membership carries; None if it is gone"""
+    from .models import StoreUser
+
+    def load():
+        versions = (
+            StoreUser.objects.filter(pk=membership_id, is_active=True, store__is_active=True)
+            .values_list('store__auth_version', 'auth_version')
+            .first()
+        )
+        return _stamp(*versions) if versions else None
+
+    return store_cache.fetch(
+        'auth_version', _cache_key(membership_id), load,
+        getattr(settings, 'STORE_CLAIMS_VERSION_TTL', DEFAULT_TTL),
+    )
+
+
+def invalidate(membership_ids):
+    """Forget the cached auth versions of the given memberships"""
+    keys = [_cache_key(membership_id) for membership_id in set(membership_ids)]
+    store_cache.delete_on_commit(keys)
+
+
+def can_access_until(access_until, role):
+    """Store.can_user_login() answered from the access_until claim"""
+    if role == 'store_owner' or access_until is None:
+        return True
+    return time.time() < access_until
+
+
+class ClaimsUser(TokenUser):
+    """Stateless user backed by a token carrying store claims"""
+
+    is_super_admin = False
+
+    def __str__(self):
+        return f"ClaimsUser {self.id}"
+
+
+class StoreClaimsAuthentication(JWTAuthentication):
+    """
+    JWT authentication that checks the token's auth version and, in
+    STORE_CLAIMS_AUTH mode, trusts its store claims on safe methods.
+
+    Tokens without store claims (issued before auth versions existed, or to
+    users without a membership) authenticate as with JWTAuthentication.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        membership_id = validated_token.get(MEMBERSHIP_CLAIM)
+        if membership_id is None:
+            return self.get_user(validated_token), validated_token
+
+        if validated_token.get(AUTH_VERSION_CLAIM) != current_auth_version(membership_id):
+            raise AuthenticationFailed(
+                'Store access changed since this token was issued', code='token_not_valid'
+            )
+
+        if getattr(settings, 'STORE_CLAIMS_AUTH', False) and request.method in SAFE_METHODS:
+            return ClaimsUser(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
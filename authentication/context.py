@@ -0,0 +1,232 @@
+"""
+Store context for a request.
+
+StoreMiddleware attaches ``request.store_ctx``, resolved on first access (by
+then DRF has authenticated the request): the user's active store memberships,
+the membership the request acts as, the user's branch assignments and the POS
+device named by the X-Device-Code header.
+Permissions, serializers and views read from it instead of querying
+store_memberships themselves.
+
+The membership and branch rows are cached per user for ``STORE_CONTEXT_TTL``
+seconds. Saving or deleting a store, membership, branch or branch assignment
+drops the cached rows of every user involved (see signals.py).
+"""
+import uuid
+from functools import cached_property
+
+from django.conf import settings
+
+from . import claims as store_claims
+from . import store_cache
+
+CACHE_PREFIX = 'store_ctx'
+
+# Seconds a user's memberships are served from the cache
+DEFAULT_TTL = 300
+
+
+def _cache_key(user_id):
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def invalidate(user_ids):
+    """Drop the cached memberships of the given users"""
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    store_cache.delete_on_commit(keys)
+
+
+class StoreContext:
+    """
+    A user's stores and the one the current request acts on.
+
+    The current membership is picked by store code (X-Store-Code header or
+    subdomain), then by the ``store_id`` claim of the JWT, then the user's
+    earliest membership.
+    """
+
+    def __init__(self, user, memberships=(), branch_assignments=(), store_code=None, store_id=None, device_code=None):
+        self.user = user
+        self.memberships = list(memberships)
+        self.branch_assignments = list(branch_assignments)
+        self.store_ids = [membership.store_id for membership in self.memberships]
+        self.device_code = device_code
+        # The token, when the context was built from its store claims
+        self.claims = None
+        self._permission_masks = {}
+
+        self.membership = None
+        if store_code:
+            self.membership = self.membership_for(store_code=store_code)
+        if self.membership is None and store_id:
+            self.membership = self.membership_for(store_id=store_id)
+        if self.membership is None and self.memberships:
+            self.membership = self.memberships[0]
+
+    @property
+    def store(self):
+        return self.membership.store if self.membership is not None else None
+
+    @property
+    def role(self):
+        return self.membership.role if self.membership is not None else None
+
+    @property
+    def branch_ids(self):
+        return [assignment.branch_id for assignment in self.branch_assignments]
+
+    def membership_for(self, store_code=None, store_id=None):
+        """The user's active membership of the given store, or None"""
+        for membership in self.memberships:
+            if store_code is not None and membership.store.store_code == store_code:
+                return membership
+            if store_id is not None and str(membership.store_id) == str(store_id):
+                return membership
+        return None
+
+    def get_membership(self, store_id=None, roles=None, active_store=False):
+        """
+        Cached stand-in for ``StoreUser.objects.get(user=..., is_active=True, ...)``.
+
+        Without a store the current membership is preferred; ``active_store``
+        skips memberships of deactivated stores. Raises StoreUser.DoesNotExist
+        when no membership matches.
+        """
+        from .models import StoreUser
+
+        if store_id is not None:
+            candidates = [m for m in self.memberships if str(m.store_id) == str(store_id)]
+        else:
+            candidates = sorted(self.memberships, key=lambda m: m is not self.membership)
+        if roles is not None:
+            candidates = [m for m in candidates if m.role in roles]
+        if active_store:
+            candidates = [m for m in candidates if m.store.is_active]
+        if not candidates:
+            raise StoreUser.DoesNotExist('No matching store membership')
+        return candidates[0]
+
+    def can_login(self, membership):
+        """Store.can_user_login() for one of these memberships"""
+        if self.claims is not None:
+            return store_claims.can_access_until(
+                self.claims.get(store_claims.ACCESS_UNTIL_CLAIM), membership.role
+            )
+        return membership.store.can_user_login(membership.role)
+
+    def permission_mask(self, membership):
+        """Compiled permission bitmask of one of these memberships"""
+        mask = self._permission_masks.get(membership.pk)
+        if mask is None:
+            from .permissions import permission_mask
+
+            # Claims contexts lack branch assignments, so their masks are not shared
+            mask = permission_mask(membership, self.branch_assignments, cached=self.claims is None)
+            self._permission_masks[membership.pk] = mask
+        return mask
+
+    @cached_property
+    def device(self):
+        """The current store's active POS device named by X-Device-Code, or None"""
+        from .models import POSDevice
+
+        if not self.device_code or self.store is None:
+            return None
+        return (
+            POSDevice.objects.select_related('branch')
+            .filter(branch__store_id=self.store.id, device_code=self.device_code.upper(), is_active=True)
+            .first()
+        )
+
+    def order_attribution(self):
+        """
+        (branch, pos_device) to stamp on orders taken in this context: the
+        device's branch, else the user's only branch of the current store,
+        else neither
+        """
+        if self.device is not None:
+            return self.device.branch, self.device
+        branches = [
+            assignment.branch for assignment in self.branch_assignments
+            if self.store is not None and assignment.branch.store_id == self.store.id
+        ]
+        if len(branches) == 1:
+            return branches[0], None
+        return None, None
+
+    def has_store(self, store_id):
+        return self.membership_for(store_id=store_id) is not None
+
+    def branch_assignment(self, branch_id):
+        """The user's active assignment to the given branch, or None"""
+        for assignment in self.branch_assignments:
+            if str(assignment.branch_id) == str(branch_id):
+                return assignment
+        return None
+
+
+def _load_rows(user):
+    from .models import BranchUser, StoreUser
+
+    def load():
+        memberships = list(
+            StoreUser.objects.filter(user=user, is_active=True)
+            .select_related('store', 'store__license_key')
+            .order_by('assigned_at')
+        )
+        branch_assignments = list(
+            BranchUser.objects.filter(user=user, is_active=True).select_related('branch')
+        )
+        return (memberships, branch_assignments)
+
+    memberships, branch_assignments = store_cache.fetch(
+        'store_context', _cache_key(user.pk), load, getattr(settings, 'STORE_CONTEXT_TTL', DEFAULT_TTL)
+    )
+    for row in memberships + branch_assignments:
+        row.user = user
+    return memberships, branch_assignments
+
+
+def for_user(user, store_code=None, store_id=None, device_code=None):
+    """Build the StoreContext of ``user``; anonymous users get an empty one"""
+    if user is None or not user.is_authenticated:
+        return StoreContext(user)
+    memberships, branch_assignments = _load_rows(user)
+    return StoreContext(
+        user, memberships, branch_assignments,
+        store_code=store_code, store_id=store_id, device_code=device_code,
+    )
+
+
+def from_claims(user, token):
+    """
+    Build a StoreContext from a token's store claims, without queries.
+
+    The membership and store are unsaved instances carrying only what the
+    token holds (ids, store code, role, permissions); branch assignments are
+    not in the token and come out empty.
+    """
+    from .models import Store, StoreUser
+
+    store = Store(id=uuid.UUID(token['store_id']), store_code=token['store_code'], is_active=True)
+    membership = StoreUser(
+        id=uuid.UUID(token[store_claims.MEMBERSHIP_CLAIM]),
+        store=store,
+        user_id=user.id,
+        role=token['role'],
+        permissions=token.get('permissions') or [],
+        is_active=True,
+    )
+    ctx = StoreContext(user, [membership])
+    ctx.claims = token
+    return ctx
+
+
+def resolve(request, store_code=None, device_code=None):
+    """Build the StoreContext of an authenticated request"""
+    user = getattr(request, 'user', None)
+    token = getattr(request, 'auth', None)
+    if isinstance(user, store_claims.ClaimsUser):
+        return from_claims(user, token)
+    store_id = token.get('store_id') if hasattr(token, 'get') else None
+    return for_user(user, store_code=store_code, store_id=store_id, device_code=device_code)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication import store_cache
+
+
+class Command(BaseCommand):
+    help = "Print cache hits and misses per kind of entry, summed over all workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing them")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backend: {settings.CACHES['default']['BACKEND']}")
+        stats = store_cache.stats()
+        if not stats:
+            self.stdout.write("No cache lookups recorded")
+        for kind, counts in stats.items():
+            hit_rate = f"{counts['hit_rate'] * 100:.1f}%" if counts['hit_rate'] is not None else '-'
+            self.stdout.write(f"{kind:<20} hits {counts['hits']:>8}  misses {counts['misses']:>8}  hit rate {hit_rate}")
+        if options['reset']:
+            store_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
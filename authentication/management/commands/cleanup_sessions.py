@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired web sessions from the database in small batches, so tills and "
+        "checkouts are not held up behind one long delete (run it from cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help="Sessions deleted per transaction")
+        parser.add_argument('--pause', type=float, default=0.05, help="Seconds to wait between batches")
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError("--batch must be at least 1")
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write("Sessions are kept in signed cookies; deleting rows left from an earlier engine")
+
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch']])
+            if not keys:
+                break
+            with transaction.atomic():
+                count, _ = Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()
+            deleted += count
+            if len(keys) < options['batch']:
+                break
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions, {Session.objects.count()} remain"))
@@ -1,5 +1,8 @@
 # =============== MIDDLEWARE FOR STORE CONTEXT ===============
-from .models import Store
+from django.utils.functional import SimpleLazyObject
+
+from . import context
+
 
 class StoreMiddleware:
     """Middleware to set current store context"""
@@ -15,14 +18,11 @@ class StoreMiddleware:
             if '.' in host:
                 store_code = host.split('.')[0]
         
-        if store_code:
-            try:
-                store = Store.objects.get(store_code=store_code, is_active=True)
-                request.current_store = store
-            except Store.DoesNotExist:
-                request.current_store = None
-        else:
-            request.current_store = None
+        # POS terminals name themselves so orders can be attributed to them
+        device_code = request.META.get('HTTP_X_DEVICE_CODE')
+        
+        # Resolved on first use, after DRF has authenticated the request
+        request.store_ctx = SimpleLazyObject(lambda: context.resolve(request, store_code, device_code))
             
         response = self.get_response(request)
         return response
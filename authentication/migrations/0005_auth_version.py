@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_remove_customuser_username'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='auth_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='storeuser',
+            name='auth_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -3,7 +3,8 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.utils import timezone
 import uuid
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
 class CustomUserManager(BaseUserManager):
@@ -111,6 +112,8 @@ class Store(TimeStampedModel):
     business_hours = models.JSONField(default=dict)
     
     is_active = models.BooleanField(default=True)
+    # Bumped when status, subscription or license change; stamped into tokens
+    auth_version = models.PositiveIntegerField(default=1)
     
     class Meta:
         db_table = 'stores'
@@ -130,6 +133,42 @@ class Store(TimeStampedModel):
             return False
         return timezone.now() < self.subscription_expires_at
     
+    @property
+    def tzinfo(self):
+        """Store timezone, falling back to UTC for unknown zone names"""
+        try:
+            return ZoneInfo(self.timezone or 'UTC')
+        except (ZoneInfoNotFoundError, ValueError):
+            return ZoneInfo('UTC')
+    
+    def local_now(self):
+        """Current time in the store's timezone"""
+        return timezone.localtime(timezone.now(), self.tzinfo)
+    
+    def business_date(self, when=None):
+        """Business day (store local date) for the given moment, default now"""
+        if when is None:
+            return self.local_now().date()
+        return timezone.localtime(when, self.tzinfo).date()
+    
+    def day_range(self, start_date, end_date=None):
+        """
+        Half-open [start, end) datetimes covering the store-local days from
+        start_date through end_date (default: just start_date)
+        """
+        end_date = end_date or start_date
+        start = datetime.combine(start_date, time.min, tzinfo=self.tzinfo)
+        end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=self.tzinfo)
+        return start, end
+    
+    def date_lookups(self, field, start_date, end_date=None):
+        """
+        Filter kwargs selecting ``field`` within store-local days, as a range
+        on the raw column so its index can be used (``__date`` casts each row)
+        """
+        start, end = self.day_range(start_date, end_date)
+        return {f'{field}__gte': start, f'{field}__lt': end}
+    
     @property
     def is_license_valid(self):
         if not self.license_key:
@@ -238,6 +277,8 @@ class StoreUser(TimeStampedModel):
     is_active = models.BooleanField(default=True)
     assigned_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='assigned_users')
     assigned_at = models.DateTimeField(auto_now_add=True)
+    # Bumped when role, permissions or status change; stamped into tokens
+    auth_version = models.PositiveIntegerField(default=1)
     
     class Meta:
         db_table = 'store_users'
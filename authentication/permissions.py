@@ -1,7 +1,21 @@
+import functools
+import uuid
+
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
-from .models import Store, StoreUser, BranchUser
+
+from . import store_cache
+
+
+def _active_membership(request, store_code):
+    """The user's active membership of an active store with this code, or None"""
+    store_user = request.store_ctx.membership_for(store_code=store_code)
+    if store_user is None or not store_user.store.is_active:
+        return None
+    return store_user
 
 class IsStoreOwnerOrManager(permissions.BasePermission):
     """
@@ -15,16 +29,10 @@ class IsStoreOwnerOrManager(permissions.BasePermission):
         if not store_code:
             return False
         
-        try:
-            store = Store.objects.get(store_code=store_code, is_active=True)
-            store_user = StoreUser.objects.get(
-                store=store, 
-                user=request.user, 
-                is_active=True
-            )
-            return store_user.role in ['store_owner', 'store_manager']
-        except (Store.DoesNotExist, StoreUser.DoesNotExist):
+        store_user = _active_membership(request, store_code)
+        if store_user is None:
             return False
+        return store_user.role in ['store_owner', 'store_manager']
 
 class IsStoreOwner(permissions.BasePermission):
     """
@@ -33,23 +41,17 @@ class IsStoreOwner(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        if request.user.store_memberships.first().role == "store_owner":
+        if request.store_ctx.role == "store_owner":
             return True
         
         store_code = getattr(request, 'store_code', None) or request.data.get('store_code')
         if not store_code:
             return False
         
-        try:
-            store = Store.objects.get(store_code=store_code, is_active=True)
-            store_user = StoreUser.objects.get(
-                store=store, 
-                user=request.user, 
-                is_active=True
-            )
-            return store_user.role == 'store_owner'
-        except (Store.DoesNotExist, StoreUser.DoesNotExist):
+        store_user = _active_membership(request, store_code)
+        if store_user is None:
             return False
+        return store_user.role == 'store_owner'
 
 class HasStoreAccess(permissions.BasePermission):
     """
@@ -67,26 +69,21 @@ class HasStoreAccess(permissions.BasePermission):
         if not store_code:
             return False
         
-        try:
-            store = Store.objects.get(store_code=store_code, is_active=True)
-            store_user = StoreUser.objects.get(
-                store=store, 
-                user=request.user, 
-                is_active=True
-            )
-            
-            # Check if user can login based on subscription/license
-            if not store.can_user_login(store_user.role):
-                if store_user.role != 'store_owner':
-                    raise PermissionDenied('Store subscription or license has expired. Only store owner can access.')
-            
-            # Store the store and store_user in request for later use
-            request.store = store
-            request.store_user = store_user
-            
-            return True
-        except (Store.DoesNotExist, StoreUser.DoesNotExist):
+        store_user = _active_membership(request, store_code)
+        if store_user is None:
             return False
+        store = store_user.store
+        
+        # Check if user can login based on subscription/license
+        if not request.store_ctx.can_login(store_user):
+            if store_user.role != 'store_owner':
+                raise PermissionDenied('Store subscription or license has expired. Only store owner can access.')
+        
+        # Store the store and store_user in request for later use
+        request.store = store
+        request.store_user = store_user
+        
+        return True
 
 class HasBranchAccess(permissions.BasePermission):
     """
@@ -104,24 +101,22 @@ class HasBranchAccess(permissions.BasePermission):
         if not branch_id:
             return True  # If no specific branch, store access is enough
         
-        try:
-            branch_user = BranchUser.objects.get(
-                branch_id=branch_id,
-                user=request.user,
-                is_active=True
-            )
+        branch_user = request.store_ctx.branch_assignment(branch_id)
+        if branch_user is not None:
             request.branch_user = branch_user
             return True
-        except BranchUser.DoesNotExist:
-            # Check if user is store owner/manager (they have access to all branches)
-            return request.store_user.role in ['store_owner', 'store_manager']
+        # Check if user is store owner/manager (they have access to all branches)
+        return request.store_user.role in ['store_owner', 'store_manager']
 
 class HasPermission(permissions.BasePermission):
     """
     Permission to check specific permissions
     """
-    def __init__(self, required_permission):
-        self.required_permission = required_permission
+    required_permission = None
+
+    def __init__(self, required_permission=None):
+        if required_permission is not None:
+            self.required_permission = required_permission
     
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
@@ -135,17 +130,16 @@ class HasPermission(permissions.BasePermission):
         if not hasattr(request, 'store_user'):
             return False
         
-        store_user = request.store_user
-        
-        # Store owner has all permissions
-        if store_user.role == 'store_owner':
-            return True
-        
-        # Check if permission is in user's permission list
-        return (
-            'all' in store_user.permissions or 
-            self.required_permission in store_user.permissions
-        )
+        # One AND against the membership's compiled mask
+        mask = request.store_ctx.permission_mask(request.store_user)
+        return mask == ALL_PERMISSIONS or bool(mask & permission_bit(self.required_permission))
+
+@functools.lru_cache(maxsize=None)
+def permission_class(permission_name):
+    """HasPermission subclass bound to one permission, built once per name"""
+    return type(f'HasPermission_{permission_name}', (HasPermission,), {
+        'required_permission': permission_name,
+    })
 
 def require_permission(permission_name):
     """
@@ -153,8 +147,8 @@ def require_permission(permission_name):
     """
     def decorator(view_class):
         original_permission_classes = getattr(view_class, 'permission_classes', [])
-        view_class.permission_classes = original_permission_classes + [
-            lambda: HasPermission(permission_name)
+        view_class.permission_classes = list(original_permission_classes) + [
+            permission_class(permission_name)
         ]
         return view_class
     return decorator
@@ -237,3 +231,121 @@ DEFAULT_PERMISSIONS = {
     ],
 }
 
+# =============== COMPILED PERMISSION MASKS ===============
+#
+# Every permission codename gets a bit: the Permissions constants first, in
+# declaration order, then any extra active Permission rows by codename. A
+# membership's mask merges its role defaults (DEFAULT_PERMISSIONS plus
+# RolePermission rows), StoreUser.permissions and the permissions of the
+# user's branch assignments in that store. 'all' and store owners get every
+# bit. Masks are cached per membership; editing Permission or RolePermission
+# rows bumps the matrix version, which retires every cached mask and bit table.
+
+ALL_PERMISSIONS = -1  # every bit set, including permissions added later
+
+MATRIX_VERSION_KEY = 'perm_matrix_version'
+
+# Seconds compiled masks are cached
+MASK_TTL = 300
+
+_bit_tables = {}
+
+
+def _matrix_version():
+    version = cache.get(MATRIX_VERSION_KEY)
+    if version is None:
+        cache.add(MATRIX_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(MATRIX_VERSION_KEY)
+    return version
+
+
+def invalidate_permission_matrix():
+    """Retire all bit tables and masks once the Permission/RolePermission edit commits"""
+    version = uuid.uuid4().hex
+    transaction.on_commit(lambda: cache.set(MATRIX_VERSION_KEY, version, None))
+
+
+def _mask_key(version, membership_id):
+    return f'perm_mask:{version}:{membership_id}'
+
+
+def invalidate_permission_masks(membership_ids):
+    """Drop the cached masks of the given memberships"""
+    version = _matrix_version()
+    store_cache.delete_on_commit(_mask_key(version, membership_id) for membership_id in set(membership_ids))
+
+
+def _bits(version):
+    """{codename: bit} for the given matrix version"""
+    table = _bit_tables.get(version)
+    if table is None:
+        from .models import Permission
+
+        codenames = [
+            value for name, value in vars(Permissions).items()
+            if not name.startswith('_') and isinstance(value, str)
+        ]
+        declared = set(codenames)
+        codenames += sorted(
+            codename
+            for codename in Permission.objects.filter(is_active=True).values_list('codename', flat=True)
+            if codename not in declared
+        )
+        table = {codename: 1 << index for index, codename in enumerate(codenames)}
+        _bit_tables.clear()
+        _bit_tables[version] = table
+    return table
+
+
+def permission_bit(permission_name):
+    """The bit of one permission; 0 for unknown names"""
+    return _bits(_matrix_version()).get(permission_name, 0)
+
+
+def _names_mask(names, bits):
+    if not names:
+        return 0
+    if 'all' in names:
+        return ALL_PERMISSIONS
+    mask = 0
+    for name in names:
+        mask |= bits.get(name, 0)
+    return mask
+
+
+def _role_mask(role, version, bits):
+    def compile_role():
+        from .models import RolePermission
+
+        return _names_mask(DEFAULT_PERMISSIONS.get(role, []), bits) | _names_mask(
+            RolePermission.objects.filter(role=role, permission__is_active=True)
+            .values_list('permission__codename', flat=True),
+            bits,
+        )
+
+    return store_cache.fetch('permission_role', f'perm_role:{version}:{role}', compile_role, MASK_TTL)
+
+
+def compile_permission_mask(store_user, branch_assignments=()):
+    """Merge every permission source of one membership into a bitmask"""
+    if store_user.role == 'store_owner':
+        return ALL_PERMISSIONS
+
+    version = _matrix_version()
+    bits = _bits(version)
+    mask = _role_mask(store_user.role, version, bits) | _names_mask(store_user.permissions, bits)
+    for assignment in branch_assignments:
+        if assignment.branch.store_id == store_user.store_id:
+            mask |= _names_mask(assignment.permissions, bits)
+    return mask
+
+
+def permission_mask(store_user, branch_assignments=(), cached=True):
+    """The membership's mask, from the cache when ``cached``"""
+    if not cached:
+        return compile_permission_mask(store_user, branch_assignments)
+
+    return store_cache.fetch(
+        'permission_mask', _mask_key(_matrix_version(), store_user.pk),
+        lambda: compile_permission_mask(store_user, branch_assignments), MASK_TTL,
+    )
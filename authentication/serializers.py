@@ -399,10 +399,7 @@ class StoreUserCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and value == 'store_owner':
             try:
-                current_store_user = StoreUser.objects.get(
-                    user=request.user,
-                    is_active=True
-                )
+                current_store_user = request.store_ctx.get_membership()
                 if current_store_user.role != 'store_owner':
                     raise serializers.ValidationError('Only store owners can create other store owners')
             except StoreUser.DoesNotExist:
@@ -505,11 +502,7 @@ class LicenseActivationSerializer(serializers.Serializer):
             request = self.context.get('request')
             if request:
                 try:
-                    store_user = StoreUser.objects.get(
-                        user=request.user,
-                        role='store_owner',
-                        is_active=True
-                    )
+                    store_user = request.store_ctx.get_membership(roles=['store_owner'])
                     store = store_user.store
                     attrs['store_code'] = store.store_code
                 except StoreUser.DoesNotExist:
@@ -0,0 +1,111 @@
+# Signals to keep cached store contexts, token auth versions, permission masks, session users and store cache namespaces current
+from .models import CustomUser, License, Store, Branch, StoreUser, BranchUser, Permission, RolePermission
+from . import backends, claims, context, store_cache
+from .permissions import invalidate_permission_masks, invalidate_permission_matrix
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+# Fields whose change invalidates tokens issued before it
+AUTH_FIELDS = {
+    Store: ('is_active', 'status', 'subscription_expires_at', 'license_key_id'),
+    StoreUser: ('role', 'permissions', 'is_active', 'store_id'),
+}
+
+
+def _store_member_ids(store_ids):
+    return StoreUser.objects.filter(store_id__in=store_ids).values_list('id', 'user_id')
+
+
+def _bump_stores(store_ids):
+    """Invalidate every token issued for these stores"""
+    Store.objects.filter(pk__in=store_ids).update(auth_version=F('auth_version') + 1)
+    members = list(_store_member_ids(store_ids))
+    claims.invalidate([membership_id for membership_id, _ in members])
+    context.invalidate([user_id for _, user_id in members])
+
+
+@receiver(pre_save, sender=Store)
+@receiver(pre_save, sender=StoreUser)
+def detect_auth_change(sender, instance, **kwargs):
+    """Note whether this save changes who may do what; post_save bumps the version"""
+    instance._auth_changed = False
+    if instance._state.adding:
+        return
+    fields = AUTH_FIELDS[sender]
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if previous is not None:
+        instance._auth_changed = any(previous[field] != getattr(instance, field) for field in fields)
+
+
+@receiver(post_save, sender=StoreUser)
+@receiver(post_delete, sender=StoreUser)
+def invalidate_on_membership_change(sender, instance, **kwargs):
+    """A membership changed: its tokens, permission mask and its user's context are stale"""
+    if getattr(instance, '_auth_changed', False):
+        StoreUser.objects.filter(pk=instance.pk).update(auth_version=F('auth_version') + 1)
+        instance.auth_version += 1
+        instance._auth_changed = False
+    claims.invalidate([instance.pk])
+    context.invalidate([instance.user_id])
+    invalidate_permission_masks([instance.pk])
+    store_cache.bump(instance.store_id)
+
+
+@receiver(post_save, sender=BranchUser)
+@receiver(post_delete, sender=BranchUser)
+def invalidate_on_assignment_change(sender, instance, **kwargs):
+    """A branch assignment changed: its user's context and permission masks are stale"""
+    context.invalidate([instance.user_id])
+    invalidate_permission_masks(
+        StoreUser.objects.filter(user_id=instance.user_id).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Store)
+def invalidate_on_store_change(sender, instance, **kwargs):
+    """Cached memberships carry the store row, so every member's context is stale"""
+    store_cache.bump(instance.pk)
+    if getattr(instance, '_auth_changed', False):
+        _bump_stores([instance.pk])
+        instance.auth_version += 1
+        instance._auth_changed = False
+        return
+    context.invalidate([user_id for _, user_id in _store_member_ids([instance.pk])])
+
+
+@receiver(post_delete, sender=Store)
+def invalidate_store_context_on_store_delete(sender, instance, **kwargs):
+    store_cache.bump(instance.pk)
+    context.invalidate([user_id for _, user_id in _store_member_ids([instance.pk])])
+
+
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def invalidate_store_context_on_branch_change(sender, instance, **kwargs):
+    """Cached branch assignments carry the branch row"""
+    context.invalidate(BranchUser.objects.filter(branch_id=instance.pk).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=License)
+def invalidate_on_license_change(sender, instance, created=False, **kwargs):
+    """Tokens carry when the license runs out, so a changed license invalidates them"""
+    if created:
+        return
+    _bump_stores(Store.objects.filter(license_key=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def invalidate_on_permission_matrix_change(sender, instance, **kwargs):
+    """Permission bits or role defaults changed: every compiled mask is stale"""
+    invalidate_permission_matrix()
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_session_user(sender, instance, **kwargs):
+    """The cached row behind the user's web sessions is stale"""
+    backends.invalidate([instance.pk])
@@ -0,0 +1,150 @@
+"""
+Shared cache layer.
+
+fetch() is the one read-through path every cached lookup takes (catalog
+snapshots, dashboard metrics, store contexts, auth versions, permission
+masks). It counts a hit or a miss per kind of entry. The counts gather in
+each process and are added to totals in the shared cache every
+STATS_FLUSH_EVERY lookups and when the process exits, so
+`manage.py cache_stats` reports all workers together.
+
+Entries about one store live in its namespace: store_key() puts the store's
+namespace version into the key, and bump() replaces that version, retiring
+every such entry at once on every worker. Changes to the store, its staff,
+menu items, categories, taxes and modifiers bump it (see signals.py in
+authentication and inventory). bump() and delete_on_commit() act once the
+change commits, so no reader caches the old rows in between.
+
+CACHES must point at a backend shared by the workers (file or Redis, see
+settings) for entries and invalidations to be coherent between them.
+"""
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+STATS_PREFIX = 'cache_stats'
+KINDS_KEY = f'{STATS_PREFIX}:kinds'
+
+# Lookups counted in a process before its counts are added to the shared totals
+STATS_FLUSH_EVERY = 100
+
+_MISSING = object()
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+_pending = 0
+
+
+def _namespace_key(store_id):
+    return f'store_ns:{store_id}'
+
+
+def namespace_version(store_id):
+    """Opaque stamp of the store's namespace; changes on every bump()"""
+    key = _namespace_key(store_id)
+    version = cache.get(key)
+    if version is None:
+        # A fresh stamp rather than 0, so an evicted key never revives old entries
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(store_id):
+    """Retire everything cached in the store's namespace once the change commits"""
+    key = _namespace_key(store_id)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def delete_on_commit(keys):
+    """
+    Delete these entries once the current transaction commits.
+
+    Deleting earlier lets a concurrent request cache the pre-commit rows again.
+    """
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def store_key(store_id, kind, *parts):
+    """Key of an entry in the store's namespace"""
+    return ':'.join(str(part) for part in (kind, store_id, namespace_version(store_id), *parts))
+
+
+def fetch(kind, key, compute, timeout):
+    """
+    The cached value of ``key``, or compute() cached for ``timeout`` seconds.
+    None is a cacheable value.
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(kind, 'hits')
+        return value
+    _count(kind, 'misses')
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def _stats_key(kind, outcome):
+    return f'{STATS_PREFIX}:{kind}:{outcome}'
+
+
+def _count(kind, outcome):
+    global _pending
+    with _counts_lock:
+        _counts[(kind, outcome)] += 1
+        _pending += 1
+        if _pending < STATS_FLUSH_EVERY:
+            return
+    flush_stats()
+
+
+def flush_stats():
+    """Add this process's counts to the shared totals"""
+    global _pending
+    with _counts_lock:
+        counts = dict(_counts)
+        _counts.clear()
+        _pending = 0
+    kinds = {kind for kind, _ in counts}
+    known = cache.get(KINDS_KEY, set())
+    if not kinds <= known:
+        cache.set(KINDS_KEY, known | kinds, None)
+    for (kind, outcome), count in counts.items():
+        key = _stats_key(kind, outcome)
+        # Not atomic on every backend (file), which only skews the statistics
+        if not cache.add(key, count, None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, None)
+
+
+atexit.register(flush_stats)
+
+
+def stats():
+    """{kind: {'hits', 'misses', 'hit_rate'}} summed over every process that flushed"""
+    flush_stats()
+    result = {}
+    for kind in sorted(cache.get(KINDS_KEY, set())):
+        hits = cache.get(_stats_key(kind, 'hits'), 0)
+        misses = cache.get(_stats_key(kind, 'misses'), 0)
+        total = hits + misses
+        result[kind] = {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else None}
+    return result
+
+
+def reset_stats():
+    global _pending
+    with _counts_lock:
+        _counts.clear()
+        _pending = 0
+    kinds = cache.get(KINDS_KEY, set())
+    cache.delete_many([_stats_key(kind, outcome) for kind in kinds for outcome in ('hits', 'misses')] + [KINDS_KEY])
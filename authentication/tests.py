@@ -1,3 +1,372 @@
-from django.test import TestCase
+import io
+import os
+import runpy
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import claims, context, store_cache
+from .models import Branch, BranchUser, CustomUser, Permission, RolePermission, Store, StoreUser
+from .permissions import (
+    ALL_PERMISSIONS, DEFAULT_PERMISSIONS, HasPermission, Permissions, permission_class, require_permission,
+)
+
+# Tests run against a private in-memory cache, never the configured shared one
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+CODENAMES = [
+    value for name, value in vars(Permissions).items()
+    if not name.startswith('_') and isinstance(value, str)
+]
+
+
+def membership_queries(queries):
+    return [q['sql'] for q in queries.captured_queries if '"store_users"' in q['sql']]
+
+
+def user_queries(queries):
+    return [q['sql'] for q in queries.captured_queries if 'FROM "users"' in q['sql']]
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StoreTestCase(TestCase):
+    """A store with its owner; member() adds staff"""
+
+    def setUp(self):
+        cache.clear()
+        # Hand the hit/miss counts to the test cache, not to the exit-time flush
+        self.addCleanup(store_cache.flush_stats)
+        self.store = Store.objects.create(
+            name='Cafe', store_code='CAFE1', owner_name='Owner', business_type='cafe',
+        )
+        self.users = 0
+        self.owner = self.member('store_owner', ['all'])
+
+    def member(self, role, permissions=(), store=None):
+        self.users += 1
+        user = CustomUser.objects.create_user(
+            email=f'user{self.users}@example.com', first_name='U', last_name=str(self.users), pin='123456',
+        )
+        return StoreUser.objects.create(
+            store=store or self.store, user=user, role=role, permissions=list(permissions),
+        )
+
+
+class StoreContextTests(StoreTestCase):
+    def test_memberships_are_read_once_then_cached(self):
+        user = self.owner.user
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(context.for_user(user).store_ids, [self.store.pk])
+        self.assertTrue(membership_queries(queries))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(context.for_user(user).store, self.store)
+        self.assertEqual(queries.captured_queries, [])
+
+    def test_current_store_by_code_then_claim_then_earliest(self):
+        other = Store.objects.create(name='Other', store_code='OTHER1', owner_name='Owner', business_type='cafe')
+        user = self.owner.user
+        with self.captureOnCommitCallbacks(execute=True):
+            StoreUser.objects.create(store=other, user=user, role='cashier')
+
+        self.assertEqual(context.for_user(user).store, self.store)
+        self.assertEqual(context.for_user(user, store_code='OTHER1').role, 'cashier')
+        self.assertEqual(context.for_user(user, store_id=str(other.pk)).store, other)
+        self.assertEqual(context.for_user(user, store_code='OTHER1', store_id=str(self.store.pk)).store, other)
+        self.assertEqual(context.for_user(user, store_code='NOPE').store, self.store)
+        self.assertEqual(context.for_user(user).get_membership(roles=['cashier']).store, other)
+        with self.assertRaises(StoreUser.DoesNotExist):
+            context.for_user(user).get_membership(roles=['waiter'])
+
+    def test_membership_changes_apply_once_committed(self):
+        user = self.owner.user
+        other = Store.objects.create(name='Other', store_code='OTHER1', owner_name='Owner', business_type='cafe')
+        with self.captureOnCommitCallbacks(execute=True):
+            second = StoreUser.objects.create(store=other, user=user, role='cashier')
+        self.assertEqual(context.for_user(user).store_ids, [self.store.pk, other.pk])
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            second.is_active = False
+            second.save()
+        # Until the change commits, readers keep the rows they had
+        self.assertEqual(context.for_user(user).store_ids, [self.store.pk, other.pk])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(context.for_user(user).store_ids, [self.store.pk])
+
+    def test_requests_share_one_cached_context(self):
+        client = APIClient()
+        client.force_authenticate(self.owner.user)
+        self.assertEqual(client.get('/menu/taxes/', HTTP_X_STORE_CODE='CAFE1').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/menu/taxes/', HTTP_X_STORE_CODE='CAFE1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(membership_queries(queries), [])
+
+    def test_anonymous_users_get_an_empty_context(self):
+        ctx = context.for_user(None)
+        self.assertEqual((ctx.store_ids, ctx.store, ctx.role), ([], None, None))
+
+
+class StoreClaimsTests(StoreTestCase):
+    def client_for(self, store_user, with_claims=True):
+        refresh = RefreshToken.for_user(store_user.user)
+        if with_claims:
+            claims.add_store_claims(refresh, store_user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        return client
+
+    def kitchen_display(self, client):
+        return client.get('/orders/kitchen-display/').status_code
+
+    def test_role_change_revokes_earlier_tokens(self):
+        cashier = self.member('cashier')
+        client = self.client_for(cashier)
+        self.assertEqual(self.kitchen_display(client), 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cashier.role = 'waiter'
+            cashier.save()
+        cashier.refresh_from_db()
+        self.assertEqual(cashier.auth_version, 2)
+        self.assertEqual(self.kitchen_display(client), 401)
+        self.assertEqual(self.kitchen_display(self.client_for(cashier)), 200)
+
+    def test_store_changes_revoke_only_when_access_changes(self):
+        client = self.client_for(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.name = 'Renamed'
+            self.store.save()
+        self.assertEqual(self.kitchen_display(client), 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.is_active = False
+            self.store.save()
+        self.assertEqual(self.kitchen_display(client), 401)
+
+    def test_tokens_without_store_claims_still_authenticate(self):
+        self.assertEqual(self.kitchen_display(self.client_for(self.owner, with_claims=False)), 200)
+
+    @override_settings(STORE_CLAIMS_AUTH=True)
+    def test_claims_mode_reads_no_user_or_membership_rows(self):
+        client = self.client_for(self.owner)
+        self.assertEqual(self.kitchen_display(client), 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.kitchen_display(client), 200)
+        self.assertEqual(user_queries(queries) + membership_queries(queries), [])
+
+        # Unsafe methods still load the user (and are then refused by the GET-only view)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.post('/orders/kitchen-display/').status_code, 405)
+        self.assertTrue(user_queries(queries))
+
+
+def old_check(store_user, permission_name):
+    """HasPermission as it was before permissions were compiled into masks"""
+    if store_user.role == 'store_owner':
+        return True
+    return 'all' in store_user.permissions or permission_name in store_user.permissions
+
+
+class PermissionMaskTests(StoreTestCase):
+    def allows(self, store_user, permission_name):
+        """Run HasPermission the way a view does, against a fresh request context"""
+        user = CustomUser.objects.get(pk=store_user.user_id)
+        request = SimpleNamespace(user=user, store_ctx=context.for_user(user))
+        request.store_user = request.store_ctx.membership_for(store_id=self.store.pk)
+        return permission_class(permission_name)().has_permission(request, None)
+
+    def test_masks_grant_what_the_old_checks_granted(self):
+        grants = [
+            [], ['all'], [Permissions.REFUND_ORDERS], [Permissions.CREATE_USERS, Permissions.CLOSE_SHIFT],
+        ]
+        for role, _ in StoreUser.STORE_ROLES:
+            for permissions in grants:
+                store_user = self.member(role, permissions)
+                for name in CODENAMES + ['not_a_permission']:
+                    # Masks add the role defaults, which the old check ignored
+                    expected = old_check(store_user, name) or name in DEFAULT_PERMISSIONS.get(role, [])
+                    with self.subTest(role=role, permissions=permissions, permission=name):
+                        self.assertEqual(self.allows(store_user, name), expected)
+
+    def test_owner_and_all_get_every_bit(self):
+        everything = self.member('cashier', ['all'])
+        for store_user in (self.owner, everything):
+            ctx = context.for_user(CustomUser.objects.get(pk=store_user.user_id))
+            self.assertEqual(ctx.permission_mask(ctx.membership_for(store_id=self.store.pk)), ALL_PERMISSIONS)
+
+    def test_committed_edits_apply_to_the_next_check(self):
+        cashier = self.member('cashier')
+        self.assertFalse(self.allows(cashier, Permissions.REFUND_ORDERS))
+        with self.captureOnCommitCallbacks(execute=True):
+            cashier.permissions = [Permissions.REFUND_ORDERS]
+            cashier.save()
+        self.assertTrue(self.allows(cashier, Permissions.REFUND_ORDERS))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            void = Permission.objects.create(name='Void items', codename='void_items', category='sales')
+        self.assertFalse(self.allows(cashier, 'void_items'))
+        with self.captureOnCommitCallbacks(execute=True):
+            RolePermission.objects.create(role='cashier', permission=void)
+        self.assertTrue(self.allows(cashier, 'void_items'))
+        with self.captureOnCommitCallbacks(execute=True):
+            void.is_active = False
+            void.save()
+        self.assertFalse(self.allows(cashier, 'void_items'))
+
+    def test_branch_permissions_only_count_in_their_store(self):
+        waiter = self.member('waiter')
+        other = Store.objects.create(name='Other', store_code='OTHER1', owner_name='Owner', business_type='cafe')
+        with self.captureOnCommitCallbacks(execute=True):
+            BranchUser.objects.create(
+                branch=Branch.objects.create(store=other, name='Other main', branch_code='OM'),
+                user=waiter.user, role='branch_manager', permissions=[Permissions.REFUND_ORDERS],
+            )
+        self.assertFalse(self.allows(waiter, Permissions.REFUND_ORDERS))
+        with self.captureOnCommitCallbacks(execute=True):
+            BranchUser.objects.create(
+                branch=Branch.objects.create(store=self.store, name='Main', branch_code='M'),
+                user=waiter.user, role='waiter', permissions=[Permissions.REFUND_ORDERS],
+            )
+        self.assertTrue(self.allows(waiter, Permissions.REFUND_ORDERS))
+
+    def test_require_permission_appends_a_shared_class(self):
+        class View:
+            permission_classes = [HasPermission]
+
+        require_permission(Permissions.VIEW_ORDERS)(View)
+        self.assertEqual(View.permission_classes, [HasPermission, permission_class(Permissions.VIEW_ORDERS)])
+        self.assertIs(permission_class(Permissions.VIEW_ORDERS), permission_class(Permissions.VIEW_ORDERS))
+
+
+class StoreCacheTests(StoreTestCase):
+    def test_bump_retires_the_namespace_once_committed(self):
+        key = store_cache.store_key(self.store.pk, 'menu', 'all')
+        self.assertEqual(store_cache.store_key(self.store.pk, 'menu', 'all'), key)
+        other_key = store_cache.store_key('other', 'menu', 'all')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            store_cache.bump(self.store.pk)
+        self.assertEqual(store_cache.store_key(self.store.pk, 'menu', 'all'), key)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(store_cache.store_key(self.store.pk, 'menu', 'all'), key)
+        self.assertEqual(store_cache.store_key('other', 'menu', 'all'), other_key)
+
+    def test_fetch_counts_hits_and_misses(self):
+        compute = mock.Mock(return_value=None)
+        for _ in range(3):
+            self.assertIsNone(store_cache.fetch('lookup', 'lookup:1', compute, 60))
+        # None is cached like any other value
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(store_cache.stats()['lookup'], {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+        store_cache.reset_stats()
+        self.assertEqual(store_cache.stats(), {})
+
+    def test_counts_reach_the_shared_totals_in_batches(self):
+        with mock.patch.object(store_cache, 'STATS_FLUSH_EVERY', 3):
+            for n in range(4):
+                store_cache.fetch('lookup', f'lookup:{n}', lambda: n, 60)
+        self.assertEqual(cache.get(store_cache._stats_key('lookup', 'misses')), 3)
+
+    def test_command_prints_and_resets_the_counters(self):
+        store_cache.fetch('lookup', 'lookup:1', lambda: 1, 60)
+        output = io.StringIO()
+        call_command('cache_stats', '--reset', stdout=output)
+        self.assertIn('hits        0  misses        1  hit rate 0.0%', output.getvalue())
+        self.assertIn('Counters reset', output.getvalue())
+        self.assertEqual(store_cache.stats(), {})
+
+
+def load_settings(**environ):
+    """The settings module as it evaluates under ``environ``"""
+    with mock.patch.dict(os.environ, environ):
+        return runpy.run_path(os.path.join(settings.BASE_DIR, 'coffybyte', 'settings.py'))
+
+
+class CacheDirTests(TestCase):
+    def load_settings(self, cache_dir):
+        return load_settings(CACHE_BACKEND='file', CACHE_DIR=str(cache_dir))
+
+    def test_cache_dir_is_created_private(self):
+        with tempfile.TemporaryDirectory() as parent:
+            cache_dir = os.path.join(parent, 'cache')
+            config = self.load_settings(cache_dir)
+            self.assertEqual(config['CACHES']['default']['LOCATION'], cache_dir)
+            self.assertEqual(os.stat(cache_dir).st_mode & 0o777, 0o700)
+
+    def test_cache_dir_writable_by_others_is_refused(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.chmod(cache_dir, 0o777)
+            with self.assertRaises(ImproperlyConfigured):
+                self.load_settings(cache_dir)
+
+
+class CachedSessionTests(StoreTestCase):
+    url = '/dashboard/dashboard/refresh-metrics/'
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.owner.user
+        self.web = Client()
+        self.web.force_login(self.user)
+
+    def test_session_user_is_read_once_then_cached(self):
+        self.assertEqual(self.web.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.web.get(self.url).status_code, 200)
+        self.assertEqual(user_queries(queries), [])
+
+    def test_deactivated_user_is_logged_out_at_once(self):
+        self.assertEqual(self.web.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.web.get(self.url).status_code, 302)
+
+    def test_sessions_of_the_plain_backend_still_resolve(self):
+        session = self.web.session
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session.save()
+        self.assertEqual(self.web.get(self.url).status_code, 200)
+
+    def test_unknown_session_backend_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(CACHE_BACKEND='locmem', SESSION_BACKEND='memcached')
+
+
+class CleanupSessionsTests(TestCase):
+    def add_sessions(self, count, expire_date):
+        for _ in range(count):
+            store = Session.get_session_store_class()()
+            store.create()
+            Session.objects.filter(session_key=store.session_key).update(expire_date=expire_date)
+
+    def test_expired_sessions_are_deleted_in_batches(self):
+        self.add_sessions(5, timezone.now() - timedelta(days=1))
+        self.add_sessions(2, timezone.now() + timedelta(days=1))
+        output = io.StringIO()
+        with mock.patch('time.sleep') as sleep:
+            call_command('cleanup_sessions', batch=2, pause=0, stdout=output)
+        self.assertIn('Deleted 5 expired sessions, 2 remain', output.getvalue())
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_batch_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            call_command('cleanup_sessions', batch=0, stdout=io.StringIO())
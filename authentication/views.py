@@ -23,6 +23,7 @@ from .serializers import (
     BranchUserSerializer, POSDeviceSerializer, LicenseSerializer,
     LicenseActivationSerializer, PermissionSerializer
 )
+from . import claims
 from .permissions import (
     IsStoreOwner, IsStoreOwnerOrManager, HasStoreAccess, 
     HasBranchAccess, HasPermission, Permissions, DEFAULT_PERMISSIONS
@@ -142,10 +143,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         refresh = RefreshToken.for_user(user)
         try:
             # Add custom claims
-            refresh['store_code'] = store_user.store.store_code
-            refresh['store_id'] = str(store_user.store.id)
-            refresh['role'] = store_user.role
-            refresh['permissions'] = store_user.permissions
+            claims.add_store_claims(refresh, store_user)
         except:
             pass 
 
@@ -273,11 +271,7 @@ def register_store(request):
 def activate_license(request):
     # Auto-identify store owner's store
     try:
-        store_user = StoreUser.objects.get(
-            user=request.user, 
-            role='store_owner', 
-            is_active=True
-        )
+        store_user = request.store_ctx.get_membership(roles=['store_owner'])
         store = store_user.store
     except StoreUser.DoesNotExist:
         return Response({
@@ -358,18 +352,11 @@ class MyStoreDetailView(generics.RetrieveUpdateAPIView):
         
         # Fallback to store owner lookup
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                role='store_owner',
-                is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership(roles=['store_owner'])
             return store_user.store
         except StoreUser.DoesNotExist:
             # If not owner, get first accessible store
-            store_user = StoreUser.objects.filter(
-                user=self.request.user,
-                is_active=True
-            ).first()
+            store_user = self.request.store_ctx.membership
             if store_user:
                 return store_user.store
             
@@ -391,12 +378,7 @@ class MyStoreDetailView(generics.RetrieveUpdateAPIView):
         
         # Check if user is store owner
         try:
-            StoreUser.objects.get(
-                user=request.user,
-                store=store,
-                role='store_owner',
-                is_active=True
-            )
+            request.store_ctx.get_membership(store_id=store.pk, roles=['store_owner'])
         except StoreUser.DoesNotExist:
             return Response({
                 'error': 'Only store owners can update store details'
@@ -423,10 +405,7 @@ class BranchListCreateView(generics.ListCreateAPIView):
     )
     def get_queryset(self):
         # Get user's store
-        store_user = StoreUser.objects.filter(
-            user=self.request.user,
-            is_active=True
-        ).first()
+        store_user = self.request.store_ctx.membership
         
         if not store_user:
             return Branch.objects.none()
@@ -451,11 +430,7 @@ class BranchListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         # Get user's store
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership(roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can create branches')
         
@@ -505,12 +480,7 @@ class BranchDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         branch = self.get_object()
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=branch.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=branch.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can update branches')
         
@@ -522,12 +492,7 @@ class BranchDetailView(generics.RetrieveUpdateDestroyAPIView):
     )
     def perform_destroy(self, instance):
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=instance.store,
-                role='store_owner',
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=instance.store_id, roles=['store_owner'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners can delete branches')
         
@@ -557,10 +522,7 @@ class StoreUserListCreateView(generics.ListCreateAPIView):
     )
     def get_queryset(self):
         # Get user's store
-        store_user = StoreUser.objects.filter(
-            user=self.request.user,
-            is_active=True
-        ).first()
+        store_user = self.request.store_ctx.membership
         
         if not store_user:
             return StoreUser.objects.none()
@@ -601,11 +563,7 @@ class StoreUserListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         # Get user's store and check permissions
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership(roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can create users')
         
@@ -645,12 +603,7 @@ class StoreUserDetailView(generics.RetrieveUpdateDestroyAPIView):
         }
     )
     def get_queryset(self):
-        # Get user's store
-        user_stores = Store.objects.filter(
-            store_users__user=self.request.user,
-            store_users__is_active=True
-        )
-        return StoreUser.objects.filter(store__in=user_stores)
+        return StoreUser.objects.filter(store_id__in=self.request.store_ctx.store_ids)
     
     @extend_schema(
         summary="Update Store User",
@@ -660,12 +613,7 @@ class StoreUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         store_user_obj = self.get_object()
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=store_user_obj.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=store_user_obj.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can update users')
         
@@ -677,12 +625,7 @@ class StoreUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     )
     def perform_destroy(self, instance):
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=instance.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=instance.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can delete users')
         
@@ -723,10 +666,7 @@ class DashboardView(APIView):
     def get(self, request):
         # Get user's store
         try:
-            store_user = StoreUser.objects.get(
-                user=request.user,
-                is_active=True
-            )
+            store_user = request.store_ctx.get_membership()
             store = store_user.store
         except StoreUser.DoesNotExist:
             return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -777,10 +717,7 @@ class DashboardView(APIView):
 def check_store_status(request):
     # Get user's store
     try:
-        store_user = StoreUser.objects.get(
-            user=request.user,
-            is_active=True
-        )
+        store_user = request.store_ctx.get_membership()
         store = store_user.store
     except StoreUser.DoesNotExist:
         return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -852,12 +789,7 @@ def update_user_permissions(request, user_id):
     
     # Check if current user is store owner of the same store
     try:
-        current_store_user = StoreUser.objects.get(
-            user=request.user,
-            store=store_user_to_update.store,
-            role='store_owner',
-            is_active=True
-        )
+        current_store_user = request.store_ctx.get_membership(store_id=store_user_to_update.store_id, roles=['store_owner'])
     except StoreUser.DoesNotExist:
         return Response({
             'error': 'Only store owners can update user permissions'
@@ -950,10 +882,7 @@ class POSDeviceListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         # Get user's store
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership()
             store = store_user.store
         except StoreUser.DoesNotExist:
             return POSDevice.objects.none()
@@ -1003,11 +932,7 @@ class POSDeviceListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         # Check if user can create devices
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership(roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can create POS devices')
         
@@ -1038,10 +963,7 @@ class POSDeviceDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         # Get user's store devices
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership()
             store = store_user.store
         except StoreUser.DoesNotExist:
             return POSDevice.objects.none()
@@ -1056,12 +978,7 @@ class POSDeviceDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         device = self.get_object()
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=device.branch.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=device.branch.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can update devices')
         
@@ -1073,12 +990,7 @@ class POSDeviceDetailView(generics.RetrieveUpdateDestroyAPIView):
     )
     def perform_destroy(self, instance):
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=instance.branch.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=instance.branch.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can delete devices')
         
@@ -1115,11 +1027,7 @@ class BranchUserListCreateView(generics.ListCreateAPIView):
         # Verify user has access to this branch's store
         try:
             branch = Branch.objects.get(id=branch_id)
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=branch.store,
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=branch.store_id)
         except (Branch.DoesNotExist, StoreUser.DoesNotExist):
             return BranchUser.objects.none()
         
@@ -1146,12 +1054,7 @@ class BranchUserListCreateView(generics.ListCreateAPIView):
         
         # Check permissions
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=branch.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=branch.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can assign users to branches')
         
@@ -1185,11 +1088,7 @@ class BranchUserDetailView(generics.RetrieveUpdateDestroyAPIView):
         # Verify access
         try:
             branch = Branch.objects.get(id=branch_id)
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=branch.store,
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=branch.store_id)
         except (Branch.DoesNotExist, StoreUser.DoesNotExist):
             return BranchUser.objects.none()
         
@@ -1203,12 +1102,7 @@ class BranchUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         branch_user = self.get_object()
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=branch_user.branch.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=branch_user.branch.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can update branch users')
         
@@ -1220,12 +1114,7 @@ class BranchUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     )
     def perform_destroy(self, instance):
         try:
-            StoreUser.objects.get(
-                user=self.request.user,
-                store=instance.branch.store,
-                role__in=['store_owner', 'store_manager'],
-                is_active=True
-            )
+            self.request.store_ctx.get_membership(store_id=instance.branch.store_id, roles=['store_owner', 'store_manager'])
         except StoreUser.DoesNotExist:
             raise PermissionDenied('Only store owners/managers can remove branch users')
         
@@ -1330,10 +1219,7 @@ def change_pin(request):
 @permission_classes([permissions.IsAuthenticated])
 def my_store_role(request):
     try:
-        store_user = StoreUser.objects.get(
-            user=request.user,
-            is_active=True
-        )
+        store_user = request.store_ctx.get_membership()
     except StoreUser.DoesNotExist:
         return Response({
             'error': 'No store assignment found'
@@ -13,7 +13,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import stat
 from django.contrib.messages import constants as messages
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,7 +51,8 @@ INSTALLED_APPS = [
     'authentication',
     'inventory',
     'orders',
-    'Finance'
+    'Finance',
+    'dashboard',
 ]
 
 MIDDLEWARE = [
@@ -119,35 +122,198 @@ CORS_ALLOWED_METHODS = [
     'PUT',
 ]
 
+# Delta feed cursor (orders/delta.py) and catalog version/ETag
+# (inventory/catalog.py) must be readable by browser clients
+CORS_EXPOSE_HEADERS = [
+    'x-cursor',
+    'etag',
+    'x-catalog-version',
+]
+
 # CORS_ALLOWED_ORIGINS = [
    
 #     "*"
     
 # ]
-# Configure session settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Database-backed sessions
+# Sessions of the dashboard web UI. SESSION_BACKEND picks where they live:
+# 'cached_db' (default) reads them from the shared cache below and the database
+# only on a miss; 'signed_cookies' keeps them in the cookie itself, so no page
+# reads or stores a session server-side (the data is signed, not encrypted);
+# 'db' is the database alone. `manage.py cleanup_sessions` deletes expired rows.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"SESSION_BACKEND must be one of {', '.join(SESSION_ENGINES)}, not {SESSION_BACKEND!r}")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days in seconds
+SESSION_COOKIE_HTTPONLY = True
+
+
+# Cache shared by every worker (authentication/store_cache.py namespaces it per
+# store and counts hits; `manage.py cache_stats`). CACHE_BACKEND picks it:
+# 'file' (default) shares CACHE_DIR between the workers of one machine,
+# 'redis' shares REDIS_URL between machines (needs redis-py), and 'locmem' is
+# per process, so workers miss each other's entries and invalidations.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'TIMEOUT': 3600,  # 1 hour in seconds
+            'KEY_PREFIX': 'coffybyte',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    # The file cache unpickles what it finds in CACHE_DIR and holds user rows
+    # (password hashes included), so the directory must be private to this
+    # user: it is created 0700, and (on POSIX) one others can write to is refused.
+    CACHE_DIR = Path(os.environ.get('CACHE_DIR', BASE_DIR / 'cache'))
+    CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    _cache_dir_stat = CACHE_DIR.stat()
+    if hasattr(os, 'getuid') and (
+        _cache_dir_stat.st_uid != os.getuid() or _cache_dir_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    ):
+        raise ImproperlyConfigured(
+            f"CACHE_DIR {CACHE_DIR} must be owned by this user and not writable by others"
+        )
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(CACHE_DIR),
+            'TIMEOUT': 3600,  # 1 hour in seconds
+            'KEY_PREFIX': 'coffybyte',
+            # Per-user and per-store entries; the default of 300 would cull constantly
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-recommendation-cache',
+            'TIMEOUT': 3600,  # 1 hour in seconds
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"CACHE_BACKEND must be 'file', 'redis' or 'locmem', not {CACHE_BACKEND!r}")
 
+# Order event fan-out for kitchen displays (orders/events/ stream).
+# The in-process broker only reaches streams served by the same worker.
+ORDER_EVENTS_BROKER = 'orders.events.LocalBroker'
 
-# Recommended: Configure caching for recommendation queries
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-recommendation-cache',
-        'TIMEOUT': 3600,  # 1 hour in seconds
-    }
-}
+# Seconds a user's store memberships are cached for request.store_ctx
+# (authentication/context.py); membership changes invalidate it immediately.
+STORE_CONTEXT_TTL = 300
+
+# Seconds the user behind a web session is cached (authentication/backends.py);
+# saving or deleting the user invalidates it immediately.
+SESSION_USER_TTL = 300
+
+# Let views using authentication.claims.StoreClaimsAuthentication (menu
+# listing, kitchen display) authorize safe requests from the token's store
+# claims alone, without loading the user or membership rows.
+STORE_CLAIMS_AUTH = False
+
+# Seconds the owner dashboard figures are cached per store (dashboard/metrics.py);
+# checkouts and changes to sold orders show up immediately regardless.
+DASHBOARD_METRICS_TTL = 60
+
+# Report ranges longer than this many days are queued as ReportJobs and built
+# by `manage.py run_report_worker` (dashboard/jobs.py) instead of in the request.
+REPORT_INLINE_MAX_DAYS = 31
+# PDFs are drawn in memory (dashboard/exports.py PdfReport), so they are queued
+# sooner, and no PDF is drawn past REPORT_PDF_MAX_PAGES pages.
+REPORT_PDF_INLINE_MAX_DAYS = 7
+REPORT_PDF_MAX_PAGES = 1000
+
+# Finished report files (dashboard/models.py report_storage). They hold a
+# store's sales and are served only through the job download view: keep the
+# directory outside MEDIA_ROOT and STATIC_ROOT.
+REPORT_ARTIFACT_DIR = os.environ.get('REPORT_ARTIFACT_DIR', BASE_DIR / 'private')
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# DB_ENGINE=postgres is the production backend (needs psycopg). Connections are
+# kept open for DB_CONN_MAX_AGE seconds and health-checked before reuse; with
+# DB_POOL=1 psycopg's connection pool (DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE per
+# worker process) hands them out instead. SQLite is the development default:
+# one writer at a time, so WAL lets reads carry on beside it, and writers wait
+# for the lock (busy_timeout) rather than fail with "database is locked".
+# `manage.py load_test_orders` measures order-create throughput on either.
+#
+# SQLite is the default so existing installs and test runs keep working;
+# `manage.py check --deploy` warns when it was not chosen explicitly
+# (orders/sqlite.py), so a production box does not end up on it unnoticed.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_ENGINE_EXPLICIT = 'DB_ENGINE' in os.environ
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'coffybyte'),
+            'USER': os.environ.get('DB_USER', 'coffybyte'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('DB_POOL') == '1':
+        # A pool replaces persistent connections; Django refuses both at once
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Take the write lock when a transaction starts, so a transaction
+                # that reads first cannot deadlock on upgrading its lock. Every
+                # atomic() block then holds the one write lock: read-only paths
+                # (reports, dashboards, feeds) read outside atomic().
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                ),
+            },
+        }
+    }
+    # Single-box deployments: SQLITE_TUNED=1 keeps connections open between
+    # requests and gives each one memory-mapped I/O, a bigger page cache and
+    # in-memory temp tables, with a periodic PRAGMA optimize (orders/sqlite.py).
+    # `manage.py benchmark_sqlite --compare` measures it against the defaults.
+    SQLITE_TUNED = os.environ.get('SQLITE_TUNED') == '1'
+    if SQLITE_TUNED:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'postgres' or 'sqlite', not {DB_ENGINE!r}")
+
+# Database snapshots (Finance/snapshots.py). /Finance/download_db serves the
+# newest one while it is younger than DB_SNAPSHOT_MAX_AGE seconds, and
+# `manage.py snapshot_db` takes them on a schedule. They hold every store's
+# data: keep the directory outside MEDIA_ROOT and STATIC_ROOT.
+DB_SNAPSHOT_DIR = os.environ.get('DB_SNAPSHOT_DIR', BASE_DIR / 'snapshots')
+DB_SNAPSHOT_MAX_AGE = 300
 
 
 # Password validation
@@ -177,6 +343,8 @@ STORE_HEADER_NAME = 'HTTP_X_STORE_CODE'
 
 AUTHENTICATION_BACKENDS = (
     
+    'authentication.backends.CachedModelBackend', # ModelBackend with cached session users
+    # Sessions created before CachedModelBackend store this path; keep it so they still resolve.
     'django.contrib.auth.backends.ModelBackend', # Default backend
 )
 
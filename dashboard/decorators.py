@@ -7,7 +7,7 @@ def store_owner_access(view_func):
         if request.user.is_authenticated:
             user = request.user
             try:
-                if user.store_memberships.all()[0].role == 'store_owner':
+                if request.store_ctx.get_membership().role == 'store_owner':
                     return view_func(request, *args, **kwargs)
                 else:
                     
@@ -0,0 +1,311 @@
+"""
+Streaming report exports.
+
+ExcelExport writes a report through an openpyxl write-only workbook: each row
+goes straight to the sheet's temporary file instead of a cell grid held in
+memory, so a month-long daybook needs about as much memory as a single day.
+A write-only sheet takes its column widths before its first row, so the
+first SAMPLE_ROWS rows are buffered and measured, then written out. The
+finished workbook is saved to a temporary file and streamed from it in
+chunks.
+
+csv_response() streams CSV straight from a row iterator: nothing is written
+ahead of the client reading it, so a year of sales starts downloading at
+once and never sits in memory.
+
+PdfReport draws a paged table straight onto a reportlab canvas, repeating
+the column header on every page. Rows are drawn as they arrive and never
+collected into a flowable table, but a reportlab canvas keeps every finished
+page (compressed) in memory until save() and only then writes the file:
+nothing streams out while the document is drawn, and memory grows with the
+page count. It is bounded by REPORT_PDF_MAX_PAGES, past which the build stops
+with PdfTooLarge, and the report views queue PDFs over
+REPORT_PDF_INLINE_MAX_DAYS as jobs (jobs.py) so web workers only ever draw
+short ones.
+
+Callers feed rows from ``queryset.iterator(chunk_size=CHUNK_SIZE)`` or
+batches() rather than lists, so no step holds the whole period.
+"""
+import csv
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched per database round trip
+CHUNK_SIZE = 2000
+
+# Rows measured for column widths before the sheet is written
+SAMPLE_ROWS = 200
+
+# CSV rows joined into each streamed chunk
+CSV_ROWS_PER_CHUNK = 500
+
+# Bytes of a finished PDF kept in memory before its temporary file moves to disk
+PDF_SPOOL_SIZE = 1024 * 1024
+
+# Most pages a PdfReport draws; every page is held in memory until the end
+DEFAULT_PDF_MAX_PAGES = 1000
+
+TITLE_FONT = Font(bold=True, size=16)
+HEADER_FONT = Font(bold=True, size=12)
+
+
+def batches(iterable, size=CHUNK_SIZE):
+    """Yield lists of up to ``size`` items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ExcelExport:
+    """One-sheet XLSX report written in a single forward pass"""
+
+    def __init__(self, title, max_width=50):
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title[:31])
+        self.max_width = max_width
+        self.widths = {}
+        self._buffered = []
+        self._measured = 0
+        self._row_count = 0
+
+    def cell(self, value, font=None, fill=None, alignment=None):
+        """A styled cell to pass to row()"""
+        cell = WriteOnlyCell(self.sheet, value=value)
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        return cell
+
+    def title(self, text, span=1):
+        """A large title line across ``span`` columns; not counted for widths"""
+        self._append([self.cell(text, font=TITLE_FONT)], measure=False)
+        if span > 1:
+            self.sheet.merged_cells.add(f'A{self._row_count}:{get_column_letter(span)}{self._row_count}')
+
+    def line(self, text, span=1):
+        """A plain text line across ``span`` columns; not counted for widths"""
+        self._append([text], measure=False)
+        if span > 1:
+            self.sheet.merged_cells.add(f'A{self._row_count}:{get_column_letter(span)}{self._row_count}')
+
+    def header(self, values, font=HEADER_FONT, fill=None, alignment=None):
+        self.row([self.cell(value, font=font, fill=fill, alignment=alignment) for value in values])
+
+    def row(self, values):
+        self._append(list(values), measure=True)
+
+    def rows(self, iterable):
+        for values in iterable:
+            self.row(values)
+
+    def blank(self):
+        self._append([], measure=False)
+
+    def _append(self, values, measure):
+        self._row_count += 1
+        if self._buffered is None:
+            self.sheet.append(values)
+            return
+        if measure:
+            self._measure(values)
+            self._measured += 1
+        self._buffered.append(values)
+        if self._measured >= SAMPLE_ROWS:
+            self._flush()
+
+    def _measure(self, values):
+        for column, value in enumerate(values, 1):
+            if isinstance(value, Cell):
+                value = value.value
+            if value is None:
+                continue
+            self.widths[column] = max(self.widths.get(column, 0), len(str(value)))
+
+    def _flush(self):
+        for column, width in self.widths.items():
+            self.sheet.column_dimensions[get_column_letter(column)].width = min(width + 2, self.max_width)
+        for values in self._buffered:
+            self.sheet.append(values)
+        self._buffered = None
+
+    def response(self, filename):
+        """Save the workbook and stream it as an attachment"""
+        if self._buffered is not None:
+            self._flush()
+        output = tempfile.TemporaryFile()
+        self.workbook.save(output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+class _Echo:
+    """File-like object that hands each written CSV line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    """Yield the CSV text of ``header`` and ``rows``, a few hundred rows at a time"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for batch in batches(rows, CSV_ROWS_PER_CHUNK):
+        yield ''.join(writer.writerow(row) for row in batch)
+
+
+def csv_response(filename, header, rows):
+    """Stream ``rows`` (any iterable, ideally lazy) as a CSV attachment"""
+    response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class PdfTooLarge(ValueError):
+    """The report needs more pages than REPORT_PDF_MAX_PAGES"""
+
+
+class PdfReport:
+    """
+    Paged PDF table report drawn in a single forward pass.
+
+    Start a table with table(), then add rows; a row that does not fit on
+    the page starts a new one under a repeated header. Starting a page past
+    REPORT_PDF_MAX_PAGES raises PdfTooLarge.
+    """
+
+    def __init__(self, title, subtitle=None, pagesize=A4, margin=36, font_size=8, title_color=colors.black):
+        self.output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_SIZE)
+        self.canvas = canvas.Canvas(self.output, pagesize=pagesize, pageCompression=1)
+        self.page_width, self.page_height = pagesize
+        self.margin = margin
+        self.font_size = font_size
+        self.row_height = font_size + 8
+        self.page = 1
+        self.max_pages = getattr(settings, 'REPORT_PDF_MAX_PAGES', DEFAULT_PDF_MAX_PAGES)
+        self.columns = None
+        self.y = self.page_height - margin
+
+        self.canvas.setTitle(title)
+        self.canvas.setFillColor(title_color)
+        self.canvas.setFont('Helvetica-Bold', 18)
+        self.y -= 18
+        self.canvas.drawCentredString(self.page_width / 2, self.y, title)
+        self.canvas.setFillColor(colors.black)
+        if subtitle:
+            self.canvas.setFont('Helvetica-Bold', 13)
+            self.y -= 30
+            self.canvas.drawString(self.margin, self.y, subtitle)
+        self.y -= 24
+
+    def table(self, columns, widths=None, align='CENTER', header_fill=colors.grey, fills=(colors.beige,)):
+        """
+        Start a table. ``widths`` are in points (even split of the page when
+        omitted); body rows cycle through ``fills``.
+        """
+        usable = self.page_width - 2 * self.margin
+        self.columns = list(columns)
+        self.widths = list(widths) if widths else [usable / len(self.columns)] * len(self.columns)
+        self.x = self.margin + max(usable - sum(self.widths), 0) / 2
+        self.align = align
+        self.header_fill = header_fill
+        self.fills = fills
+        self._body_rows = 0
+        self._ensure(self.row_height + 6 + self.row_height)
+        self._header()
+
+    def row(self, values, total=False):
+        """A body row; ``total`` rows are bold on light grey"""
+        if self._ensure(self.row_height):
+            self._header()
+        fill = colors.lightgrey if total else self.fills[self._body_rows % len(self.fills)]
+        self._cells(values, self.row_height, fill, colors.black, 'Helvetica-Bold' if total else 'Helvetica')
+        self._body_rows += 1
+
+    def rows(self, iterable):
+        for values in iterable:
+            self.row(values)
+
+    def text(self, text, size=10, bold=False):
+        """A line of text at the left margin, outside any table"""
+        self.columns = None
+        self._ensure(size + 6)
+        self.y -= size + 6
+        self.canvas.setFont('Helvetica-Bold' if bold else 'Helvetica', size)
+        self.canvas.drawString(self.margin, self.y, text)
+
+    def spacer(self, height=20):
+        self.y -= height
+
+    def _header(self):
+        self._cells(self.columns, self.row_height + 6, self.header_fill, colors.whitesmoke, 'Helvetica-Bold')
+
+    def _ensure(self, height):
+        """Start a new page unless ``height`` fits above the footer; True when it did"""
+        if self.y - height >= self.margin + 14:
+            return False
+        if self.page >= self.max_pages:
+            raise PdfTooLarge(
+                f"The report is longer than {self.max_pages} pages; export it as Excel or narrow the range"
+            )
+        self._footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = self.page_height - self.margin
+        return True
+
+    def _footer(self):
+        self.canvas.setFont('Helvetica', 8)
+        self.canvas.setFillColor(colors.grey)
+        self.canvas.drawRightString(self.page_width - self.margin, self.margin - 12, f"Page {self.page}")
+
+    def _cells(self, values, height, fill, text_color, font):
+        self.y -= height
+        pdf = self.canvas
+        pdf.setStrokeColor(colors.black)
+        pdf.setLineWidth(0.5)
+        x = self.x
+        for value, width in zip(values, self.widths):
+            pdf.setFillColor(fill)
+            pdf.rect(x, self.y, width, height, stroke=1, fill=1)
+            text = self._clip('' if value is None else str(value), font, width - 6)
+            pdf.setFillColor(text_color)
+            pdf.setFont(font, self.font_size)
+            baseline = self.y + (height - self.font_size) / 2 + 1.5
+            if self.align == 'LEFT':
+                pdf.drawString(x + 3, baseline, text)
+            else:
+                pdf.drawCentredString(x + width / 2, baseline, text)
+            x += width
+
+    def _clip(self, text, font, width):
+        if stringWidth(text, font, self.font_size) <= width:
+            return text
+        while text and stringWidth(text + '...', font, self.font_size) > width:
+            text = text[:-1]
+        return text + '...'
+
+    def response(self, filename):
+        """Finish the document and stream it as an attachment"""
+        self._footer()
+        self.canvas.save()
+        self.output.seek(0)
+        return FileResponse(self.output, as_attachment=True, filename=filename, content_type='application/pdf')
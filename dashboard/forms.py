@@ -25,12 +25,10 @@ class MenuForm(forms.ModelForm):
         }
 
     def __init__(self, *args, **kwargs):
-        user = kwargs.pop("user", None)  # get user from view
+        store = kwargs.pop("store", None)  # the view's store context
         super(MenuForm, self).__init__(*args, **kwargs)
 
-        if user:
-            # Get the store for this user
-            store = user.store_memberships.all()[0].store
+        if store:
             # Filter categories for this store
             self.fields["category"].queryset = FoodCategory.objects.filter(store=store)
 
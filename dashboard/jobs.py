@@ -0,0 +1,191 @@
+"""
+Report jobs.
+
+Reports over long ranges are built by a worker process
+(``manage.py run_report_worker``) instead of inside a web request.
+enqueue() records a ReportJob; the worker claims the oldest queued job, runs
+the same builder the synchronous report view uses (views.REPORT_BUILDERS)
+and stores the file under a random name in the private REPORT_ARTIFACT_DIR
+(never under MEDIA_ROOT, which is publicly served). Clients poll status() and
+download the stored artifact through the authenticated download view.
+
+Identical requests (store, report, format, range and branch) are
+deduplicated: a queued or running job is shared, and a finished artifact is
+served again while no order of the store has been written since it was
+built (the newest Order.updated_at, which every order write bumps).
+"""
+import re
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Max
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order
+
+from .models import ReportJob
+
+# Longest range, in days, the report views build inside the request
+DEFAULT_INLINE_MAX_DAYS = 31
+
+# Same for PDFs, which are held in memory until finished (exports.PdfReport)
+DEFAULT_PDF_INLINE_MAX_DAYS = 7
+
+# Seconds a running job may go without reporting progress before it is
+# considered lost (worker killed) and queued again
+DEFAULT_STALE_AFTER = 15 * 60
+
+_FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+
+
+def inline_max_days(format_type=None):
+    if format_type == 'pdf':
+        return getattr(settings, 'REPORT_PDF_INLINE_MAX_DAYS', DEFAULT_PDF_INLINE_MAX_DAYS)
+    return getattr(settings, 'REPORT_INLINE_MAX_DAYS', DEFAULT_INLINE_MAX_DAYS)
+
+
+def data_stamp(store):
+    """Newest write to any order of the store, None when it has no orders"""
+    return Order.objects.filter(store=store).aggregate(stamp=Max('updated_at'))['stamp']
+
+
+def enqueue(store, report_type, format_type, start_date, end_date, branch_id=None, user=None):
+    """
+    The job answering this request: a queued or running identical one, a
+    finished one that is still current, or else a newly queued job
+    """
+    if report_type not in dict(ReportJob.REPORT_TYPES):
+        raise ValueError(f"Unknown report type {report_type!r}")
+    if format_type not in dict(ReportJob.FORMATS):
+        raise ValueError(f"Unknown report format {format_type!r}")
+    branch = store.branches.get(pk=branch_id) if branch_id else None
+
+    same = ReportJob.objects.filter(
+        store=store, report_type=report_type, format=format_type,
+        start_date=start_date, end_date=end_date, branch=branch,
+    )
+    pending = same.filter(status__in=[ReportJob.QUEUED, ReportJob.RUNNING]).order_by('created_at').first()
+    if pending is not None:
+        return pending
+
+    stamp = data_stamp(store)
+    current = same.filter(status=ReportJob.DONE).exclude(artifact='')
+    current = current.filter(data_stamp=stamp) if stamp is not None else current.filter(data_stamp__isnull=True)
+    done = current.order_by('-finished_at').first()
+    if done is not None:
+        return done
+
+    return ReportJob.objects.create(
+        store=store, requested_by=user, report_type=report_type, format=format_type,
+        start_date=start_date, end_date=end_date, branch=branch,
+    )
+
+
+def status(job):
+    """JSON-ready state of a job, with its download URL once done"""
+    return {
+        'id': str(job.id),
+        'report_type': job.report_type,
+        'format': job.format,
+        'start_date': job.start_date.isoformat(),
+        'end_date': job.end_date.isoformat(),
+        'branch': str(job.branch_id) if job.branch_id else None,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error or None,
+        'status_url': reverse('report_job_status', args=[job.id]),
+        'download_url': reverse('report_job_download', args=[job.id]) if job.status == ReportJob.DONE else None,
+    }
+
+
+# Worker side
+
+def _requeue_stale():
+    stale_after = getattr(settings, 'REPORT_JOB_STALE_AFTER', DEFAULT_STALE_AFTER)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return ReportJob.objects.filter(status=ReportJob.RUNNING, updated_at__lt=cutoff).update(
+        status=ReportJob.QUEUED, progress=0, updated_at=timezone.now(),
+    )
+
+
+def claim_next():
+    """
+    Mark the oldest queued job as running and return it, or None. The claim
+    is a conditional update, so concurrent workers never run the same job.
+    """
+    _requeue_stale()
+    queued = ReportJob.objects.filter(status=ReportJob.QUEUED).order_by('created_at').values_list('pk', flat=True)
+    for job_id in queued[:10]:
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.QUEUED).update(
+            status=ReportJob.RUNNING, progress=0, error='', started_at=now, updated_at=now,
+        )
+        if claimed:
+            return ReportJob.objects.select_related('store').get(pk=job_id)
+    return None
+
+
+def _set_progress(job, percent):
+    ReportJob.objects.filter(pk=job.pk).update(progress=percent, updated_at=timezone.now())
+
+
+def _filename(job, response):
+    match = _FILENAME_RE.search(response.get('Content-Disposition', ''))
+    if match:
+        return match.group(1)
+    extension = 'xlsx' if job.format == 'excel' else 'pdf'
+    return f"{job.report_type}_{job.start_date}_{job.end_date}.{extension}"
+
+
+def _drop_superseded(job):
+    """Delete the older finished jobs of the same request and their files"""
+    older = ReportJob.objects.filter(
+        store_id=job.store_id, report_type=job.report_type, format=job.format,
+        start_date=job.start_date, end_date=job.end_date, branch_id=job.branch_id,
+        status__in=[ReportJob.DONE, ReportJob.FAILED],
+    ).exclude(pk=job.pk)
+    for old in older:
+        if old.artifact:
+            old.artifact.delete(save=False)
+        old.delete()
+
+
+def run(job):
+    """Build a claimed job's report and store it; returns the job, done or failed"""
+    from .views import REPORT_BUILDERS
+
+    try:
+        stamp = data_stamp(job.store)
+        _set_progress(job, 5)
+        response = REPORT_BUILDERS[job.report_type](
+            job.store, job.start_date, job.end_date, job.format, job.branch_id,
+            progress=lambda fraction: _set_progress(job, 5 + int(fraction * 85)),
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Report builder answered {response.status_code}")
+
+        with tempfile.TemporaryFile() as output:
+            for chunk in (response.streaming_content if response.streaming else [response.content]):
+                output.write(chunk)
+            response.close()
+            output.seek(0)
+            job.filename = _filename(job, response)
+            job.artifact.save(job.filename, File(output), save=False)
+    except Exception as e:
+        job.status = ReportJob.FAILED
+        job.error = str(e) or e.__class__.__name__
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        return job
+
+    job.content_type = response['Content-Type']
+    job.status = ReportJob.DONE
+    job.progress = 100
+    job.data_stamp = stamp
+    job.finished_at = timezone.now()
+    job.save()
+    _drop_superseded(job)
+    return job
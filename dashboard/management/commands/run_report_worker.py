@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dashboard import jobs
+
+
+class Command(BaseCommand):
+    help = "Build queued report jobs; runs until stopped, or drains the queue once with --once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds to wait between checks of an empty queue")
+
+    def handle(self, *args, **options):
+        built = 0
+        while True:
+            close_old_connections()
+            job = jobs.claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            self.stdout.write(f"{job.id}: {job.get_report_type_display()} {job.start_date} to {job.end_date} ({job.format})")
+            job = jobs.run(job)
+            if job.status == job.DONE:
+                built += 1
+                self.stdout.write(self.style.SUCCESS(f"{job.id}: stored {job.artifact.name}"))
+            else:
+                self.stderr.write(f"{job.id}: failed: {job.error}")
+
+        self.stdout.write(self.style.SUCCESS(f"Built {built} reports"))
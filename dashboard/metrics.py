@@ -0,0 +1,166 @@
+"""
+Store dashboard metrics.
+
+DashboardMetrics computes every figure of the owner dashboard in a handful of
+grouped queries: one conditional-aggregate pass over the daily sales rollup
+for today, yesterday, this week and this month, then one per item list,
+breakdown, staff and branch table. Branch figures come from Order.branch, so
+the branch count does not change the query count.
+
+get_metrics() caches the result per store for ``DASHBOARD_METRICS_TTL``
+seconds. The key carries the store's sales version (orders/rollups.py), so
+a checkout or any change to a sold order shows up on the next request.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+
+from authentication import store_cache
+from authentication.models import Branch
+from orders import rollups
+from orders.models import DailyStoreSales, MenuItemDailySales, Order
+
+# Seconds computed metrics are served from the cache
+DEFAULT_TTL = 60
+
+ZERO = Decimal('0.00')
+
+
+def _percent_change(current, previous):
+    if not previous:
+        return 0
+    return round(float((current - previous) / previous * 100), 1)
+
+
+class DashboardMetrics:
+    """The owner dashboard figures of one store for its current business day"""
+
+    TOP_ITEMS_DAYS = 30
+
+    def __init__(self, store, today=None):
+        self.store = store
+        self.today = today or store.business_date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.week_start = self.today - timedelta(days=self.today.weekday())
+        self.month_start = self.today.replace(day=1)
+
+    def sales(self):
+        """Orders and revenue of today, yesterday, this week and this month; one query"""
+        periods = {
+            'today': Q(date=self.today),
+            'yesterday': Q(date=self.yesterday),
+            'week': Q(date__gte=self.week_start),
+            'month': Q(date__gte=self.month_start),
+        }
+        aggregates = {}
+        for name, condition in periods.items():
+            aggregates[f'{name}_revenue'] = Sum('revenue', filter=condition, default=ZERO)
+            aggregates[f'{name}_orders'] = Sum('orders_count', filter=condition, default=0)
+
+        start = min(self.yesterday, self.week_start, self.month_start)
+        return DailyStoreSales.objects.filter(
+            store=self.store, date__gte=start, date__lte=self.today
+        ).aggregate(**aggregates)
+
+    def items(self):
+        """(top items of the last 30 days, today's three most popular); one query"""
+        rows = list(
+            MenuItemDailySales.objects.filter(
+                store=self.store,
+                date__gte=self.today - timedelta(days=self.TOP_ITEMS_DAYS),
+                date__lte=self.today,
+            ).values('menu_item_id', 'menu_item__name', 'menu_item__price').annotate(
+                total_quantity=Sum('quantity'),
+                total_revenue=Sum('revenue'),
+                today_quantity=Sum('quantity', filter=Q(date=self.today), default=0),
+            ).order_by('-total_quantity', 'menu_item__name')
+        )
+        popular = sorted(
+            (row for row in rows if row['today_quantity']),
+            key=lambda row: (-row['today_quantity'], row['menu_item__name']),
+        )[:3]
+        return rows[:10], [
+            {'menu_item__name': row['menu_item__name'], 'total_quantity': row['today_quantity']}
+            for row in popular
+        ]
+
+    def payment_breakdown(self):
+        """Today's sales per payment method; one query"""
+        return list(
+            DailyStoreSales.objects.filter(store=self.store, date=self.today)
+            .values('payment_method')
+            .annotate(count=Sum('orders_count'), total_amount=Sum('revenue'))
+            .order_by('-total_amount')
+        )
+
+    def order_status_breakdown(self):
+        """All of today's orders per status, checked out or not; one query"""
+        return list(
+            Order.objects.filter(store=self.store, **self.store.date_lookups('create_date', self.today))
+            .order_by().values('status').annotate(count=Count('id')).order_by('-count')
+        )
+
+    def staff_performance(self):
+        """Today's ten best-selling cashiers; one query"""
+        return list(
+            Order.objects.filter(
+                store=self.store, checkout_status=True, user__isnull=False,
+                **self.store.date_lookups('create_date', self.today),
+            ).order_by().values('user__first_name', 'user__last_name').annotate(
+                orders_count=Count('id'), total_revenue=Sum('total_price'),
+            ).order_by('-total_revenue')[:10]
+        )
+
+    def branch_performance(self):
+        """Today's sales of every branch, from the orders' own branch; one query"""
+        sold = Q(
+            orders__checkout_status=True,
+            **self.store.date_lookups('orders__create_date', self.today),
+        )
+        return list(
+            Branch.objects.filter(store=self.store).values('id', 'name').annotate(
+                orders_count=Count('orders', filter=sold),
+                revenue=Sum('orders__total_price', filter=sold, default=ZERO),
+            ).order_by('name')
+        )
+
+    def compute(self):
+        sales = self.sales()
+        top_items, popular_items = self.items()
+
+        today_revenue, today_orders = sales['today_revenue'], sales['today_orders']
+        return {
+            'today_stats': {
+                'revenue': today_revenue,
+                'orders_count': today_orders,
+                'avg_order_value': today_revenue / today_orders if today_orders else ZERO,
+                'popular_items': popular_items,
+            },
+            'week_stats': {'revenue': sales['week_revenue'], 'orders_count': sales['week_orders']},
+            'month_stats': {'revenue': sales['month_revenue'], 'orders_count': sales['month_orders']},
+            'comparison_stats': {
+                'revenue_change': _percent_change(today_revenue, sales['yesterday_revenue']),
+                'orders_change': _percent_change(today_orders, sales['yesterday_orders']),
+            },
+            'top_items': top_items,
+            'payment_breakdown': self.payment_breakdown(),
+            'order_status_breakdown': self.order_status_breakdown(),
+            'branch_performance': self.branch_performance(),
+            'staff_performance': self.staff_performance(),
+        }
+
+
+def _cache_key(store, today):
+    return store_cache.store_key(store.pk, 'dashboard_metrics', rollups.sales_version(store.pk), today.isoformat())
+
+
+def get_metrics(store):
+    """The store's dashboard metrics, computed at most once per TTL or sales change"""
+    today = store.business_date()
+    return store_cache.fetch(
+        'dashboard_metrics', _cache_key(store, today),
+        lambda: DashboardMetrics(store, today).compute(),
+        getattr(settings, 'DASHBOARD_METRICS_TTL', DEFAULT_TTL),
+    )
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:20
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('authentication', '0005_auth_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(choices=[('daybook', 'Day Book'), ('sales_summary', 'Sales Summary'), ('payment_methods', 'Payment Methods'), ('menu_performance', 'Menu Performance'), ('tax_report', 'Tax Report'), ('order_status', 'Order Status')], max_length=30)),
+                ('format', models.CharField(choices=[('excel', 'Excel'), ('pdf', 'PDF')], default='excel', max_length=10)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('artifact', models.FileField(blank=True, upload_to='reports/%Y/%m/')),
+                ('filename', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('data_stamp', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='authentication.branch')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='authentication.store')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_queue_idx'), models.Index(fields=['store', 'report_type', 'format', 'start_date', 'end_date'], name='reportjob_request_idx')],
+            },
+        ),
+    ]
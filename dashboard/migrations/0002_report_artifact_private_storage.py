@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 05:01
+
+import os
+import uuid
+
+import dashboard.models
+from django.core.files.storage import FileSystemStorage
+from django.db import migrations, models
+
+
+def move_artifacts_out_of_media(apps, schema_editor):
+    """Move files written under MEDIA_ROOT/reports/ to the private storage, renamed"""
+    ReportJob = apps.get_model('dashboard', 'ReportJob')
+    public = FileSystemStorage()
+    private = dashboard.models.report_storage()
+    for job in ReportJob.objects.exclude(artifact='').iterator():
+        old_name = job.artifact.name
+        if not public.exists(old_name):
+            job.artifact = ''
+        else:
+            extension = os.path.splitext(old_name)[1].lower()
+            with public.open(old_name, 'rb') as source:
+                job.artifact = private.save(f'reports/{job.store_id}/{uuid.uuid4().hex}{extension}', source)
+            public.delete(old_name)
+        job.save(update_fields=['artifact'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_report_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='artifact',
+            field=models.FileField(blank=True, storage=dashboard.models.report_storage, upload_to=dashboard.models.report_artifact_path),
+        ),
+        migrations.RunPython(move_artifacts_out_of_media, migrations.RunPython.noop),
+    ]
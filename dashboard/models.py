@@ -1,3 +1,93 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 
-# Create your models here.
+from authentication.models import Branch, CustomUser, Store
+
+
+class PrivateStorage(FileSystemStorage):
+    """File system storage whose files have no public URL"""
+
+    def url(self, name):
+        raise ValueError("Private files have no URL; serve them through a view")
+
+
+def report_storage():
+    """
+    Storage of finished report files. They hold a store's sales, so they live
+    in REPORT_ARTIFACT_DIR, outside MEDIA_ROOT, and are only served through
+    the authenticated job download view.
+    """
+    return PrivateStorage(location=settings.REPORT_ARTIFACT_DIR)
+
+
+def report_artifact_path(job, filename):
+    """reports/<store>/<random>.<ext>; the download name is kept in job.filename"""
+    extension = os.path.splitext(filename)[1].lower()
+    return f'reports/{job.store_id}/{uuid.uuid4().hex}{extension}'
+
+
+class ReportJob(models.Model):
+    """
+    A report built outside the request by the report worker
+    (manage.py run_report_worker); see jobs.py
+    """
+    REPORT_TYPES = [
+        ('daybook', 'Day Book'),
+        ('sales_summary', 'Sales Summary'),
+        ('payment_methods', 'Payment Methods'),
+        ('menu_performance', 'Menu Performance'),
+        ('tax_report', 'Tax Report'),
+        ('order_status', 'Order Status'),
+    ]
+    FORMATS = [('excel', 'Excel'), ('pdf', 'PDF')]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='report_jobs')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    report_type = models.CharField(max_length=30, choices=REPORT_TYPES)
+    format = models.CharField(max_length=10, choices=FORMATS, default='excel')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, null=True, blank=True, related_name='report_jobs')
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)  # percent
+    error = models.TextField(blank=True)
+
+    artifact = models.FileField(upload_to=report_artifact_path, storage=report_storage, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    # Newest Order.updated_at of the store when the build started; a finished
+    # artifact is reused while no order of the store has been written since
+    data_stamp = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped with every progress report; a running job that stops updating is requeued
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Worker: oldest queued job first
+            models.Index(fields=['status', 'created_at'], name='reportjob_queue_idx'),
+            # Deduplication of identical requests
+            models.Index(
+                fields=['store', 'report_type', 'format', 'start_date', 'end_date'],
+                name='reportjob_request_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} {self.start_date} to {self.end_date} ({self.status})"
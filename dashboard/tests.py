@@ -1,3 +1,332 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from authentication import store_cache
+from authentication.models import Branch, CustomUser, Store, StoreUser
+from inventory.models import FoodCategory, Menu
+from orders import delta
+from orders.models import Order, OrderItem
+
+from . import exports, metrics
+from .models import PrivateStorage, ReportJob
+
+# Tests run against a private in-memory cache, never the configured shared one
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def workbook_rows(response):
+    """The values of every row of the first sheet of a streamed XLSX response"""
+    workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+    return workbook.active, [list(row) for row in workbook.active.iter_rows(values_only=True)]
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DashboardTestCase(TestCase):
+    """A store whose owner is logged in to the web dashboard and sells a latte"""
+
+    def setUp(self):
+        cache.clear()
+        # Hand the hit/miss counts to the test cache, not to the exit-time flush
+        self.addCleanup(store_cache.flush_stats)
+        self.store = Store.objects.create(
+            name='Cafe', store_code='CAFE1', owner_name='Owner', business_type='cafe',
+        )
+        self.user = CustomUser.objects.create_user(email='owner@example.com', first_name='Own', last_name='Er')
+        StoreUser.objects.create(store=self.store, user=self.user, role='store_owner', permissions=['all'])
+        self.web = Client()
+        self.web.force_login(self.user)
+        self.latte = Menu.objects.create(
+            store=self.store, category=FoodCategory.objects.create(store=self.store, name='Drinks'),
+            name='Latte', portion='Small', diet='Veg', price=Decimal('10.00'),
+        )
+
+    def sell(self, quantity=1, payment_status='Paid', **extra):
+        """A checked-out order of ``quantity`` lattes, committed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(store=self.store, order_method='Takeaway', user=self.user, **extra)
+            OrderItem.objects.create(order=order, menu_item=self.latte, quantity=quantity, price=self.latte.price)
+            order.refresh_from_db()
+            order.checkout_status = True
+            order.payment_status = payment_status
+            order.payment_method = 'Cash'
+            order.save()
+        return order
+
+
+class ActiveOrdersDeltaTests(DashboardTestCase):
+    def poll(self, cursor=None):
+        response = self.web.get('/dashboard/b2b/active-orders/', {'since': cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_delta_lists_changed_removed_and_deleted_orders(self):
+        # Orders written before the cursor's overlap window
+        earlier = timezone.now() - delta.CURSOR_OVERLAP * 2
+        with mock.patch('django.utils.timezone.now', return_value=earlier):
+            changed, done, gone, _unchanged = (
+                Order.objects.create(store=self.store, order_method='B2B') for _ in range(4)
+            )
+        cursor = self.poll()['cursor']
+
+        changed.special_instructions = 'Deliver by noon'
+        changed.save()
+        done.completion_status = True
+        done.save()
+        gone_id = gone.id
+        gone.delete()
+
+        body = self.poll(cursor)
+        self.assertEqual([order['id'] for order in body['orders']], [changed.id])
+        self.assertEqual(body['removed'], [done.id])
+        self.assertEqual(body['deleted'], [gone_id])
+
+    def test_bad_cursor_is_refused(self):
+        response = self.web.get('/dashboard/b2b/active-orders/', {'since': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DashboardMetricsTests(DashboardTestCase):
+    def test_figures_come_from_the_rollups(self):
+        self.sell(2)
+        self.sell(1, payment_status='Pending')
+        Order.objects.create(store=self.store, order_method='Takeaway')  # not checked out
+
+        result = metrics.DashboardMetrics(self.store).compute()
+        today = result['today_stats']
+        self.assertEqual((today['orders_count'], today['revenue']), (2, Decimal('30.00')))
+        self.assertEqual(today['avg_order_value'], Decimal('15.00'))
+        self.assertEqual(today['popular_items'], [{'menu_item__name': 'Latte', 'total_quantity': 3}])
+        self.assertEqual(result['week_stats']['orders_count'], 2)
+        self.assertEqual(result['comparison_stats'], {'revenue_change': 0, 'orders_change': 0})
+        self.assertEqual(sorted(row['count'] for row in result['order_status_breakdown']), [3])
+        self.assertEqual(result['staff_performance'][0]['orders_count'], 2)
+
+    def test_query_count_does_not_grow_with_branches(self):
+        for code in ('A', 'B', 'C'):
+            Branch.objects.create(store=self.store, name=f'Branch {code}', branch_code=code)
+        self.sell()
+        with self.assertNumQueries(6):
+            result = metrics.DashboardMetrics(self.store).compute()
+        self.assertEqual(len(result['branch_performance']), 3)
+
+    def test_branch_performance_follows_the_orders_branch(self):
+        main = Branch.objects.create(store=self.store, name='Main', branch_code='M')
+        Branch.objects.create(store=self.store, name='Annex', branch_code='A')
+        self.sell(2, branch=main)
+        self.sell(1, branch=main)
+        self.sell(1)
+        rows = metrics.DashboardMetrics(self.store).branch_performance()
+        self.assertEqual(
+            [(row['name'], row['orders_count'], row['revenue']) for row in rows],
+            [('Annex', 0, Decimal('0.00')), ('Main', 2, Decimal('30.00'))],
+        )
+
+    def test_cached_until_a_sale_changes(self):
+        self.sell()
+        self.assertEqual(metrics.get_metrics(self.store)['today_stats']['orders_count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            metrics.get_metrics(self.store)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'orders_' in q['sql']])
+
+        self.sell()
+        response = self.web.get('/dashboard/dashboard/refresh-metrics/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['today_orders'], 2)
+
+
+class ExcelExportTests(DashboardTestCase):
+    def test_rows_past_the_sample_keep_the_measured_widths(self):
+        export = exports.ExcelExport('A sheet title longer than thirty-one characters')
+        export.title('Report', span=3)
+        export.header(['Name', 'Quantity', 'Note'])
+        rows = [[f'Item {n}', n, 'x' * (n % 7 + 1)] for n in range(exports.SAMPLE_ROWS + 50)]
+        # Wider than anything in the sample, so it must not widen the column
+        rows.append(['An item name far wider than every sampled row', 1, 'x'])
+        export.rows(iter(rows))
+
+        sheet, values = workbook_rows(export.response('report.xlsx'))
+        self.assertEqual(sheet.title, 'A sheet title longer than thirt')
+        self.assertEqual(values[0][0], 'Report')
+        self.assertIn('A1:C1', [str(cells) for cells in sheet.merged_cells.ranges])
+        self.assertEqual(values[1], ['Name', 'Quantity', 'Note'])
+        self.assertEqual(values[2:], rows)
+        self.assertEqual(sheet.column_dimensions['A'].width, len('Item 199') + 2)
+        self.assertEqual(sheet.column_dimensions['C'].width, 7 + 2)
+
+    def test_daybook_lists_the_checked_out_orders(self):
+        first, second = self.sell(2), self.sell(1)
+        Order.objects.create(store=self.store, order_method='Takeaway')  # not checked out
+        today = self.store.business_date().isoformat()
+
+        response = self.web.post('/dashboard/daybook/', {'start_date': today, 'end_date': today, 'format': 'excel'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], exports.XLSX_CONTENT_TYPE)
+        _, values = workbook_rows(response)
+        header = values.index([
+            'Date', 'Token', 'Order ID', 'Table', 'Order Method',
+            'Items', 'Total Before Tax', 'Tax Amount', 'Total Amount', 'Payment Method',
+        ])
+        orders = values[header + 1:header + 3]
+        self.assertEqual(
+            [(row[2], row[5], row[8]) for row in orders], [(first.id, '2x Latte', 20), (second.id, '1x Latte', 10)],
+        )
+        self.assertEqual(values[header + 4][6:9], ['TOTALS:', 0, 30])
+
+
+class CsvExportTests(DashboardTestCase):
+    def test_lines_stream_a_batch_at_a_time(self):
+        consumed = []
+
+        def rows():
+            for n in range(exports.CSV_ROWS_PER_CHUNK * 2 + 1):
+                consumed.append(n)
+                yield [n, f'name, {n}']
+
+        response = exports.csv_response('rows.csv', ['n', 'name'], rows())
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="rows.csv"')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'n,name\r\n')
+        self.assertEqual(consumed, [])
+        next(chunks)
+        self.assertEqual(len(consumed), exports.CSV_ROWS_PER_CHUNK)
+
+        body = b'n,name\r\n' + b''.join(chunks)
+        parsed = list(csv.reader(io.StringIO(body.decode())))
+        self.assertEqual(parsed[-1], [str(exports.CSV_ROWS_PER_CHUNK * 2), f'name, {exports.CSV_ROWS_PER_CHUNK * 2}'])
+
+    def test_dashboard_report_lists_the_daily_sales(self):
+        self.sell(2)
+        self.sell(1)
+        response = self.web.get('/dashboard/dashboard/export-report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        parsed = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(parsed, [
+            ['Date', 'Orders', 'Revenue', 'Avg Order Value'],
+            [self.store.business_date().isoformat(), '2', '$30.00', '$15.00'],
+        ])
+
+
+class ReportJobTests(DashboardTestCase):
+    def setUp(self):
+        super().setUp()
+        # Finished reports go to a throwaway directory instead of REPORT_ARTIFACT_DIR
+        self.artifacts = tempfile.TemporaryDirectory()
+        field = ReportJob._meta.get_field('artifact')
+        storage = field.storage
+        field.storage = PrivateStorage(location=self.artifacts.name)
+        self.addCleanup(setattr, field, 'storage', storage)
+        self.addCleanup(self.artifacts.cleanup)
+        self.sale = self.sell()
+        self.today = self.store.business_date()
+
+    def request_report(self, days, format_type='excel', url='/dashboard/daybook/'):
+        return self.web.post(url, {
+            'start_date': (self.today - timedelta(days=days - 1)).isoformat(),
+            'end_date': self.today.isoformat(),
+            'format': format_type,
+        })
+
+    def run_worker(self):
+        call_command('run_report_worker', '--once', stdout=io.StringIO())
+
+    @override_settings(REPORT_INLINE_MAX_DAYS=31, REPORT_PDF_INLINE_MAX_DAYS=7)
+    def test_long_ranges_are_queued(self):
+        self.assertTrue(self.request_report(31).streaming)
+        self.assertEqual(self.request_report(32).status_code, 202)
+        self.assertTrue(self.request_report(7, 'pdf').streaming)
+        self.assertEqual(self.request_report(8, 'pdf').status_code, 202)
+
+    def test_artifacts_are_private_and_randomly_named(self):
+        job = self.request_report(60).json()
+        self.assertEqual(self.web.get(job['status_url'] + 'download/').status_code, 409)
+        self.run_worker()
+
+        status = self.web.get(job['status_url']).json()
+        self.assertEqual(status['status'], 'done', status)
+        response = self.web.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('daybook_report_', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+        artifact = ReportJob.objects.get(pk=job['id']).artifact
+        self.assertTrue(artifact.path.startswith(os.path.join(self.artifacts.name, 'reports', str(self.store.pk))))
+        self.assertFalse(artifact.path.startswith(os.path.abspath(settings.MEDIA_ROOT)))
+        self.assertNotIn('daybook', artifact.name)
+        with self.assertRaises(ValueError):
+            artifact.url
+
+        outsider = CustomUser.objects.create_user(email='other@example.com', first_name='Oth', last_name='Er')
+        client = Client()
+        client.force_login(outsider)
+        self.assertEqual(client.get(status['download_url']).status_code, 404)
+
+    def test_repeated_requests_share_a_job_until_orders_change(self):
+        first = self.request_report(60).json()
+        self.assertEqual(self.request_report(60).json()['id'], first['id'])
+        self.run_worker()
+        self.assertEqual(self.request_report(60).json()['id'], first['id'])
+
+        self.sale.special_instructions = 'Refunded'
+        self.sale.save()
+        second = self.request_report(60).json()
+        self.assertNotEqual(second['id'], first['id'])
+        self.assertEqual(second['status'], 'queued')
+
+        self.run_worker()
+        # The finished job replaces the older one and its file
+        self.assertEqual(str(ReportJob.objects.get().pk), second['id'])
+        self.assertEqual(len(os.listdir(os.path.join(self.artifacts.name, 'reports', str(self.store.pk)))), 1)
+
+
+class PdfReportTests(TestCase):
+    @override_settings(REPORT_PDF_MAX_PAGES=2)
+    def test_pdf_stops_at_the_page_limit(self):
+        report = exports.PdfReport('Day Book')
+        report.table(['Token', 'Total'])
+        with self.assertRaises(exports.PdfTooLarge):
+            report.rows([i, i * 10] for i in range(500))
+        self.assertEqual(report.page, 2)
+
+    def test_pdf_response(self):
+        report = exports.PdfReport('Day Book', subtitle='Today')
+        report.table(['Token', 'Total'])
+        report.rows([i, i * 10] for i in range(100))
+        report.row(['Total', 49500], total=True)
+        response = report.response('daybook.pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertGreater(report.page, 1)
+
+
+class DaybookPdfTests(DashboardTestCase):
+    def test_daybook_pdf_is_drawn_inline(self):
+        self.sell(3)
+        today = self.store.business_date().isoformat()
+        response = self.web.post('/dashboard/daybook/', {'start_date': today, 'end_date': today, 'format': 'pdf'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('daybook_report_', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    @override_settings(REPORT_PDF_MAX_PAGES=1)
+    def test_oversized_pdf_is_refused(self):
+        for _ in range(60):
+            self.sell()
+        today = self.store.business_date().isoformat()
+        response = self.web.post('/dashboard/daybook/', {'start_date': today, 'end_date': today, 'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('longer than 1 pages', response.json()['error'])
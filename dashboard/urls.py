@@ -48,6 +48,9 @@ urlpatterns = [
     path('menu-performance/', views.generate_menu_performance, name='generate_menu_performance'),
     path('tax-report/', views.generate_tax_report, name='generate_tax_report'),
     path('order-status/', views.generate_order_status, name='generate_order_status'),
+    path('reports/jobs/', views.report_job_create, name='report_job_create'),
+    path('reports/jobs/<uuid:job_id>/', views.report_job_status, name='report_job_status'),
+    path('reports/jobs/<uuid:job_id>/download/', views.report_job_download, name='report_job_download'),
 
      path('dashboard/chart-data/<str:chart_type>/', views.dashboard_chart_data, name='dashboard_chart_data'),
     
@@ -20,7 +20,6 @@ def signin(request):
         if user1 is not None:
             
             request.session['username'] = username
-            request.session['password'] = password
             login(request, user1)
             return redirect('dashboard')
         
@@ -46,36 +45,37 @@ from django.http import JsonResponse
 from django.db.models import Sum, Count, Avg, Q
 from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
 
 from authentication.models import Store, Branch, CustomUser, StoreUser
 from inventory.models import Menu, FoodCategory, Tax
-from django.db.models.functions import ExtractWeekDay
+from orders import rollups
+from . import metrics as dashboard_metrics
+from .exports import CHUNK_SIZE, csv_response
+from . import jobs as report_jobs
+from .models import ReportJob
 
 
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse
 from django.template.loader import render_to_string
 import json
 from datetime import datetime
-import csv
 
 @login_required
 def refresh_metrics(request):
     """AJAX endpoint to refresh dashboard metrics without full page reload"""
-    try:
-        store = request.user.store_memberships.all()[0].store
-    except (IndexError, AttributeError):
+    store = request.store_ctx.store
+    if store is None:
         return JsonResponse({'error': 'No store found'}, status=400)
     
-    today = timezone.now().date()
-    yesterday = today - timedelta(days=1)
-    
     # Get refreshed stats
-    today_stats = get_today_stats(store, today)
-    comparison_stats = get_comparison_stats(store, today, yesterday)
+    metrics = dashboard_metrics.get_metrics(store)
+    today_stats = metrics['today_stats']
+    comparison_stats = metrics['comparison_stats']
     
     return JsonResponse({
         'today_revenue': float(today_stats['revenue']),
@@ -89,282 +89,60 @@ def refresh_metrics(request):
 @login_required
 def export_dashboard_report(request):
     """Export dashboard data as CSV"""
-    try:
-        store = request.user.store_memberships.all()[0].store
-    except (IndexError, AttributeError):
+    store = request.store_ctx.store
+    if store is None:
         return JsonResponse({'error': 'No store found'}, status=400)
     
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{store.name}_dashboard_report_{datetime.now().strftime("%Y%m%d")}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Write headers
-    writer.writerow(['Date', 'Orders', 'Revenue', 'Avg Order Value'])
-    
     # Get last 30 days data
-    end_date = timezone.now().date()
+    end_date = store.business_date()
     start_date = end_date - timedelta(days=30)
     
-    daily_data = Order.objects.filter(
-        store=store,
-        create_date__date__gte=start_date,
-        create_date__date__lte=end_date,
-        checkout_status=True
-    ).annotate(
-        date=TruncDate('create_date')
-    ).values('date').annotate(
-        orders_count=Count('id'),
-        revenue=Sum('total_price')
-    ).order_by('date')
+    daily_data = rollups.daily_sales(store, start_date, end_date)
     
-    # Write data rows
-    for item in daily_data:
-        avg_value = item['revenue'] / item['orders_count'] if item['orders_count'] > 0 else 0
-        writer.writerow([
+    rows = (
+        [
             item['date'].strftime('%Y-%m-%d'),
             item['orders_count'],
             f"${item['revenue']:.2f}",
-            f"${avg_value:.2f}"
-        ])
-    
-    return response
+            f"${item['revenue'] / item['orders_count'] if item['orders_count'] > 0 else 0:.2f}",
+        ]
+        for item in daily_data
+    )
+    return csv_response(
+        f'{store.name}_dashboard_report_{datetime.now().strftime("%Y%m%d")}.csv',
+        ['Date', 'Orders', 'Revenue', 'Avg Order Value'],
+        rows,
+    )
 
 @store_owner_access
 def dashboard(request):
     """Main dashboard view for store owner"""
-    try:
-        # Get store from user's membership
-        store = request.user.store_memberships.all()[0].store
-    except (IndexError, AttributeError):
+    # Get store from user's membership
+    store = request.store_ctx.store
+    if store is None:
         return render(request, 'index.html')
     
-    # Date filters
-    today = timezone.now().date()
-    yesterday = today - timedelta(days=1)
-    week_start = today - timedelta(days=today.weekday())
-    month_start = today.replace(day=1)
-    
-    # Basic stats
+    # Cached per store until the TTL runs out or a sale changes
     context = {
         'store': store,
-        'today_stats': get_today_stats(store, today),
-        'week_stats': get_week_stats(store, week_start, today),
-        'month_stats': get_month_stats(store, month_start, today),
-        'comparison_stats': get_comparison_stats(store, today, yesterday),
-        'top_items': get_top_selling_items(store, today - timedelta(days=30), today),
         'recent_orders': get_recent_orders(store),
-        'payment_breakdown': get_payment_breakdown(store, today),
-        'order_status_breakdown': get_order_status_breakdown(store, today),
-        'branch_performance': get_branch_performance(store, today),
-        'staff_performance': get_staff_performance(store, today),
+        **dashboard_metrics.get_metrics(store),
     }
     
     return render(request, 'dashboard_index.html', context)
 
-def get_today_stats(store, today):
-    """Get today's key metrics"""
-    today_orders = Order.objects.filter(
-        store=store, 
-        create_date__date=today,
-        checkout_status=True
-    )
-    
-    today_revenue = today_orders.aggregate(
-        total=Sum('total_price')
-    )['total'] or Decimal('0.00')
-    
-    today_orders_count = today_orders.count()
-    
-    # Average order value
-    avg_order_value = today_revenue / today_orders_count if today_orders_count > 0 else Decimal('0.00')
-    
-    # Most sold items today
-    popular_items = OrderItem.objects.filter(
-        order__store=store,
-        order__create_date__date=today,
-        order__checkout_status=True
-    ).values('menu_item__name').annotate(
-        total_quantity=Sum('quantity')
-    ).order_by('-total_quantity')[:3]
-    
-    return {
-        'revenue': today_revenue,
-        'orders_count': today_orders_count,
-        'avg_order_value': avg_order_value,
-        'popular_items': popular_items,
-    }
-
-def get_week_stats(store, week_start, today):
-    """Get this week's metrics"""
-    week_orders = Order.objects.filter(
-        store=store,
-        create_date__date__gte=week_start,
-        create_date__date__lte=today,
-        checkout_status=True
-    )
-    
-    week_revenue = week_orders.aggregate(
-        total=Sum('total_price')
-    )['total'] or Decimal('0.00')
-    
-    return {
-        'revenue': week_revenue,
-        'orders_count': week_orders.count(),
-    }
-
-def get_month_stats(store, month_start, today):
-    """Get this month's metrics"""
-    month_orders = Order.objects.filter(
-        store=store,
-        create_date__date__gte=month_start,
-        create_date__date__lte=today,
-        checkout_status=True
-    )
-    
-    month_revenue = month_orders.aggregate(
-        total=Sum('total_price')
-    )['total'] or Decimal('0.00')
-    
-    return {
-        'revenue': month_revenue,
-        'orders_count': month_orders.count(),
-    }
-
-def get_comparison_stats(store, today, yesterday):
-    """Compare today vs yesterday"""
-    yesterday_orders = Order.objects.filter(
-        store=store,
-        create_date__date=yesterday,
-        checkout_status=True
-    )
-    
-    today_orders = Order.objects.filter(
-        store=store,
-        create_date__date=today,
-        checkout_status=True
-    )
-    
-    yesterday_revenue = yesterday_orders.aggregate(
-        total=Sum('total_price')
-    )['total'] or Decimal('0.00')
-    
-    today_revenue = today_orders.aggregate(
-        total=Sum('total_price')
-    )['total'] or Decimal('0.00')
-    
-    # Calculate percentage changes
-    revenue_change = 0
-    orders_change = 0
-    
-    if yesterday_revenue > 0:
-        revenue_change = float(((today_revenue - yesterday_revenue) / yesterday_revenue) * 100)
-    
-    yesterday_count = yesterday_orders.count()
-    today_count = today_orders.count()
-    
-    if yesterday_count > 0:
-        orders_change = ((today_count - yesterday_count) / yesterday_count) * 100
-    
-    return {
-        'revenue_change': round(revenue_change, 1),
-        'orders_change': round(orders_change, 1),
-    }
-
-def get_top_selling_items(store, start_date, end_date):
-    """Get top selling items in date range"""
-    return OrderItem.objects.filter(
-        order__store=store,
-        order__create_date__date__gte=start_date,
-        order__create_date__date__lte=end_date,
-        order__checkout_status=True
-    ).values(
-        'menu_item__name',
-        'menu_item__price'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum('price')
-    ).order_by('-total_quantity')[:10]
-
 def get_recent_orders(store):
     """Get recent orders for the store"""
     return Order.objects.filter(
         store=store
     ).select_related('table', 'user').order_by('-create_date')[:10]
 
-def get_payment_breakdown(store, date):
-    """Get payment method breakdown for today"""
-    return Checkout.objects.filter(
-        order__store=store,
-        datetime__date=date
-    ).values('payment_method').annotate(
-        count=Count('id'),
-        total_amount=Sum('total_price')
-    ).order_by('-total_amount')
-
-def get_order_status_breakdown(store, date):
-    """Get order status breakdown"""
-    return Order.objects.filter(
-        store=store,
-        create_date__date=date
-    ).values('status').annotate(
-        count=Count('id')
-    ).order_by('-count')
-
-def get_branch_performance(store, date):
-    """Get branch-wise performance if multiple branches"""
-    # Note: Based on your model, orders don't directly link to branches
-    # You might need to add branch field to Order model or get it through user
-    branches = store.branches.all()
-    branch_data = []
-    
-    for branch in branches:
-        # Get orders from users assigned to this branch
-        branch_users = branch.branch_users.values_list('user_id', flat=True)
-        branch_orders = Order.objects.filter(
-            store=store,
-            user_id__in=branch_users,
-            create_date__date=date,
-            checkout_status=True
-        )
-        
-        branch_revenue = branch_orders.aggregate(
-            total=Sum('total_price')
-        )['total'] or Decimal('0.00')
-        
-        branch_data.append({
-            'name': branch.name,
-            'orders_count': branch_orders.count(),
-            'revenue': branch_revenue
-        })
-    
-    return branch_data
-
-def get_staff_performance(store, date):
-    """Get staff performance data"""
-    staff_performance = Order.objects.filter(
-        store=store,
-        create_date__date=date,
-        checkout_status=True,
-        user__isnull=False
-    ).values(
-        'user__first_name',
-        'user__last_name'
-    ).annotate(
-        orders_count=Count('id'),
-        total_revenue=Sum('total_price')
-    ).order_by('-total_revenue')[:10]
-    
-    return staff_performance
-
 # AJAX API endpoints for charts
 @login_required
 def dashboard_chart_data(request, chart_type):
     """API endpoint for chart data"""
-    try:
-        store = request.user.store_memberships.all()[0].store
-    except (IndexError, AttributeError):
+    store = request.store_ctx.store
+    if store is None:
         return JsonResponse({'error': 'No store found'}, status=400)
     
     if chart_type == 'revenue_trend':
@@ -380,19 +158,10 @@ def dashboard_chart_data(request, chart_type):
 
 def get_revenue_trend_data(request, store):
     """Get revenue trend for last 30 days"""
-    end_date = timezone.now().date()
+    end_date = store.business_date()
     start_date = end_date - timedelta(days=30)
     
-    daily_revenue = Order.objects.filter(
-        store=store,
-        create_date__date__gte=start_date,
-        create_date__date__lte=end_date,
-        checkout_status=True
-    ).annotate(
-        date=TruncDate('create_date')
-    ).values('date').annotate(
-        revenue=Sum('total_price')
-    ).order_by('date')
+    daily_revenue = rollups.daily_sales(store, start_date, end_date)
     
     return JsonResponse({
         'labels': [item['date'].strftime('%m-%d') for item in daily_revenue],
@@ -401,16 +170,7 @@ def get_revenue_trend_data(request, store):
 
 def get_category_sales_data(request, store):
     """Get category-wise sales data"""
-    category_sales = OrderItem.objects.filter(
-        order__store=store,
-        order__create_date__date=timezone.now().date(),
-        order__checkout_status=True
-    ).values(
-        'menu_item__category__name'
-    ).annotate(
-        total_revenue=Sum('price'),
-        total_quantity=Sum('quantity')
-    ).order_by('-total_revenue')
+    category_sales = rollups.category_sales(store, store.business_date())
     
     return JsonResponse({
         'labels': [item['menu_item__category__name'] for item in category_sales],
@@ -419,22 +179,8 @@ def get_category_sales_data(request, store):
     })
 
 def get_hourly_orders_data(request, store):
-    """Get hourly order distribution for today"""
-    
-    
-    hourly_orders = Order.objects.filter(
-        store=store,
-        create_date__date=timezone.now().date()
-    ).annotate(
-        hour=ExtractWeekDay('create_date', 'hour')
-    ).values('hour').annotate(
-        count=Count('id')
-    ).order_by('hour')
-    
-    # Create 24-hour data
-    hourly_data = [0] * 24
-    for item in hourly_orders:
-        hourly_data[item['hour']] = item['count']
+    """Get hourly distribution of today's checked-out orders"""
+    hourly_data = rollups.hourly_orders(store, store.business_date())
     
     return JsonResponse({
         'labels': [f'{i}:00' for i in range(24)],
@@ -443,42 +189,20 @@ def get_hourly_orders_data(request, store):
 
 def get_weekly_comparison_data(request, store):
     """Get current week vs last week comparison"""
-    today = timezone.now().date()
+    today = store.business_date()
     current_week_start = today - timedelta(days=today.weekday())
     last_week_start = current_week_start - timedelta(days=7)
     last_week_end = current_week_start - timedelta(days=1)
     
-    current_week_data = Order.objects.filter(
-        store=store,
-        create_date__date__gte=current_week_start,
-        create_date__date__lte=today,
-        checkout_status=True
-    ).annotate(
-        day=ExtractWeekDay('create_date', 'weekday')
-    ).values('day').annotate(
-        revenue=Sum('total_price')
-    ).order_by('day')
-    
-    last_week_data = Order.objects.filter(
-        store=store,
-        create_date__date__gte=last_week_start,
-        create_date__date__lte=last_week_end,
-        checkout_status=True
-    ).annotate(
-        day=ExtractWeekDay('create_date', 'weekday')
-    ).values('day').annotate(
-        revenue=Sum('total_price')
-    ).order_by('day')
-    
-    # Convert to arrays
+    # Convert to Monday-first arrays
     current_week_revenue = [0.0] * 7
     last_week_revenue = [0.0] * 7
     
-    for item in current_week_data:
-        current_week_revenue[item['day'] - 1] = float(item['revenue'])
+    for item in rollups.daily_sales(store, current_week_start, today):
+        current_week_revenue[item['date'].weekday()] = float(item['revenue'])
     
-    for item in last_week_data:
-        last_week_revenue[item['day'] - 1] = float(item['revenue'])
+    for item in rollups.daily_sales(store, last_week_start, last_week_end):
+        last_week_revenue[item['date'].weekday()] = float(item['revenue'])
     
     return JsonResponse({
         'labels': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
@@ -500,7 +224,7 @@ def Add_Category(request):
     if request.method == "POST":
         pic = request.FILES['pic']
         cname = request.POST['cname']
-        foodcategory = FoodCategory.objects.create(image = pic, name= cname, store = request.user.store_memberships.all()[0].store )
+        foodcategory = FoodCategory.objects.create(image = pic, name= cname, store = request.store_ctx.store )
         foodcategory.save()
         messages.success(request,"Food Category Addedd...")
         return redirect("List_Category")
@@ -509,7 +233,7 @@ def Add_Category(request):
 
 @store_owner_access 
 def List_Category(request):
-    store = request.user.store_memberships.all()[0].store
+    store = request.store_ctx.store
     food_category = FoodCategory.objects.filter(store = store)
    
     context = {
@@ -583,17 +307,17 @@ def ListTax(request):
 @store_owner_access 
 def Add_Product(request):
     if request.method == "POST":
-        form = MenuForm(request.POST, request.FILES, user=request.user)
+        form = MenuForm(request.POST, request.FILES, store=request.store_ctx.store)
         if form.is_valid():
             menu_item = form.save(commit=False)
-            menu_item.store = request.user.store_memberships.all()[0].store
+            menu_item.store = request.store_ctx.store
             menu_item.save()
             messages.success(request,"menu Created")
             return redirect("List_Product")  # replace with your menu list view name
         else:
             messages.error(request,f"Something wrong - Error {form.errors.as_text}")
             return redirect("Add_Product")
-    form = MenuForm(user=request.user)
+    form = MenuForm(store=request.store_ctx.store)
         
     context = {
         "form":form
@@ -602,7 +326,7 @@ def Add_Product(request):
 
 @store_owner_access 
 def List_Product(request):
-    menu = Menu.objects.filter(store = request.user.store_memberships.all()[0].store)
+    menu = Menu.objects.filter(store = request.store_ctx.store)
 
     context = {
         "menu":menu,
@@ -613,7 +337,7 @@ def List_Product(request):
 def EditProduct(request, pk):
     menu_item = get_object_or_404(Menu, id = pk)
     if request.method == "POST":
-        form = MenuForm(request.POST, request.FILES, user=request.user,instance = menu_item )
+        form = MenuForm(request.POST, request.FILES, store=request.store_ctx.store, instance = menu_item )
         if form.is_valid():
             menu_item = form.save()
             messages.success(request, 'Menu updated successfully')
@@ -621,7 +345,7 @@ def EditProduct(request, pk):
         else:
             messages.error(request,f"Something wrong - Error {form.errors.as_text}")
             return redirect("EditProduct")
-    form = MenuForm(user=request.user, instance = menu_item )
+    form = MenuForm(store=request.store_ctx.store, instance = menu_item )
         
     
     context = {
@@ -693,11 +417,11 @@ def Delete_Table(request,pk):
 
 # user management 
 
-# Get all users of a store where a given user is store_owner
-def get_store_users(owner_user):
+# Get all users of the store where the request's user is store_owner
+def get_store_users(store_ctx):
     try:
         # Find the store(s) where this user is the store_owner
-        store_user = StoreUser.objects.get(user=owner_user, role="store_owner")
+        store_user = store_ctx.get_membership(roles=["store_owner"])
         store = store_user.store
 
         # Get all users of the same store
@@ -709,7 +433,7 @@ def get_store_users(owner_user):
 
 @store_owner_access 
 def ListUser(request):
-    contacts = get_store_users(request.user)
+    contacts = get_store_users(request.store_ctx)
 
     context = {
         'contacts':contacts
@@ -720,7 +444,7 @@ def ListUser(request):
 
 @store_owner_access 
 def AddUser(request):
-    store = request.user.store_memberships.all()[0].store
+    store = request.store_ctx.store
     if request.method == "POST":
         form = StoreAddUserForm(request.POST, request.FILES)
         if form.is_valid():
@@ -761,21 +485,51 @@ from django.db.models import Q, Sum, Count
 from django.http import JsonResponse
 from datetime import datetime, timedelta
 from orders.models import Order, OrderItem, Checkout
+from orders import events
 from django.contrib import messages
 
 
 
 
+def _parse_day(value):
+    """A YYYY-MM-DD query value as a date; None when missing or malformed"""
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+SALES_CSV_HEADER = [
+    'Date', 'Token', 'Order ID', 'Table', 'Order Method', 'Branch', 'Status',
+    'Payment Status', 'Payment Method', 'Total Before Tax', 'Tax Amount', 'Total Amount',
+]
+
+
+def _sales_csv(orders, store, filename):
+    """Stream a filtered order queryset as CSV, timestamps in store time"""
+    rows = orders.prefetch_related(None).values_list(
+        'create_date', 'token', 'id', 'table__Table_number', 'order_method', 'branch__name', 'status',
+        'payment_status', 'payment_method', 'total_before_tax', 'total_tax', 'total_price',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    tz = store.tzinfo
+    return csv_response(
+        filename,
+        SALES_CSV_HEADER,
+        ([timezone.localtime(row[0], tz).strftime('%Y-%m-%d %H:%M'), *row[1:]] for row in rows),
+    )
+
+
 @store_owner_access 
 def list_sale(request):
     # Get user's store
-    store = request.user.store_memberships.all()[0].store
+    store = request.store_ctx.store
     
     # Get filter parameters
     search_query = request.GET.get('search', '')
     status_filter = request.GET.get('status', '')
     payment_status_filter = request.GET.get('payment_status', '')
     order_method_filter = request.GET.get('order_method', '')
+    branch_filter = request.GET.get('branch', '')
     date_from = request.GET.get('date_from', '')
     date_to = request.GET.get('date_to', '')
     
@@ -802,15 +556,24 @@ def list_sale(request):
     if order_method_filter:
         orders = orders.filter(order_method=order_method_filter)
     
-    if date_from:
-        orders = orders.filter(create_date__date__gte=date_from)
+    branches = list(store.branches.order_by('name'))
+    if branch_filter in {str(branch.id) for branch in branches}:
+        orders = orders.filter(branch_id=branch_filter)
     
-    if date_to:
-        orders = orders.filter(create_date__date__lte=date_to)
+    day_from = _parse_day(date_from)
+    if day_from:
+        orders = orders.filter(create_date__gte=store.day_range(day_from)[0])
+    
+    day_to = _parse_day(date_to)
+    if day_to:
+        orders = orders.filter(create_date__lt=store.day_range(day_to)[1])
     
     # Order by latest first
     orders = orders.order_by('-create_date')
     
+    if request.GET.get('export') == 'csv':
+        return _sales_csv(orders, store, f"sales_{store.business_date()}.csv")
+    
     # Calculate summary statistics
     total_sales = orders.aggregate(
         total_amount=Sum('total_price'),
@@ -839,11 +602,13 @@ def list_sale(request):
         'status_filter': status_filter,
         'payment_status_filter': payment_status_filter,
         'order_method_filter': order_method_filter,
+        'branch_filter': branch_filter,
         'date_from': date_from,
         'date_to': date_to,
         'status_choices': status_choices,
         'payment_status_choices': payment_status_choices,
         'order_method_choices': order_method_choices,
+        'branches': branches,
         'store': store,
     }
     
@@ -853,7 +618,7 @@ def list_sale(request):
 @store_owner_access
 def sale_detail(request, order_id):
     """View individual sale details"""
-    store = request.user.store_memberships.all()[0].store
+    store = request.store_ctx.store
     
     # Get the order with all related data
     order = get_object_or_404(
@@ -877,20 +642,12 @@ def sale_detail(request, order_id):
     # Calculate item-wise totals
     items_with_totals = []
     for item in order_items:
-        addon_total = sum(addon.price for addon in item.add_ons.all())
-        item_subtotal = (item.price + addon_total) * item.quantity
-        
-        # Calculate tax for this item
-        tax_amount = 0
-        for tax in item.tax.all():
-            tax_amount += (item_subtotal * tax.tax_percentage) / 100
-        
         items_with_totals.append({
             'item': item,
-            'addon_total': addon_total,
-            'subtotal': item_subtotal,
-            'tax_amount': tax_amount,
-            'total_with_tax': item_subtotal + tax_amount
+            'addon_total': item.addon_total,
+            'subtotal': item.line_subtotal,
+            'tax_amount': item.line_tax,
+            'total_with_tax': item.line_total
         })
     
     context = {
@@ -907,13 +664,14 @@ def sale_detail(request, order_id):
 def update_order_status(request, order_id):
     """AJAX view to update order status"""
     if request.method == 'POST':
-        store = request.user.store_memberships.all()[0].store
+        store = request.store_ctx.store
         order = get_object_or_404(Order, id=order_id, store=store)
         
         new_status = request.POST.get('status')
         if new_status in dict(Order.status_options):
             order.status = new_status
             order.save()
+            events.publish_order_event(order, events.STATUS_CHANGED)
             return JsonResponse({
                 'success': True,
                 'message': f'Order status updated to {new_status}'
@@ -925,10 +683,10 @@ def update_order_status(request, order_id):
 @store_owner_access
 def sales_analytics(request):
     """View for sales analytics and reports"""
-    store = request.user.store_memberships.all()[0].store
+    store = request.store_ctx.store
     
     # Get date range (default to last 30 days)
-    end_date = datetime.now().date()
+    end_date = store.business_date()
     start_date = end_date - timedelta(days=30)
     
     if request.GET.get('start_date'):
@@ -937,40 +695,19 @@ def sales_analytics(request):
         end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
     
     # Get sales data
-    sales_data = Order.objects.filter(
-        store=store,
-        checkout_status=True,
-        create_date__date__range=[start_date, end_date]
-    ).aggregate(
-        total_revenue=Sum('total_price'),
-        total_orders=Count('id'),
-        total_tax_collected=Sum('total_tax'),
-        avg_order_value=Sum('total_price') / Count('id') if Count('id') > 0 else 0
-    )
+    totals = rollups.sales_totals(store, start_date, end_date)
+    sales_data = {
+        'total_revenue': totals['revenue'],
+        'total_orders': totals['orders_count'],
+        'total_tax_collected': totals['tax'],
+        'avg_order_value': totals['avg_order_value'],
+    }
     
     # Sales by method
-    sales_by_method = Order.objects.filter(
-        store=store,
-        checkout_status=True,
-        create_date__date__range=[start_date, end_date]
-    ).values('order_method').annotate(
-        count=Count('id'),
-        revenue=Sum('total_price')
-    ).order_by('-revenue')
+    sales_by_method = rollups.sales_by_method(store, start_date, end_date)
     
     # Top selling items
-    top_items = OrderItem.objects.filter(
-        order__store=store,
-        order__checkout_status=True,
-        order__create_date__date__range=[start_date, end_date],
-        is_saved_for_later=False
-    ).values(
-        'menu_item__name',
-        'menu_item__food_category__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum('price') * Sum('quantity')
-    ).order_by('-total_quantity')[:10]
+    top_items = rollups.item_sales(store, start_date, end_date)[:10]
     
     context = {
         'sales_data': sales_data,
@@ -997,18 +734,15 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 import pandas as pd
-import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
-from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.units import inch
-import io
 from inventory.models import Menu, Tax, FoodCategory
 from authentication.models import Store
+from orders.pricing import TaxBreakdown, price_items
+from collections import defaultdict
+from .exports import CHUNK_SIZE, HEADER_FONT, ExcelExport, PdfReport, batches
 
 
 @login_required
@@ -1016,19 +750,18 @@ def reports_dashboard(request):
     """Main reports dashboard view"""
     try:
         # Get user's store
-        store = request.user.store_memberships.all()[0].store
+        store = request.store_ctx.store
+        if store is None:
+            return render(request, 'error.html', {'message': 'No store assigned to user'})
         
         # Get today's date
-        today = timezone.now().date()
+        today = store.business_date()
         
         # Calculate quick statistics
-        today_orders = Order.objects.filter(store=store, create_date__date=today)
+        today_orders = Order.objects.filter(store=store, **store.date_lookups('create_date', today))
         today_orders_count = today_orders.count()
         
-        today_revenue = today_orders.filter(
-            checkout_status=True, 
-            payment_status='Paid'
-        ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
+        today_revenue = rollups.sales_totals(store, today)['paid_revenue']
         
         pending_orders_count = Order.objects.filter(
             store=store, 
@@ -1037,18 +770,16 @@ def reports_dashboard(request):
         
         # This month's revenue
         first_day_of_month = today.replace(day=1)
-        month_revenue = Order.objects.filter(
-            store=store,
-            create_date__date__gte=first_day_of_month,
-            checkout_status=True,
-            payment_status='Paid'
-        ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
+        month_revenue = rollups.sales_totals(store, first_day_of_month, today)['paid_revenue']
         
         context = {
             'today_orders_count': today_orders_count,
             'today_revenue': today_revenue,
             'pending_orders_count': pending_orders_count,
             'month_revenue': month_revenue,
+            'branches': store.branches.order_by('name'),
+            'report_inline_max_days': report_jobs.inline_max_days(),
+            'report_pdf_inline_max_days': report_jobs.inline_max_days('pdf'),
         }
         
         return render(request, 'reports/dashboard.html', context)
@@ -1057,393 +788,281 @@ def reports_dashboard(request):
         return render(request, 'error.html', {'message': 'No store assigned to user'})
 
 
+def _report_orders(store, branch_id=None):
+    """The store's orders, narrowed to one of its branches if given"""
+    orders = Order.objects.filter(store=store)
+    if branch_id:
+        orders = orders.filter(branch=store.branches.get(pk=branch_id))
+    return orders
+
+
+def _report_params(request):
+    """(store, start_date, end_date, format, branch id) posted with a report form"""
+    store = request.store_ctx.store
+    if store is None:
+        raise ValueError("No store assigned to user")
+    start_date = datetime.strptime(request.POST.get('start_date'), '%Y-%m-%d').date()
+    end_date = datetime.strptime(request.POST.get('end_date'), '%Y-%m-%d').date()
+    if start_date > end_date:
+        raise ValueError("Start date cannot be after end date")
+    format_type = 'pdf' if request.POST.get('format') == 'pdf' else 'excel'
+    return store, start_date, end_date, format_type, request.POST.get('branch') or None
+
+
+def _report_view(request, report_type):
+    """
+    Build a report inside the request, or queue it as a ReportJob when the
+    range is longer than REPORT_INLINE_MAX_DAYS (REPORT_PDF_INLINE_MAX_DAYS
+    for PDFs); 202 with the job status
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        store, start_date, end_date, format_type, branch_id = _report_params(request)
+        if (end_date - start_date).days + 1 > report_jobs.inline_max_days(format_type):
+            job = report_jobs.enqueue(store, report_type, format_type, start_date, end_date, branch_id, request.user)
+            return JsonResponse(report_jobs.status(job), status=202)
+        return REPORT_BUILDERS[report_type](store, start_date, end_date, format_type, branch_id)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def build_daybook(store, start_date, end_date, format_type, branch_id=None, progress=None):
+    """Day Book Report (Excel/PDF) of the checked-out orders in the range"""
+    orders = _report_orders(store, branch_id).filter(
+        **store.date_lookups('create_date', start_date, end_date),
+        checkout_status=True
+    ).select_related('table', 'user').prefetch_related('items__menu_item')
+    
+    if format_type == 'excel':
+        return generate_daybook_excel(orders, start_date, end_date, store, progress)
+    else:
+        return generate_daybook_pdf(orders, start_date, end_date, store, progress)
+
+
 @login_required
 def generate_daybook(request):
     """Generate Day Book Report (Excel/PDF)"""
-    if request.method == 'POST':
-        try:
-            store = request.user.store_memberships.all()[0].store
-            start_date = request.POST.get('start_date')
-            end_date = request.POST.get('end_date')
-            format_type = request.POST.get('format', 'excel')
-            
-            # Parse dates
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            
-            # Get orders for the date range
-            orders = Order.objects.filter(
-                store=store,
-                create_date__date__gte=start_date,
-                create_date__date__lte=end_date,
-                checkout_status=True
-            ).select_related('table', 'user').prefetch_related('items__menu_item')
-            
-            if format_type == 'excel':
-                return generate_daybook_excel(orders, start_date, end_date, store)
-            else:
-                return generate_daybook_pdf(orders, start_date, end_date, store)
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
-    
-    return JsonResponse({'error': 'Invalid request method'}, status=405)
+    return _report_view(request, 'daybook')
 
 
-def generate_daybook_excel(orders, start_date, end_date, store):
+def generate_daybook_excel(orders, start_date, end_date, store, progress=None):
     """Generate Excel Day Book Report"""
-    # Create a new workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Day Book Report"
-    
-    # Set up styles
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=16)
-    
-    # Add title
-    ws['A1'] = f"{store.name} - Day Book Report"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    
-    # Merge cells for title
-    ws.merge_cells('A1:J1')
-    ws.merge_cells('A2:J2')
+    export = ExcelExport("Day Book Report")
+    export.title(f"{store.name} - Day Book Report", span=10)
+    export.line(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", span=10)
+    export.blank()
     
     # Add headers
-    headers = [
+    export.header([
         'Date', 'Token', 'Order ID', 'Table', 'Order Method', 
         'Items', 'Total Before Tax', 'Tax Amount', 'Total Amount', 'Payment Method'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
+    ])
     
-    # Add data
-    row = 5
+    # Add data, pricing the lines of each chunk of orders in one pass
     total_sales = Decimal('0.00')
     total_tax = Decimal('0.00')
-    
-    for order in orders:
-        # Get items summary
-        items_summary = []
-        for item in order.items.all():
-            items_summary.append(f"{item.quantity}x {item.menu_item.name}")
-        items_str = ", ".join(items_summary)
-        
-        ws.cell(row=row, column=1, value=order.create_date.strftime('%Y-%m-%d %H:%M'))
-        ws.cell(row=row, column=2, value=order.token)
-        ws.cell(row=row, column=3, value=order.id)
-        ws.cell(row=row, column=4, value=str(order.table) if order.table else order.order_method)
-        ws.cell(row=row, column=5, value=order.order_method)
-        ws.cell(row=row, column=6, value=items_str)
-        ws.cell(row=row, column=7, value=float(order.total_before_tax))
-        ws.cell(row=row, column=8, value=float(order.total_tax))
-        ws.cell(row=row, column=9, value=float(order.total_price))
-        ws.cell(row=row, column=10, value=order.payment_method)
-        
-        total_sales += order.total_price
-        total_tax += order.total_tax
-        row += 1
+    taxes = TaxBreakdown()
+    # Queued jobs report how far through the orders they are
+    order_count = orders.count() if progress else 0
+    written = 0
+    
+    for chunk in batches(orders.prefetch_related(None).order_by('create_date', 'id').iterator(chunk_size=CHUNK_SIZE)):
+        priced = price_items(OrderItem.objects.filter(order__in=[order.id for order in chunk], is_saved_for_later=False))
+        taxes.add(priced)
+        items_by_order = defaultdict(list)
+        for order_id, name, quantity in zip(priced.order_ids, priced.names, priced.quantities):
+            items_by_order[order_id].append(f"{quantity}x {name}")
+        
+        for order in chunk:
+            export.row([
+                timezone.localtime(order.create_date, store.tzinfo).strftime('%Y-%m-%d %H:%M'),
+                order.token,
+                order.id,
+                str(order.table) if order.table else order.order_method,
+                order.order_method,
+                ", ".join(items_by_order[order.id]),
+                float(order.total_before_tax),
+                float(order.total_tax),
+                float(order.total_price),
+                order.payment_method,
+            ])
+            total_sales += order.total_price
+            total_tax += order.total_tax
+        
+        written += len(chunk)
+        if order_count:
+            progress(written / order_count)
     
     # Add totals
-    row += 1
-    ws.cell(row=row, column=8, value="TOTALS:").font = header_font
-    ws.cell(row=row, column=9, value=float(total_sales)).font = header_font
-    ws.cell(row=row, column=8, value=float(total_tax)).font = header_font
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    export.blank()
+    export.row([None] * 6 + [
+        export.cell("TOTALS:", font=HEADER_FONT),
+        export.cell(float(total_tax), font=HEADER_FONT),
+        export.cell(float(total_sales), font=HEADER_FONT),
+    ])
     
-    # Create HTTP response
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="daybook_report_{start_date}_{end_date}.xlsx"'
+    # Tax-wise breakdown
+    tax_rows = taxes.rows()
+    if tax_rows:
+        export.blank()
+        export.header(['Tax', 'Rate (%)', 'Taxable Amount', 'Tax Amount'])
+        export.rows(
+            [tax_row['name'], float(tax_row['percentage']), float(tax_row['taxable_amount']), float(tax_row['tax_amount'])]
+            for tax_row in tax_rows
+        )
     
-    wb.save(response)
-    return response
+    return export.response(f"daybook_report_{start_date}_{end_date}.xlsx")
 
 
-def generate_daybook_pdf(orders, start_date, end_date, store):
+def generate_daybook_pdf(orders, start_date, end_date, store, progress=None):
     """Generate PDF Day Book Report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center alignment
+    report = PdfReport(
+        f"{store.name} - Day Book Report",
+        f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+    )
+    report.table(
+        ['Date/Time', 'Token', 'Table', 'Method', 'Items', 'Total', 'Payment'],
+        widths=[62, 40, 70, 60, 161, 65, 65],
     )
-    
-    # Add title
-    title = Paragraph(f"{store.name} - Day Book Report", title_style)
-    subtitle = Paragraph(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", styles['Heading2'])
-    
-    story.append(title)
-    story.append(subtitle)
-    story.append(Spacer(1, 20))
-    
-    # Prepare table data
-    data = [['Date/Time', 'Token', 'Table', 'Method', 'Items', 'Total', 'Payment']]
     
     total_sales = Decimal('0.00')
-    
-    for order in orders:
-        items_summary = []
-        for item in order.items.all()[:2]:  # Limit to 2 items for space
-            items_summary.append(f"{item.quantity}x {item.menu_item.name}")
-        
-        if len(order.items.all()) > 2:
-            items_summary.append("...")
+    order_count = orders.count() if progress else 0
+    written = 0
+    
+    for chunk in batches(orders.prefetch_related(None).order_by('create_date', 'id').iterator(chunk_size=CHUNK_SIZE)):
+        # The lines of the whole chunk in one query, in order of entry
+        items_by_order = defaultdict(list)
+        for order_id, quantity, name in OrderItem.objects.filter(
+            order__in=[order.id for order in chunk], is_saved_for_later=False
+        ).order_by('order_id', 'id').values_list('order_id', 'quantity', 'menu_item__name'):
+            items_by_order[order_id].append(f"{quantity}x {name}")
+        
+        for order in chunk:
+            items = items_by_order[order.id]
+            items_summary = items[:2]  # Limit to 2 items for space
+            if len(items) > 2:
+                items_summary.append("...")
             
-        items_str = ", ".join(items_summary)
-        
-        data.append([
-            order.create_date.strftime('%m/%d %H:%M'),
-            str(order.token),
-            str(order.table) if order.table else order.order_method[:8],
-            order.order_method[:8],
-            items_str[:30],  # Truncate long item lists
-            f"${order.total_price:.2f}",
-            order.payment_method[:8]
-        ])
-        
-        total_sales += order.total_price
-    
-    # Add total row
-    data.append(['', '', '', '', '', f"Total: ${total_sales:.2f}", ''])
-    
-    # Create table
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(table)
-    
-    # Build PDF
-    doc.build(story)
+            report.row([
+                timezone.localtime(order.create_date, store.tzinfo).strftime('%m/%d %H:%M'),
+                order.token,
+                str(order.table) if order.table else order.order_method,
+                order.order_method,
+                ", ".join(items_summary),
+                f"${order.total_price:.2f}",
+                order.payment_method,
+            ])
+            total_sales += order.total_price
+        
+        written += len(chunk)
+        if order_count:
+            progress(written / order_count)
+    
+    report.row(['', '', '', '', '', f"Total: ${total_sales:.2f}", ''], total=True)
+    
+    return report.response(f"daybook_report_{start_date}_{end_date}.pdf")
+
+
+def build_sales_summary(store, start_date, end_date, format_type, branch_id=None, progress=None):
+    """Sales Summary Report: paid sales per day"""
+    orders = _report_orders(store, branch_id).filter(
+        **store.date_lookups('create_date', start_date, end_date),
+        checkout_status=True,
+        payment_status='Paid'
+    )
     
-    # Create HTTP response
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="daybook_report_{start_date}_{end_date}.pdf"'
+    # Group by date
+    sales_by_date = orders.annotate(date=TruncDate('create_date', tzinfo=store.tzinfo)).values('date').annotate(
+        total_orders=Count('id'),
+        total_sales=Sum('total_price'),
+        total_tax=Sum('total_tax')
+    ).order_by('date')
     
-    return response
+    if format_type == 'excel':
+        return generate_sales_summary_excel(sales_by_date, start_date, end_date, store)
+    else:
+        return generate_sales_summary_pdf(sales_by_date, start_date, end_date, store)
 
 
 @login_required
 def generate_sales_summary(request):
     """Generate Sales Summary Report"""
-    if request.method == 'POST':
-        try:
-            store = request.user.store_memberships.all()[0].store
-            start_date = request.POST.get('start_date')
-            end_date = request.POST.get('end_date')
-            format_type = request.POST.get('format', 'excel')
-            
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            
-            # Get sales summary data
-            orders = Order.objects.filter(
-                store=store,
-                create_date__date__gte=start_date,
-                create_date__date__lte=end_date,
-                checkout_status=True,
-                payment_status='Paid'
-            )
-            
-            # Group by date
-            sales_by_date = orders.extra({'date': "date(create_date)"}).values('date').annotate(
-                total_orders=Count('id'),
-                total_sales=Sum('total_price'),
-                total_tax=Sum('total_tax')
-            ).order_by('date')
-            
-            if format_type == 'excel':
-                return generate_sales_summary_excel(sales_by_date, start_date, end_date, store)
-            else:
-                return generate_sales_summary_pdf(sales_by_date, start_date, end_date, store)
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
+    return _report_view(request, 'sales_summary')
 
 
 def generate_sales_summary_excel(sales_data, start_date, end_date, store):
     """Generate Excel Sales Summary Report"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Sales Summary"
-    
-    # Styles
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=16)
+    export = ExcelExport("Sales Summary", max_width=30)
+    export.title(f"{store.name} - Sales Summary Report", span=5)
+    export.line(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", span=5)
+    export.blank()
     
-    # Title
-    ws['A1'] = f"{store.name} - Sales Summary Report"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    ws.merge_cells('A1:E1')
-    ws.merge_cells('A2:E2')
-    
-    # Headers
-    headers = ['Date', 'Total Orders', 'Total Sales', 'Total Tax', 'Net Sales']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
+    export.header(['Date', 'Total Orders', 'Total Sales', 'Total Tax', 'Net Sales'])
     
     # Data
-    row = 5
     grand_total_orders = 0
     grand_total_sales = Decimal('0.00')
     grand_total_tax = Decimal('0.00')
     
     for sale in sales_data:
-        ws.cell(row=row, column=1, value=sale['date'])
-        ws.cell(row=row, column=2, value=sale['total_orders'])
-        ws.cell(row=row, column=3, value=float(sale['total_sales'] or 0))
-        ws.cell(row=row, column=4, value=float(sale['total_tax'] or 0))
-        ws.cell(row=row, column=5, value=float((sale['total_sales'] or 0) - (sale['total_tax'] or 0)))
+        export.row([
+            sale['date'],
+            sale['total_orders'],
+            float(sale['total_sales'] or 0),
+            float(sale['total_tax'] or 0),
+            float((sale['total_sales'] or 0) - (sale['total_tax'] or 0)),
+        ])
         
         grand_total_orders += sale['total_orders']
         grand_total_sales += sale['total_sales'] or Decimal('0.00')
         grand_total_tax += sale['total_tax'] or Decimal('0.00')
-        row += 1
     
     # Totals
-    row += 1
-    ws.cell(row=row, column=1, value="TOTALS:").font = header_font
-    ws.cell(row=row, column=2, value=grand_total_orders).font = header_font
-    ws.cell(row=row, column=3, value=float(grand_total_sales)).font = header_font
-    ws.cell(row=row, column=4, value=float(grand_total_tax)).font = header_font
-    ws.cell(row=row, column=5, value=float(grand_total_sales - grand_total_tax)).font = header_font
-    
-    # Auto-adjust columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 30)
+    export.blank()
+    export.header([
+        "TOTALS:", grand_total_orders, float(grand_total_sales),
+        float(grand_total_tax), float(grand_total_sales - grand_total_tax),
+    ])
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="sales_summary_{start_date}_{end_date}.xlsx"'
-    wb.save(response)
-    return response
+    return export.response(f"sales_summary_{start_date}_{end_date}.xlsx")
 
 def generate_order_status_excel(status_data, start_date, end_date, store):
     """Generate Excel Order Status Report"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Order Status"
-    
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=16)
-    
-    ws['A1'] = f"{store.name} - Order Status Report"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    ws.merge_cells('A1:D1')
-    ws.merge_cells('A2:D2')
+    export = ExcelExport("Order Status", max_width=30)
+    export.title(f"{store.name} - Order Status Report", span=4)
+    export.line(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", span=4)
+    export.blank()
     
-    headers = ['Order Status', 'Count', 'Total Value', 'Percentage']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
+    export.header(['Order Status', 'Count', 'Total Value', 'Percentage'])
     
-    row = 5
+    status_data = list(status_data)
     total_orders = sum([status['count'] for status in status_data])
     
     for status in status_data:
         percentage = (status['count'] / total_orders * 100) if total_orders > 0 else 0
-        
-        ws.cell(row=row, column=1, value=status['status'])
-        ws.cell(row=row, column=2, value=status['count'])
-        ws.cell(row=row, column=3, value=float(status['total_value'] or 0))
-        ws.cell(row=row, column=4, value=f"{percentage:.2f}%")
-        row += 1
-    
-    # Auto-adjust columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 30)
+        export.row([status['status'], status['count'], float(status['total_value'] or 0), f"{percentage:.2f}%"])
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="order_status_{start_date}_{end_date}.xlsx"'
-    wb.save(response)
-    return response
-
+    return export.response(f"order_status_{start_date}_{end_date}.xlsx")
 
 
 def generate_sales_summary_pdf(sales_data, start_date, end_date, store):
     """Generate PDF Sales Summary Report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
+    report = PdfReport(
+        f"{store.name} - Sales Summary Report",
+        f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+        font_size=9,
     )
-    
-    title = Paragraph(f"{store.name} - Sales Summary Report", title_style)
-    subtitle = Paragraph(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", styles['Heading2'])
-    
-    story.append(title)
-    story.append(subtitle)
-    story.append(Spacer(1, 20))
-    
-    # Table data
-    data = [['Date', 'Orders', 'Total Sales', 'Tax', 'Net Sales']]
+    report.table(['Date', 'Orders', 'Total Sales', 'Tax', 'Net Sales'])
     
     grand_total_orders = 0
     grand_total_sales = Decimal('0.00')
     grand_total_tax = Decimal('0.00')
     
     for sale in sales_data:
-        data.append([
+        report.row([
             sale['date'].strftime('%Y-%m-%d'),
-            str(sale['total_orders']),
+            sale['total_orders'],
             f"${sale['total_sales'] or 0:.2f}",
             f"${sale['total_tax'] or 0:.2f}",
             f"${(sale['total_sales'] or 0) - (sale['total_tax'] or 0):.2f}"
@@ -1454,458 +1073,238 @@ def generate_sales_summary_pdf(sales_data, start_date, end_date, store):
         grand_total_tax += sale['total_tax'] or Decimal('0.00')
     
     # Add total row
-    data.append([
+    report.row([
         'TOTAL',
-        str(grand_total_orders),
+        grand_total_orders,
         f"${grand_total_sales:.2f}",
         f"${grand_total_tax:.2f}",
         f"${grand_total_sales - grand_total_tax:.2f}"
-    ])
+    ], total=True)
+    
+    return report.response(f"sales_summary_{start_date}_{end_date}.pdf")
+
+
+def build_payment_methods(store, start_date, end_date, format_type, branch_id=None, progress=None):
+    """Payment Methods Report: paid sales per payment method"""
+    payment_data = _report_orders(store, branch_id).filter(
+        **store.date_lookups('create_date', start_date, end_date),
+        checkout_status=True,
+        payment_status='Paid'
+    ).values('payment_method').annotate(
+        count=Count('id'),
+        total=Sum('total_price')
+    ).order_by('-total')
     
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(table)
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="sales_summary_{start_date}_{end_date}.pdf"'
-    return response
+    if format_type == 'excel':
+        return generate_payment_methods_excel(payment_data, start_date, end_date, store)
+    else:
+        return generate_payment_methods_pdf(payment_data, start_date, end_date, store)
 
 
 @login_required
 def generate_payment_methods(request):
     """Generate Payment Methods Report"""
-    if request.method == 'POST':
-        try:
-            store = request.user.store_memberships.all()[0].store
-            start_date = datetime.strptime(request.POST.get('start_date'), '%Y-%m-%d').date()
-            end_date = datetime.strptime(request.POST.get('end_date'), '%Y-%m-%d').date()
-            format_type = request.POST.get('format', 'excel')
-            
-            # Get payment method breakdown
-            payment_data = Order.objects.filter(
-                store=store,
-                create_date__date__gte=start_date,
-                create_date__date__lte=end_date,
-                checkout_status=True,
-                payment_status='Paid'
-            ).values('payment_method').annotate(
-                count=Count('id'),
-                total=Sum('total_price')
-            ).order_by('-total')
-            
-            if format_type == 'excel':
-                return generate_payment_methods_excel(payment_data, start_date, end_date, store)
-            else:
-                return generate_payment_methods_pdf(payment_data, start_date, end_date, store)
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
+    return _report_view(request, 'payment_methods')
 
 
 def generate_payment_methods_excel(payment_data, start_date, end_date, store):
     """Generate Excel Payment Methods Report"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Payment Methods"
-    
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=16)
-    
-    ws['A1'] = f"{store.name} - Payment Methods Report"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    ws.merge_cells('A1:D1')
-    ws.merge_cells('A2:D2')
+    export = ExcelExport("Payment Methods", max_width=30)
+    export.title(f"{store.name} - Payment Methods Report", span=4)
+    export.line(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", span=4)
+    export.blank()
     
-    headers = ['Payment Method', 'Number of Orders', 'Total Amount', 'Percentage']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
+    export.header(['Payment Method', 'Number of Orders', 'Total Amount', 'Percentage'])
     
-    row = 5
+    payment_data = list(payment_data)
     total_amount = sum([payment['total'] for payment in payment_data])
     
     for payment in payment_data:
         percentage = (payment['total'] / total_amount * 100) if total_amount > 0 else 0
-        
-        ws.cell(row=row, column=1, value=payment['payment_method'])
-        ws.cell(row=row, column=2, value=payment['count'])
-        ws.cell(row=row, column=3, value=float(payment['total']))
-        ws.cell(row=row, column=4, value=f"{percentage:.2f}%")
-        row += 1
-    
-    # Auto-adjust columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 30)
+        export.row([payment['payment_method'], payment['count'], float(payment['total']), f"{percentage:.2f}%"])
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="payment_methods_{start_date}_{end_date}.xlsx"'
-    wb.save(response)
-    return response
+    return export.response(f"payment_methods_{start_date}_{end_date}.xlsx")
 
 
 def generate_payment_methods_pdf(payment_data, start_date, end_date, store):
     """Generate PDF Payment Methods Report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
+    report = PdfReport(
+        f"{store.name} - Payment Methods Report",
+        f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+        font_size=9,
     )
+    report.table(['Payment Method', 'Orders', 'Total Amount', 'Percentage'])
     
-    title = Paragraph(f"{store.name} - Payment Methods Report", title_style)
-    subtitle = Paragraph(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", styles['Heading2'])
-    
-    story.append(title)
-    story.append(subtitle)
-    story.append(Spacer(1, 20))
-    
-    # Table data
-    data = [['Payment Method', 'Orders', 'Total Amount', 'Percentage']]
-    
+    payment_data = list(payment_data)
     total_amount = sum([payment['total'] for payment in payment_data])
     
     for payment in payment_data:
         percentage = (payment['total'] / total_amount * 100) if total_amount > 0 else 0
-        data.append([
+        report.row([
             payment['payment_method'],
-            str(payment['count']),
+            payment['count'],
             f"${payment['total']:.2f}",
             f"{percentage:.2f}%"
         ])
     
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(table)
-    doc.build(story)
+    return report.response(f"payment_methods_{start_date}_{end_date}.pdf")
+
+
+def build_menu_performance(store, start_date, end_date, format_type, branch_id=None, progress=None):
+    """Menu Items Performance Report, from the item sales rollup (not split per branch)"""
+    menu_data = rollups.item_sales(store, start_date, end_date)
     
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="payment_methods_{start_date}_{end_date}.pdf"'
-    return response
+    if format_type == 'excel':
+        return generate_menu_performance_excel(menu_data, start_date, end_date, store)
+    else:
+        return generate_menu_performance_pdf(menu_data, start_date, end_date, store)
 
 
 @login_required
 def generate_menu_performance(request):
     """Generate Menu Items Performance Report"""
-    if request.method == 'POST':
-        try:
-            store = request.user.store_memberships.all()[0].store
-            start_date = datetime.strptime(request.POST.get('start_date'), '%Y-%m-%d').date()
-            end_date = datetime.strptime(request.POST.get('end_date'), '%Y-%m-%d').date()
-            format_type = request.POST.get('format', 'excel')
-            
-            # Get menu performance data
-            menu_data = OrderItem.objects.filter(
-                order__store=store,
-                order__create_date__date__gte=start_date,
-                order__create_date__date__lte=end_date,
-                order__checkout_status=True,
-                is_saved_for_later=False
-            ).values('menu_item__name', 'menu_item__category__name').annotate(
-                total_quantity=Sum('quantity'),
-                total_revenue=Sum(F('price') * F('quantity'))
-            ).order_by('-total_quantity')
-            
-            if format_type == 'excel':
-                return generate_menu_performance_excel(menu_data, start_date, end_date, store)
-            else:
-                return generate_menu_performance_pdf(menu_data, start_date, end_date, store)
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
+    return _report_view(request, 'menu_performance')
 
 
 def generate_menu_performance_excel(menu_data, start_date, end_date, store):
     """Generate Excel Menu Performance Report"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Menu Performance"
-    
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=16)
-    
-    ws['A1'] = f"{store.name} - Menu Performance Report"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    ws.merge_cells('A1:E1')
-    ws.merge_cells('A2:E2')
-    
-    headers = ['Menu Item', 'Category', 'Quantity Sold', 'Revenue', 'Avg Price']
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
-    
-    row = 5
-    for item in menu_data:
+    export = ExcelExport("Menu Performance", max_width=40)
+    export.title(f"{store.name} - Menu Performance Report", span=5)
+    export.line(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", span=5)
+    export.blank()
+    
+    export.header(['Menu Item', 'Category', 'Quantity Sold', 'Revenue', 'Avg Price'])
+    
+    for item in menu_data.iterator(chunk_size=CHUNK_SIZE):
         avg_price = item['total_revenue'] / item['total_quantity'] if item['total_quantity'] > 0 else 0
-        
-        ws.cell(row=row, column=1, value=item['menu_item__name'])
-        ws.cell(row=row, column=2, value=item['menu_item__category__name'])
-        ws.cell(row=row, column=3, value=item['total_quantity'])
-        ws.cell(row=row, column=4, value=float(item['total_revenue']))
-        ws.cell(row=row, column=5, value=f"{avg_price:.2f}")
-        row += 1
-    
-    # Auto-adjust columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 40)
+        export.row([
+            item['menu_item__name'],
+            item['menu_item__category__name'],
+            item['total_quantity'],
+            float(item['total_revenue']),
+            f"{avg_price:.2f}",
+        ])
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="menu_performance_{start_date}_{end_date}.xlsx"'
-    wb.save(response)
-    return response
+    return export.response(f"menu_performance_{start_date}_{end_date}.xlsx")
+
+
+def build_tax_report(store, start_date, end_date, format_type, branch_id=None, progress=None):
+    """Tax Report of the paid sales in the range"""
+    orders = _report_orders(store, branch_id).filter(
+        **store.date_lookups('create_date', start_date, end_date),
+        checkout_status=True,
+        payment_status='Paid'
+    )
+    
+    tax_summary = {
+        'total_before_tax': orders.aggregate(Sum('total_before_tax'))['total_before_tax__sum'] or Decimal('0'),
+        'total_tax': orders.aggregate(Sum('total_tax'))['total_tax__sum'] or Decimal('0'),
+        'total_with_tax': orders.aggregate(Sum('total_price'))['total_price__sum'] or Decimal('0'),
+        'order_count': orders.count(),
+        # Per-tax breakdown, priced for the whole period in one pass
+        'taxes': price_items(
+            OrderItem.objects.filter(order__in=orders, is_saved_for_later=False)
+        ).tax_breakdown(),
+    }
+    
+    if format_type == 'excel':
+        return generate_tax_report_excel(tax_summary, orders, start_date, end_date, store)
+    else:
+        return generate_tax_report_pdf(tax_summary, orders, start_date, end_date, store)
 
 
 @login_required
 def generate_tax_report(request):
     """Generate Tax Report"""
-    if request.method == 'POST':
-        try:
-            store = request.user.store_memberships.all()[0].store
-            start_date = datetime.strptime(request.POST.get('start_date'), '%Y-%m-%d').date()
-            end_date = datetime.strptime(request.POST.get('end_date'), '%Y-%m-%d').date()
-            format_type = request.POST.get('format', 'excel')
-            
-            # Get tax breakdown
-            orders = Order.objects.filter(
-                store=store,
-                create_date__date__gte=start_date,
-                create_date__date__lte=end_date,
-                checkout_status=True,
-                payment_status='Paid'
-            )
-            
-            tax_summary = {
-                'total_before_tax': orders.aggregate(Sum('total_before_tax'))['total_before_tax__sum'] or Decimal('0'),
-                'total_tax': orders.aggregate(Sum('total_tax'))['total_tax__sum'] or Decimal('0'),
-                'total_with_tax': orders.aggregate(Sum('total_price'))['total_price__sum'] or Decimal('0'),
-                'order_count': orders.count()
-            }
-            
-            if format_type == 'excel':
-                return generate_tax_report_excel(tax_summary, orders, start_date, end_date, store)
-            else:
-                return generate_tax_report_pdf(tax_summary, orders, start_date, end_date, store)
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
+    return _report_view(request, 'tax_report')
 
 
 def generate_tax_report_excel(tax_summary, orders, start_date, end_date, store):
     """Generate Excel Tax Report"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Tax Report"
-    
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=16)
-    
-    ws['A1'] = f"{store.name} - Tax Report"
-    ws['A1'].font = title_font
-    ws['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    ws.merge_cells('A1:C1')
-    ws.merge_cells('A2:C2')
+    export = ExcelExport("Tax Report", max_width=30)
+    export.title(f"{store.name} - Tax Report", span=3)
+    export.line(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", span=3)
+    export.blank()
     
     # Summary section
-    ws['A4'] = "TAX SUMMARY"
-    ws['A4'].font = header_font
-    
-    ws['A5'] = "Total Orders:"
-    ws['B5'] = tax_summary['order_count']
-    
-    ws['A6'] = "Total Before Tax:"
-    ws['B6'] = float(tax_summary['total_before_tax'])
-    
-    ws['A7'] = "Total Tax Amount:"
-    ws['B7'] = float(tax_summary['total_tax'])
-    
-    ws['A8'] = "Total With Tax:"
-    ws['B8'] = float(tax_summary['total_with_tax'])
+    export.header(["TAX SUMMARY"])
+    export.row(["Total Orders:", tax_summary['order_count']])
+    export.row(["Total Before Tax:", float(tax_summary['total_before_tax'])])
+    export.row(["Total Tax Amount:", float(tax_summary['total_tax'])])
+    export.row(["Total With Tax:", float(tax_summary['total_with_tax'])])
     
     # Calculate effective tax rate
     if tax_summary['total_before_tax'] > 0:
         tax_rate = (tax_summary['total_tax'] / tax_summary['total_before_tax']) * 100
-        ws['A9'] = "Effective Tax Rate:"
-        ws['B9'] = f"{tax_rate:.2f}%"
-    
-    # Auto-adjust columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 30)
+        export.row(["Effective Tax Rate:", f"{tax_rate:.2f}%"])
+    
+    # Tax-wise breakdown
+    if tax_summary['taxes']:
+        export.blank()
+        export.header(["TAX BREAKDOWN"])
+        export.header(['Tax', 'Rate (%)', 'Taxable Amount', 'Tax Amount'])
+        export.rows(
+            [tax_row['name'], float(tax_row['percentage']), float(tax_row['taxable_amount']), float(tax_row['tax_amount'])]
+            for tax_row in tax_summary['taxes']
+        )
     
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="tax_report_{start_date}_{end_date}.xlsx"'
-    wb.save(response)
-    return response
+    return export.response(f"tax_report_{start_date}_{end_date}.xlsx")
+
+
+def build_order_status(store, start_date, end_date, format_type, branch_id=None, progress=None):
+    """Order Status Report: every order of the range per status"""
+    status_data = _report_orders(store, branch_id).filter(
+        **store.date_lookups('create_date', start_date, end_date)
+    ).values('status').annotate(
+        count=Count('id'),
+        total_value=Sum('total_price')
+    ).order_by('-count')
+    
+    if format_type == 'excel':
+        return generate_order_status_excel(status_data, start_date, end_date, store)
+    else:
+        return generate_order_status_pdf(status_data, start_date, end_date, store)
 
 
 @login_required
 def generate_order_status(request):
     """Generate Order Status Report"""
-    if request.method == 'POST':
-        try:
-            store = request.user.store_memberships.all()[0].store
-            start_date = datetime.strptime(request.POST.get('start_date'), '%Y-%m-%d').date()
-            end_date = datetime.strptime(request.POST.get('end_date'), '%Y-%m-%d').date()
-            format_type = request.POST.get('format', 'excel')
-            
-            # Get order status breakdown
-            status_data = Order.objects.filter(
-                store=store,
-                create_date__date__gte=start_date,
-                create_date__date__lte=end_date
-            ).values('status').annotate(
-                count=Count('id'),
-                total_value=Sum('total_price')
-            ).order_by('-count')
-            
-            if format_type == 'excel':
-                return generate_order_status_excel(status_data, start_date, end_date, store)
-            else:
-                return generate_order_status_pdf(status_data, start_date, end_date, store)
-                
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
+    return _report_view(request, 'order_status')
 
 
 def generate_menu_performance_pdf(menu_data, start_date, end_date, store):
     """Generate PDF Menu Performance Report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
+    report = PdfReport(
+        f"{store.name} - Menu Performance Report",
+        f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
     )
+    report.table(['Menu Item', 'Category', 'Qty Sold', 'Revenue', 'Avg Price'], widths=[163, 110, 70, 90, 90])
     
-    title = Paragraph(f"{store.name} - Menu Performance Report", title_style)
-    subtitle = Paragraph(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", styles['Heading2'])
-    
-    story.append(title)
-    story.append(subtitle)
-    story.append(Spacer(1, 20))
-    
-    # Table data
-    data = [['Menu Item', 'Category', 'Qty Sold', 'Revenue', 'Avg Price']]
-    
-    for item in menu_data:
+    for item in menu_data.iterator(chunk_size=CHUNK_SIZE):
         avg_price = item['total_revenue'] / item['total_quantity'] if item['total_quantity'] > 0 else 0
         
-        data.append([
-            item['menu_item__name'][:25],  # Truncate long names
-            item['menu_item__category__name'][:15],
-            str(item['total_quantity']),
+        report.row([
+            item['menu_item__name'],
+            item['menu_item__category__name'],
+            item['total_quantity'],
             f"${item['total_revenue']:.2f}",
             f"${avg_price:.2f}"
         ])
     
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),  # Smaller font for data
-    ]))
-    
-    story.append(table)
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="menu_performance_{start_date}_{end_date}.pdf"'
-    return response
+    return report.response(f"menu_performance_{start_date}_{end_date}.pdf")
 
 
 def generate_tax_report_pdf(tax_summary, orders, start_date, end_date, store):
     """Generate PDF Tax Report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
+    report = PdfReport(
+        f"{store.name} - Tax Report",
+        f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+        font_size=10,
     )
     
-    title = Paragraph(f"{store.name} - Tax Report", title_style)
-    subtitle = Paragraph(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", styles['Heading2'])
-    
-    story.append(title)
-    story.append(subtitle)
-    story.append(Spacer(1, 20))
-    
     # Summary table
-    summary_data = [
-        ['Tax Summary', 'Amount'],
-        ['Total Orders', str(tax_summary['order_count'])],
+    summary_rows = [
+        ['Total Orders', tax_summary['order_count']],
         ['Total Before Tax', f"${tax_summary['total_before_tax']:.2f}"],
         ['Total Tax Amount', f"${tax_summary['total_tax']:.2f}"],
         ['Total With Tax', f"${tax_summary['total_with_tax']:.2f}"],
@@ -1914,97 +1313,105 @@ def generate_tax_report_pdf(tax_summary, orders, start_date, end_date, store):
     # Calculate tax percentage
     if tax_summary['total_before_tax'] > 0:
         tax_percentage = (tax_summary['total_tax'] / tax_summary['total_before_tax']) * 100
-        summary_data.append(['Effective Tax Rate', f"{tax_percentage:.2f}%"])
-    
-    summary_table = Table(summary_data)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),  # Bold total row
-    ]))
-    
-    story.append(summary_table)
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="tax_report_{start_date}_{end_date}.pdf"'
-    return response
+        summary_rows.append(['Effective Tax Rate', f"{tax_percentage:.2f}%"])
+    
+    report.table(['Tax Summary', 'Amount'], widths=[180, 140], align='LEFT')
+    report.rows(summary_rows[:-1])
+    report.row(summary_rows[-1], total=True)
+    
+    # Tax-wise breakdown
+    if tax_summary['taxes']:
+        report.spacer()
+        report.table(['Tax', 'Rate', 'Taxable Amount', 'Tax Amount'], widths=[160, 80, 120, 120], align='LEFT', fills=(colors.white,))
+        for tax_row in tax_summary['taxes']:
+            report.row([
+                tax_row['name'],
+                f"{tax_row['percentage']:.2f}%",
+                f"${tax_row['taxable_amount']:.2f}",
+                f"${tax_row['tax_amount']:.2f}",
+            ])
+    
+    return report.response(f"tax_report_{start_date}_{end_date}.pdf")
 
 
 def generate_order_status_pdf(status_data, start_date, end_date, store):
     """Generate PDF Order Status Report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1
+    report = PdfReport(
+        f"{store.name} - Order Status Report",
+        f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+        font_size=9,
     )
+    report.table(['Order Status', 'Count', 'Total Value', 'Percentage'])
     
-    title = Paragraph(f"{store.name} - Order Status Report", title_style)
-    subtitle = Paragraph(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", styles['Heading2'])
-    
-    story.append(title)
-    story.append(subtitle)
-    story.append(Spacer(1, 20))
-    
-    # Table data
-    data = [['Order Status', 'Count', 'Total Value', 'Percentage']]
-    
+    status_data = list(status_data)
     total_orders = sum([status['count'] for status in status_data])
     total_value = sum([status['total_value'] or 0 for status in status_data])
     
     for status in status_data:
         percentage = (status['count'] / total_orders * 100) if total_orders > 0 else 0
         
-        data.append([
+        report.row([
             status['status'],
-            str(status['count']),
+            status['count'],
             f"${status['total_value'] or 0:.2f}",
             f"{percentage:.2f}%"
         ])
     
     # Add total row
-    data.append([
+    report.row([
         'TOTAL',
-        str(total_orders),
+        total_orders,
         f"${total_value:.2f}",
         '100.00%'
-    ])
+    ], total=True)
     
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    story.append(table)
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="order_status_{start_date}_{end_date}.pdf"'
-    return response
+    return report.response(f"order_status_{start_date}_{end_date}.pdf")
+
+
+# Report builders by ReportJob.report_type; shared by the report views and the
+# report worker (jobs.py)
+REPORT_BUILDERS = {
+    'daybook': build_daybook,
+    'sales_summary': build_sales_summary,
+    'payment_methods': build_payment_methods,
+    'menu_performance': build_menu_performance,
+    'tax_report': build_tax_report,
+    'order_status': build_order_status,
+}
+
+
+def _store_job(request, job_id):
+    return get_object_or_404(ReportJob, pk=job_id, store_id__in=request.store_ctx.store_ids)
+
+
+@login_required
+def report_job_create(request):
+    """Queue a report (same form fields as the report views plus report_type); 202 with its status"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        store, start_date, end_date, format_type, branch_id = _report_params(request)
+        job = report_jobs.enqueue(
+            store, request.POST.get('report_type'), format_type, start_date, end_date, branch_id, request.user
+        )
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(report_jobs.status(job), status=202)
+
+
+@login_required
+def report_job_status(request, job_id):
+    """Progress of a queued report"""
+    return JsonResponse(report_jobs.status(_store_job(request, job_id)))
+
+
+@login_required
+def report_job_download(request, job_id):
+    """The finished report file"""
+    job = _store_job(request, job_id)
+    if job.status != ReportJob.DONE or not job.artifact:
+        return JsonResponse(report_jobs.status(job), status=409)
+    return FileResponse(job.artifact.open('rb'), as_attachment=True, filename=job.filename, content_type=job.content_type)
 
 
 from django.shortcuts import render, redirect, get_object_or_404
@@ -2020,7 +1427,9 @@ import json
 import traceback
 
 from inventory.models import Menu, Tax, FoodCategory, Modifiers
+from inventory import search as menu_search
 from orders.models import Order, OrderItem, Tables, Checkout
+from orders import delta, events, totals
 from authentication.models import Store
 
 
@@ -2029,7 +1438,7 @@ def b2b_pos(request):
     """Main B2B POS Screen"""
     try:
         # Get user's store
-        store_membership = request.user.store_memberships.first()
+        store_membership = request.store_ctx.membership
         if not store_membership:
             return render(request, 'error.html', {'message': 'No store assigned'})
         
@@ -2085,7 +1494,7 @@ def create_b2b_order(request):
         except json.JSONDecodeError:
             data = {}
         
-        store_membership = request.user.store_memberships.first()
+        store_membership = request.store_ctx.membership
         
         if not store_membership:
             return JsonResponse({
@@ -2094,17 +1503,21 @@ def create_b2b_order(request):
             }, status=400)
         
         store = store_membership.store
+        branch, pos_device = request.store_ctx.order_attribution()
         
         with transaction.atomic():
             # Create order
             order = Order.objects.create(
                 store=store,
+                branch=branch,
+                pos_device=pos_device,
                 user=request.user,
                 order_method='B2B',
                 status='Pending',
                 checkout_status=False,
                 completion_status=False
             )
+            events.publish_order_event(order, events.ORDER_CREATED)
             
             return JsonResponse({
                 'success': True,
@@ -2195,37 +1608,36 @@ def add_b2b_item(request):
             }, status=404)
         
         with transaction.atomic():
-            # Create order item with custom price
-            order_item = OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=quantity,
-                price=custom_price,
-                special_instructions=special_instructions,
-                is_saved_for_later=False
-            )
-            
-            # Add taxes from menu item
-            if menu_item.taxes.exists():
-                order_item.tax.set(menu_item.taxes.all())
-            
-            # Add modifiers/addons if selected
-            if addon_ids:
-                modifiers = Modifiers.objects.filter(id__in=addon_ids)
-                order_item.add_ons.set(modifiers)
+            # Item signals are batched into one order totals update
+            with totals.batch():
+                # Create order item with custom price
+                order_item = OrderItem.objects.create(
+                    order=order,
+                    menu_item=menu_item,
+                    quantity=quantity,
+                    price=custom_price,
+                    special_instructions=special_instructions,
+                    is_saved_for_later=False
+                )
+                
+                # Add taxes from menu item
+                if menu_item.taxes.exists():
+                    order_item.tax.set(menu_item.taxes.all())
+                
+                # Add modifiers/addons if selected
+                if addon_ids:
+                    modifiers = Modifiers.objects.filter(id__in=addon_ids)
+                    order_item.add_ons.set(modifiers)
             
-            # Calculate totals
-            order.calculate_totals()
-            order.save()
+            events.publish_order_event(order, events.ITEM_ADDED, item_id=order_item.id)
             
             # Get item details for response
-            addon_total = sum(addon.price for addon in order_item.add_ons.all())
             item_data = {
                 'id': order_item.id,
                 'name': menu_item.name,
                 'quantity': quantity,
                 'price': float(custom_price),
-                'addon_total': float(addon_total),
+                'addon_total': float(order_item.addon_total),
                 'total': float(order_item.get_total_price_with_addons()),
                 'tax_amount': float(order_item.get_tax_amount())
             }
@@ -2298,13 +1710,9 @@ def update_b2b_item(request):
                         'message': 'Invalid price'
                     }, status=400)
             
+            # Order totals are refreshed by the item save signal
             order_item.save()
-            
-            # Recalculate order totals
-            order_item.order.calculate_totals()
-            order_item.order.save()
-            
-            addon_total = sum(addon.price for addon in order_item.add_ons.all())
+            events.publish_order_event(order_item.order, events.ITEM_UPDATED, item_id=order_item.id)
             
             return JsonResponse({
                 'success': True,
@@ -2356,11 +1764,9 @@ def remove_b2b_item(request):
         order = order_item.order
         
         with transaction.atomic():
+            # Order totals are refreshed by the item delete signal
             order_item.delete()
-            
-            # Recalculate order totals
-            order.calculate_totals()
-            order.save()
+            events.publish_order_event(order, events.ITEM_REMOVED, item_id=item_id)
             
             return JsonResponse({
                 'success': True,
@@ -2487,6 +1893,7 @@ def checkout_b2b_order(request):
             order.payment_method = payment_method
             order.payment_status = 'Paid'
             order.save()
+            events.publish_order_event(order, events.CHECKED_OUT)
             
             final_amount = checkout.calculate_final_amount()
             
@@ -2513,7 +1920,7 @@ def search_menu_items(request):
     """Search menu items for B2B POS"""
     try:
         query = request.GET.get('q', '')
-        store_membership = request.user.store_memberships.first()
+        store_membership = request.store_ctx.membership
         
         if not store_membership:
             return JsonResponse({
@@ -2523,30 +1930,16 @@ def search_menu_items(request):
         
         store = store_membership.store
         
-        menu_items = Menu.objects.filter(
-            store=store,
-            status=True
-        ).filter(
-            name__icontains=query
-        ) | Menu.objects.filter(
-            store=store,
-            status=True,
-            code__icontains=query
-        ) | Menu.objects.filter(
-            store=store,
-            status=True,
-            barcode__icontains=query
-        )
-        
+        # Served from the store's in-memory menu index, no queries per keystroke
         results = []
-        for item in menu_items[:20]:  # Limit to 20 results
+        for item in menu_search.search_menu(store.id, query, limit=20):
             results.append({
-                'id': item.id,
-                'name': item.name,
-                'category': item.category.name,
-                'price': float(item.price),
-                'code': item.code or '',
-                'image': item.image.url if item.image else None
+                'id': item['id'],
+                'name': item['name'],
+                'category': item['category_name'],
+                'price': float(item['price']),
+                'code': item['code'] or '',
+                'image': item['image']
             })
         
         return JsonResponse({'success': True, 'items': results})
@@ -2565,7 +1958,7 @@ def search_menu_items(request):
 def get_active_b2b_orders(request):
     """Get active B2B orders for live updates"""
     try:
-        store_membership = request.user.store_memberships.first()
+        store_membership = request.store_ctx.membership
         
         if not store_membership:
             return JsonResponse({
@@ -2574,29 +1967,51 @@ def get_active_b2b_orders(request):
             }, status=400)
         
         store = store_membership.store
+        cursor = delta.make_cursor()
         
         # Get active B2B orders
-        active_orders = Order.objects.filter(
-            store=store,
-            order_method='B2B',
+        b2b_orders = Order.objects.filter(store=store, order_method='B2B')
+        active_orders = b2b_orders.filter(
             completion_status=False
-        ).order_by('-create_date')[:10]
+        ).annotate(
+            checkout_items_count=Count('items', filter=Q(items__is_saved_for_later=False))
+        ).order_by('-create_date')
+        
+        # ?since=<cursor> returns only orders changed since the previous poll
+        # (every changed order; the 10-order limit only applies to a full load)
+        since = request.GET.get('since')
+        changed_ids = None
+        if since:
+            try:
+                since = delta.parse_cursor(since)
+            except delta.InvalidCursor as e:
+                return JsonResponse({'success': False, 'message': str(e)}, status=400)
+            changed_ids = delta.changed_order_ids(b2b_orders, since)
+            active_orders = active_orders.filter(id__in=changed_ids)
         
         orders_data = []
-        for order in active_orders:
+        for order in (active_orders if changed_ids is not None else active_orders[:10]):
             orders_data.append({
                 'id': order.id,
                 'token': order.token,
                 'status': order.status,
                 'total_price': float(order.total_price or 0),
                 'time': order.create_date.strftime('%I:%M %p'),
-                'items_count': order.items.filter(is_saved_for_later=False).count()
+                'items_count': order.checkout_items_count
             })
         
-        return JsonResponse({
+        response_data = {
             'success': True,
+            'cursor': cursor,
             'orders': orders_data
-        })
+        }
+        if changed_ids is not None:
+            # Changed orders that are no longer active
+            still_active = {order['id'] for order in orders_data}
+            response_data['removed'] = sorted(changed_ids - still_active)
+            response_data['deleted'] = delta.deleted_order_ids([store.pk], since)
+        
+        return JsonResponse(response_data)
     
     except Exception as e:
         print(f"Error in get_active_b2b_orders: {str(e)}")
@@ -2622,29 +2037,20 @@ def get_b2b_order_details(request, order_id):
         
         # Only get items not saved for later
         items = []
-        order_items = order.items.filter(is_saved_for_later=False)
+        order_items = order.items.filter(
+            is_saved_for_later=False
+        ).select_related('menu_item').prefetch_related('add_ons')
         
         for item in order_items:
-            addon_total = sum(Decimal(str(addon.price)) for addon in item.add_ons.all())
-            
-            # Calculate item total with addons
-            item_base_total = (Decimal(str(item.price)) + addon_total) * item.quantity
-            
-            # Calculate tax for this item
-            item_tax_total = Decimal('0.00')
-            for tax in item.tax.all():
-                tax_amount = (item_base_total * tax.tax_percentage) / 100
-                item_tax_total += tax_amount
-            
             items.append({
                 'id': item.id,
                 'menu_item_id': item.menu_item.id,
                 'name': item.menu_item.name,
                 'quantity': item.quantity,
                 'price': float(item.price),
-                'addon_total': float(addon_total),
-                'total': float(item_base_total),
-                'tax_amount': float(item_tax_total),
+                'addon_total': float(item.addon_total),
+                'total': float(item.line_subtotal),
+                'tax_amount': float(item.line_tax),
                 'special_instructions': item.special_instructions or '',
                 'addons': [{'id': a.id, 'name': a.name, 'price': float(a.price)} 
                           for a in item.add_ons.all()]
@@ -2678,7 +2084,7 @@ def get_b2b_order_details(request, order_id):
 def b2b_sales_list(request):
     """B2B Sales List with filtering and sorting"""
     try:
-        store_membership = request.user.store_memberships.first()
+        store_membership = request.store_ctx.membership
         if not store_membership:
             return render(request, 'error.html', {'message': 'No store assigned'})
         
@@ -2777,6 +2183,8 @@ def b2b_sales_list(request):
         export_type = request.GET.get('export')
         if export_type == 'excel':
             return export_b2b_sales_excel(orders, stats)
+        elif export_type == 'csv':
+            return _sales_csv(orders, store, f'B2B_Sales_Report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv')
         elif export_type == 'pdf':
             return export_b2b_sales_pdf(orders, stats)
         
@@ -2822,194 +2230,86 @@ def b2b_sales_list(request):
 
 def export_b2b_sales_excel(orders, stats):
     """Export B2B sales to Excel"""
-    import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill
-    from django.http import HttpResponse
-    
-    # Create workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "B2B Sales Report"
+    export = ExcelExport("B2B Sales Report")
     
     # Header style
     header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF")
     
     # Add summary
-    ws['A1'] = 'B2B SALES REPORT'
-    ws['A1'].font = Font(bold=True, size=16)
-    ws.merge_cells('A1:I1')
-    
-    ws['A3'] = 'Total Orders:'
-    ws['B3'] = stats['total_orders']
-    ws['A4'] = 'Total Sales:'
-    ws['B4'] = float(stats['total_sales'])
-    ws['A5'] = 'Total Tax:'
-    ws['B5'] = float(stats['total_tax'])
-    ws['A6'] = 'Average Order:'
-    ws['B6'] = float(stats['avg_order_value'])
+    export.title('B2B SALES REPORT', span=9)
+    export.blank()
+    export.row(['Total Orders:', stats['total_orders']])
+    export.row(['Total Sales:', float(stats['total_sales'])])
+    export.row(['Total Tax:', float(stats['total_tax'])])
+    export.row(['Average Order:', float(stats['avg_order_value'])])
+    export.blank()
     
     # Headers
-    headers = ['Token', 'Date', 'Time', 'Customer', 'Phone', 'Items', 'Payment', 'Amount', 'Tax', 'Status']
-    for col, header in enumerate(headers, start=1):
-        cell = ws.cell(row=8, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
+    export.header(
+        ['Token', 'Date', 'Time', 'Customer', 'Phone', 'Items', 'Payment', 'Amount', 'Tax', 'Status'],
+        font=header_font, fill=header_fill, alignment=Alignment(horizontal='center'),
+    )
     
     # Data
-    row = 9
-    for order in orders:
-        ws.cell(row=row, column=1).value = f"#{order.token}"
-        ws.cell(row=row, column=2).value = order.create_date.strftime('%Y-%m-%d')
-        ws.cell(row=row, column=3).value = order.create_date.strftime('%H:%M:%S')
-        
-        if hasattr(order, 'checkout') and order.checkout:
-            ws.cell(row=row, column=4).value = order.checkout.customer_name or 'Walk-in'
-            ws.cell(row=row, column=5).value = order.checkout.customer_phone or ''
-        else:
-            ws.cell(row=row, column=4).value = 'Walk-in'
-            ws.cell(row=row, column=5).value = ''
-        
-        ws.cell(row=row, column=6).value = order.items.count()
-        ws.cell(row=row, column=7).value = order.payment_method or 'N/A'
-        ws.cell(row=row, column=8).value = float(order.total_price)
-        ws.cell(row=row, column=9).value = float(order.total_tax)
-        ws.cell(row=row, column=10).value = order.status
-        
-        row += 1
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename=B2B_Sales_Report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    orders = orders.prefetch_related(None).annotate(items_count=Count('items'))
+    for order in orders.iterator(chunk_size=CHUNK_SIZE):
+        checkout = getattr(order, 'checkout', None)
+        export.row([
+            f"#{order.token}",
+            order.create_date.strftime('%Y-%m-%d'),
+            order.create_date.strftime('%H:%M:%S'),
+            (checkout.customer_name if checkout else None) or 'Walk-in',
+            (checkout.customer_phone if checkout else None) or '',
+            order.items_count,
+            order.payment_method or 'N/A',
+            float(order.total_price),
+            float(order.total_tax),
+            order.status,
+        ])
     
-    wb.save(response)
-    return response
+    return export.response(f'B2B_Sales_Report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
 
 
 def export_b2b_sales_pdf(orders, stats):
     """Export B2B sales to PDF"""
-    from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT
-    import io
-    
-    # Create buffer
-    buffer = io.BytesIO()
-    
-    # Create PDF
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#4472C4'),
-        alignment=TA_CENTER,
-        spaceAfter=30
-    )
-    
-    # Title
-    elements.append(Paragraph("B2B SALES REPORT", title_style))
-    elements.append(Spacer(1, 0.3*inch))
+    header_fill = colors.HexColor('#4472C4')
+    report = PdfReport("B2B SALES REPORT", pagesize=landscape(A4), title_color=header_fill)
+    report.spacer()
     
     # Summary statistics
-    summary_data = [
-        ['Total Orders', 'Total Sales', 'Total Tax', 'Average Order'],
-        [
-            str(stats['total_orders']),
-            f"₹{stats['total_sales']:.2f}",
-            f"₹{stats['total_tax']:.2f}",
-            f"₹{stats['avg_order_value']:.2f}"
-        ]
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[2*inch, 2*inch, 2*inch, 2*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 0.5*inch))
+    report.table(['Total Orders', 'Total Sales', 'Total Tax', 'Average Order'], widths=[2*inch] * 4, header_fill=header_fill)
+    report.row([
+        stats['total_orders'],
+        f"₹{stats['total_sales']:.2f}",
+        f"₹{stats['total_tax']:.2f}",
+        f"₹{stats['avg_order_value']:.2f}"
+    ])
+    report.spacer(0.5*inch)
     
     # Orders table
-    table_data = [['Token', 'Date', 'Customer', 'Items', 'Payment', 'Amount', 'Tax', 'Status']]
+    report.table(
+        ['Token', 'Date', 'Customer', 'Items', 'Payment', 'Amount', 'Tax', 'Status'],
+        widths=[0.8*inch, 1.3*inch, 1.5*inch, 0.7*inch, 1*inch, 1*inch, 0.9*inch, 1*inch],
+        header_fill=header_fill,
+        fills=(colors.white, colors.lightgrey),
+    )
     
-    for order in orders:
-        customer = 'Walk-in'
-        if hasattr(order, 'checkout') and order.checkout and order.checkout.customer_name:
-            customer = order.checkout.customer_name
-        
-        table_data.append([
+    orders = orders.prefetch_related(None).annotate(items_count=Count('items'))
+    for order in orders.iterator(chunk_size=CHUNK_SIZE):
+        checkout = getattr(order, 'checkout', None)
+        report.row([
             f"#{order.token}",
             order.create_date.strftime('%d/%m/%Y %H:%M'),
-            customer[:20],  # Truncate long names
-            str(order.items.count()),
+            (checkout.customer_name if checkout else None) or 'Walk-in',
+            order.items_count,
             order.payment_method or 'N/A',
             f"₹{order.total_price:.2f}",
             f"₹{order.total_tax:.2f}",
             order.status
         ])
     
-    orders_table = Table(table_data, colWidths=[0.8*inch, 1.3*inch, 1.5*inch, 0.7*inch, 1*inch, 1*inch, 0.9*inch, 1*inch])
-    orders_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
-    
-    elements.append(orders_table)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    # Get PDF value
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    # Create response
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename=B2B_Sales_Report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    response.write(pdf)
-    
-    return response
+    return report.response(f'B2B_Sales_Report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf')
 
 
 @login_required
@@ -3017,7 +2317,7 @@ def b2b_invoice(request, order_id):
     """Generate printable B2B invoice"""
     try:
         order = Order.objects.get(id=order_id)
-        store_membership = request.user.store_memberships.first()
+        store_membership = request.store_ctx.membership
         
         if not store_membership:
             return render(request, 'error.html', {'message': 'No store assigned'})
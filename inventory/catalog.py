@@ -0,0 +1,141 @@
+"""
+Per-store menu catalog snapshot for POS terminals.
+
+The whole catalog (categories, menu items, taxes, modifiers and their options)
+is serialized once into a JSON document and cached under the store's current
+CatalogVersion. Saving or deleting any of those rows bumps the version (see
+signals.py), so the next request rebuilds the snapshot; until then every
+terminal gets the cached bytes, or a 304 when its ETag still matches.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from authentication import store_cache
+
+from .models import CatalogVersion, FoodCategory, Menu, ModifierOptions, Modifiers, Tax
+
+# Seconds the current version number is cached; bumps clear it straight away
+VERSION_TTL = 60
+
+# Seconds a built snapshot is kept; it is only served for its own version
+SNAPSHOT_TTL = 24 * 60 * 60
+
+
+def _version_key(store_id):
+    return f'catalog_version:{store_id}'
+
+
+def _snapshot_key(store_id, version):
+    return f'catalog:{store_id}:{version}'
+
+
+def current_version(store_id):
+    key = _version_key(store_id)
+    version = cache.get(key)
+    if version is None:
+        version = CatalogVersion.objects.get_or_create(store_id=store_id)[0].version
+        cache.set(key, version, VERSION_TTL)
+    return version
+
+
+def bump_version(store_id):
+    """
+    Mark the store's catalog as changed.
+
+    Stores without a CatalogVersion row have never had a snapshot built, so
+    there is nothing to invalidate; the row is created on first read.
+    """
+    CatalogVersion.objects.filter(store_id=store_id).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    # Clearing after commit keeps readers from caching the old number again
+    key = _version_key(store_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _file_url(name):
+    return default_storage.url(name) if name else None
+
+
+def build_catalog(store_id, version):
+    """
+    The catalog document of one store; six queries.
+
+    Nothing time-dependent goes in, so a rebuild of the same version has the
+    same bytes and the same ETag.
+    """
+    categories = [
+        {'id': row['id'], 'name': row['name'], 'image': _file_url(row['image']), 'active': row['active']}
+        for row in FoodCategory.objects.filter(store_id=store_id).order_by('name').values('id', 'name', 'image', 'active')
+    ]
+    taxes = list(
+        Tax.objects.filter(store_id=store_id).order_by('tax_name')
+        .values('id', 'tax_name', 'tax_percentage', 'is_active')
+    )
+
+    options = defaultdict(list)
+    for row in ModifierOptions.objects.filter(modifier__store_id=store_id).order_by('id').values('id', 'modifier_id', 'name', 'price'):
+        options[row.pop('modifier_id')].append(row)
+    modifiers = [
+        dict(row, options=options[row['id']])
+        for row in Modifiers.objects.filter(store_id=store_id).order_by('name').values('id', 'name', 'price', 'status')
+    ]
+
+    items = Menu.objects.filter(store_id=store_id)
+    tax_ids = defaultdict(list)
+    for menu_id, tax_id in Menu.taxes.through.objects.filter(menu__in=items).values_list('menu_id', 'tax_id'):
+        tax_ids[menu_id].append(tax_id)
+    modifier_ids = defaultdict(list)
+    for menu_id, modifier_id in Menu.modifiers.through.objects.filter(menu__in=items).values_list('menu_id', 'modifiers_id'):
+        modifier_ids[menu_id].append(modifier_id)
+
+    menu_items = []
+    for row in items.order_by('category_id', 'name').values(
+        'id', 'name', 'image', 'color', 'portion', 'diet', 'price', 'status', 'description',
+        'category_id', 'category__name', 'price_before_tax', 'total_tax_amount',
+        'stock', 'stock_track', 'code', 'barcode',
+    ):
+        row['image'] = _file_url(row['image'])
+        row['category_name'] = row.pop('category__name')
+        row['tax_ids'] = tax_ids[row['id']]
+        row['modifier_ids'] = modifier_ids[row['id']]
+        menu_items.append(row)
+
+    return {
+        'store_id': str(store_id),
+        'version': version,
+        'categories': categories,
+        'taxes': taxes,
+        'modifiers': modifiers,
+        'items': menu_items,
+    }
+
+
+def get_snapshot(store_id):
+    """Return (version, etag, body bytes) of the store's current catalog"""
+    version = current_version(store_id)
+
+    def build():
+        body = json.dumps(build_catalog(store_id, version), cls=DjangoJSONEncoder).encode()
+        etag = f'"{version}-{hashlib.sha256(body).hexdigest()[:16]}"'
+        return (version, etag, body)
+
+    return store_cache.fetch('catalog', _snapshot_key(store_id, version), build, SNAPSHOT_TTL)
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check; weak comparison, as RFC 9110 asks for GET"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
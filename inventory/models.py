@@ -131,4 +131,13 @@ class Menu(models.Model):
         return self.name
 
     class Meta:
-        unique_together = ['store', 'name', 'portion']
\ No newline at end of file
+        unique_together = ['store', 'name', 'portion']
+
+class CatalogVersion(models.Model):
+    """Per-store catalog version, bumped whenever menu data changes (see catalog.py)"""
+    store = models.OneToOneField(Store, on_delete=models.CASCADE, primary_key=True, related_name='catalog_version')
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.store_id} v{self.version}"
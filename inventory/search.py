@@ -0,0 +1,231 @@
+"""
+In-memory menu search for POS lookup.
+
+Each process keeps one MenuIndex per store, built from a single values()
+query over the store's active menu items and tagged with the store's catalog
+version (catalog.py). Menu writes bump that version, so the next search
+rebuilds the index; between writes a lookup touches no database table.
+
+Matches are ranked: exact barcode, exact code, code prefix, name prefix,
+word prefix, name substring, code or barcode substring, description
+substring, then trigram similarity on the name for typos.
+
+No lookup walks every item. Code prefixes come from a sorted list of codes,
+word prefixes from a trie, and substrings from postings of every 1-3
+character slice of each field: a query of up to three characters is one
+posting, and a longer one is checked only against the items holding all of
+its three-character slices.
+"""
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+
+from . import catalog
+from .models import Menu
+
+DEFAULT_LIMIT = 20
+
+# Minimum trigram similarity for a fuzzy name match
+FUZZY_THRESHOLD = 0.3
+
+SCORE_BARCODE = 100
+SCORE_CODE = 90
+SCORE_CODE_PREFIX = 80
+SCORE_NAME_PREFIX = 70
+SCORE_WORD_PREFIX = 60
+SCORE_NAME_SUBSTRING = 50
+SCORE_CODE_SUBSTRING = 40
+SCORE_DESCRIPTION = 30
+SCORE_FUZZY = 20  # scaled by similarity
+
+# Longest slice kept in the substring postings
+GRAM_SIZE = 3
+
+# Normalized fields matched by substring, and the score of a match in each
+SUBSTRING_FIELDS = (
+    ('_name', SCORE_NAME_SUBSTRING),
+    ('_code', SCORE_CODE_SUBSTRING),
+    ('_barcode', SCORE_CODE_SUBSTRING),
+    ('_description', SCORE_DESCRIPTION),
+)
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _normalize(value):
+    return (value or '').strip().lower()
+
+
+def _trigrams(text):
+    grams = set()
+    for word in _WORD_RE.findall(text):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _slices(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class MenuIndex:
+    """Search structures over one store's active menu items"""
+
+    def __init__(self, rows):
+        self.rows = {}
+        self.by_barcode = defaultdict(list)
+        self.by_code = defaultdict(list)
+        self.trie = _TrieNode()
+        self.trigrams = defaultdict(set)
+        self.name_trigrams = {}
+        self.substrings = {field: defaultdict(set) for field, _ in SUBSTRING_FIELDS}
+
+        for row in rows:
+            item_id = row['id']
+            row['image'] = default_storage.url(row['image']) if row['image'] else None
+            row['category_name'] = row.pop('category__name')
+            row['_name'] = _normalize(row['name'])
+            row['_code'] = _normalize(row['code'])
+            row['_description'] = _normalize(row['description'])
+            row['_barcode'] = _normalize(row['barcode'])
+            self.rows[item_id] = row
+
+            if row['_barcode']:
+                self.by_barcode[row['_barcode']].append(item_id)
+            if row['_code']:
+                self.by_code[row['_code']].append(item_id)
+
+            for field, postings in self.substrings.items():
+                for size in range(1, GRAM_SIZE + 1):
+                    for piece in _slices(row[field], size):
+                        postings[piece].add(item_id)
+
+            for word in set(_WORD_RE.findall(row['_name'])):
+                self._insert(word, item_id)
+
+            grams = _trigrams(row['_name'])
+            self.name_trigrams[item_id] = grams
+            for gram in grams:
+                self.trigrams[gram].add(item_id)
+
+        self.codes = sorted(self.by_code)
+
+    def _insert(self, word, item_id):
+        node = self.trie
+        for char in word:
+            node = node.children.setdefault(char, _TrieNode())
+            node.ids.add(item_id)
+
+    def _prefixed(self, prefix):
+        node = self.trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def _code_prefixed(self, prefix):
+        """Items whose code starts with ``prefix``"""
+        item_ids = []
+        for position in range(bisect_left(self.codes, prefix), len(self.codes)):
+            code = self.codes[position]
+            if not code.startswith(prefix):
+                break
+            item_ids.extend(self.by_code[code])
+        return item_ids
+
+    def _containing(self, field, query):
+        """Items whose ``field`` contains ``query``"""
+        postings = self.substrings[field]
+        size = min(len(query), GRAM_SIZE)
+        candidates = sorted((postings.get(piece, ()) for piece in _slices(query, size)), key=len)
+        if not candidates[0]:
+            return ()
+        item_ids = set(candidates[0]).intersection(*candidates[1:])
+        if len(query) <= GRAM_SIZE:
+            return item_ids
+        # Holding every slice doesn't make it a substring ("abcab" has those of "abcabc")
+        return [item_id for item_id in item_ids if query in self.rows[item_id][field]]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Return up to ``limit`` rows, best match first"""
+        query = _normalize(query)
+        if not query:
+            return []
+
+        scores = {}
+
+        def score(item_ids, value):
+            for item_id in item_ids:
+                if value > scores.get(item_id, 0):
+                    scores[item_id] = value
+
+        score(self.by_barcode.get(query, ()), SCORE_BARCODE)
+        score(self.by_code.get(query, ()), SCORE_CODE)
+
+        # Word prefixes: every query word must prefix some word of the name
+        words = _WORD_RE.findall(query)
+        if words:
+            matched = set.intersection(*(set(self._prefixed(word)) for word in words))
+            score(
+                [item_id for item_id in matched if self.rows[item_id]['_name'].startswith(query)],
+                SCORE_NAME_PREFIX,
+            )
+            score(matched, SCORE_WORD_PREFIX)
+
+        score(self._code_prefixed(query), SCORE_CODE_PREFIX)
+        for field, value in SUBSTRING_FIELDS:
+            score(self._containing(field, query), value)
+
+        if len(scores) < limit:
+            grams = _trigrams(query)
+            shared = defaultdict(int)
+            for gram in grams:
+                for item_id in self.trigrams.get(gram, ()):
+                    shared[item_id] += 1
+            for item_id, count in shared.items():
+                similarity = count / (len(grams) + len(self.name_trigrams[item_id]) - count)
+                if similarity >= FUZZY_THRESHOLD:
+                    score([item_id], SCORE_FUZZY * similarity)
+
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], self.rows[item_id]['_name']))
+        return [self.rows[item_id] for item_id in ranked[:limit]]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(store_id):
+    """The store's index for its current catalog version, building it if needed"""
+    version = catalog.current_version(store_id)
+    entry = _indexes.get(store_id)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    with _lock:
+        entry = _indexes.get(store_id)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        rows = Menu.objects.filter(store_id=store_id, status=True).values(
+            'id', 'name', 'code', 'barcode', 'description', 'price', 'image', 'category__name'
+        )
+        index = MenuIndex(rows)
+        _indexes[store_id] = (version, index)
+        return index
+
+
+def search_menu(store_id, query, limit=DEFAULT_LIMIT):
+    """Ranked active menu items of the store matching ``query``"""
+    return get_index(store_id).search(query, limit)
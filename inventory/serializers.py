@@ -12,8 +12,8 @@ class TaxSerializer(serializers.ModelSerializer):
     def validate_tax_name(self, value):
         """Validate unique tax name within store"""
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             # Check for duplicate tax name in the same store
             queryset = Tax.objects.filter(store=store, tax_name=value)
             if self.instance:
@@ -40,8 +40,8 @@ class ModifiersSerializer(serializers.ModelSerializer):
     def validate_name(self, value):
         """Validate unique modifier name within store"""
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             queryset = Modifiers.objects.filter(store=store, name=value)
             if self.instance:
                 queryset = queryset.exclude(id=self.instance.id)
@@ -61,8 +61,8 @@ class ModifiersCreateSerializer(serializers.ModelSerializer):
     def validate_name(self, value):
         """Validate unique modifier name within store"""
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             queryset = Modifiers.objects.filter(store=store, name=value)
             if self.instance:
                 queryset = queryset.exclude(id=self.instance.id)
@@ -75,8 +75,8 @@ class ModifiersCreateSerializer(serializers.ModelSerializer):
         
         # Get store from request context
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            validated_data['store'] = request.user_store
+        if request and request.store_ctx.store is not None:
+            validated_data['store'] = request.store_ctx.store
         
         modifier = Modifiers.objects.create(**validated_data)
         
@@ -118,8 +118,8 @@ class FoodCategorySerializer(serializers.ModelSerializer):
     def validate_name(self, value):
         """Validate unique category name within store"""
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             queryset = FoodCategory.objects.filter(store=store, name=value)
             if self.instance:
                 queryset = queryset.exclude(id=self.instance.id)
@@ -130,8 +130,8 @@ class FoodCategorySerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Get store from request context
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            validated_data['store'] = request.user_store
+        if request and request.store_ctx.store is not None:
+            validated_data['store'] = request.store_ctx.store
         return super().create(validated_data)
 
 
@@ -191,46 +191,19 @@ class MenuCreateUpdateSerializer(serializers.ModelSerializer):
         fields = super().get_fields()
         
         request = self.context.get('request')
-        
-        # Enhanced debugging
-        print("=" * 50)
-        print("DEBUG: get_fields() called")
-        print(f"Request object: {request}")
-        print(f"Has user_store attribute: {hasattr(request, 'user_store') if request else 'No request'}")
-        
-        if request:
-            print(f"Request user: {request.user}")
-            print(f"User authenticated: {request.user.is_authenticated if hasattr(request, 'user') else 'No user'}")
-            if hasattr(request, 'user_store'):
-                print(f"user_store value: {request.user_store}")
-        
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
-            
-            # Debug: Print store and available data
-            print(f"Current store: {store}")
-            categories = FoodCategory.objects.filter(store=store, active=True)
-            print(f"Available categories: {list(categories.values('id', 'name'))}")
-            print(f"Category 21 exists in queryset: {categories.filter(id=21).exists()}")
-            
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             # Filter querysets based on current user's store
             fields['taxes'].queryset = Tax.objects.filter(store=store, is_active=True)
             fields['modifiers'].queryset = Modifiers.objects.filter(store=store, status=True)
             fields['category'].queryset = FoodCategory.objects.filter(store=store, active=True)
-            
-            print(f"Category queryset count: {fields['category'].queryset.count()}")
-        else:
-            print("WARNING: No store found in request context")
-            print(f"Context keys: {self.context.keys()}")
-        
-        print("=" * 50)
         return fields
 
     def validate_modifiers(self, value):
         """Custom validation for modifiers"""
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             for modifier in value:
                 if modifier.store != store:
                     raise serializers.ValidationError(f"Modifier '{modifier.name}' does not belong to your store.")
@@ -240,8 +213,8 @@ class MenuCreateUpdateSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             name = attrs.get('name')
             portion = attrs.get('portion')
             
@@ -277,8 +250,8 @@ class MenuCreateUpdateSerializer(serializers.ModelSerializer):
         
         # Get store from request context
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            validated_data['store'] = request.user_store
+        if request and request.store_ctx.store is not None:
+            validated_data['store'] = request.store_ctx.store
         
         menu_item = Menu.objects.create(**validated_data)
         
@@ -0,0 +1,39 @@
+# Signals to bump the store's catalog version and cache namespace when menu data changes
+from .models import Tax, Modifiers, ModifierOptions, FoodCategory, Menu
+from . import catalog
+from authentication import store_cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=FoodCategory)
+@receiver(post_delete, sender=FoodCategory)
+@receiver(post_save, sender=Tax)
+@receiver(post_delete, sender=Tax)
+@receiver(post_save, sender=Modifiers)
+@receiver(post_delete, sender=Modifiers)
+def bump_catalog_on_change(sender, instance, **kwargs):
+    """A catalog row changed: the store's snapshot and cached entries are stale"""
+    catalog.bump_version(instance.store_id)
+    store_cache.bump(instance.store_id)
+
+
+@receiver(post_save, sender=ModifierOptions)
+@receiver(post_delete, sender=ModifierOptions)
+def bump_catalog_on_option_change(sender, instance, **kwargs):
+    """Options belong to the store through their modifier"""
+    store_id = Modifiers.objects.filter(pk=instance.modifier_id).values_list('store_id', flat=True).first()
+    if store_id is not None:
+        catalog.bump_version(store_id)
+        store_cache.bump(store_id)
+
+
+@receiver(m2m_changed, sender=Menu.taxes.through)
+@receiver(m2m_changed, sender=Menu.modifiers.through)
+def bump_catalog_on_m2m_change(sender, instance, action, **kwargs):
+    """Taxes or modifiers attached to a menu item changed"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        catalog.bump_version(instance.store_id)
+        store_cache.bump(instance.store_id)
@@ -1,3 +1,152 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from authentication import store_cache
+from authentication.models import CustomUser, Store, StoreUser
+
+from . import search
+from .models import FoodCategory, Menu, ModifierOptions, Modifiers, Tax
+
+# Tests run against a private in-memory cache, never the configured shared one
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MenuTestCase(TestCase):
+    """A store whose owner sells a taxed latte"""
+
+    def setUp(self):
+        cache.clear()
+        # Hand the hit/miss counts to the test cache, not to the exit-time flush
+        self.addCleanup(store_cache.flush_stats)
+        self.store = Store.objects.create(
+            name='Cafe', store_code='CAFE1', owner_name='Owner', business_type='cafe',
+        )
+        user = CustomUser.objects.create_user(email='owner@example.com', first_name='Own', last_name='Er')
+        StoreUser.objects.create(store=self.store, user=user, role='store_owner', permissions=['all'])
+        self.category = FoodCategory.objects.create(store=self.store, name='Drinks')
+        self.tax = Tax.objects.create(store=self.store, tax_name='GST', tax_percentage=Decimal('5.00'))
+        self.modifier = Modifiers.objects.create(store=self.store, name='Milk', price=0)
+        self.latte = Menu.objects.create(
+            store=self.store, category=self.category, name='Latte', portion='Small', diet='Veg',
+            price=Decimal('10.00'),
+        )
+        self.latte.taxes.set([self.tax])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+
+class CatalogSnapshotTests(MenuTestCase):
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/menu/catalog/', **headers)
+
+    def test_unchanged_catalog_answers_304_without_reading_it(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200, response.content)
+        items = response.json()['items']
+        self.assertEqual([(item['name'], item['tax_ids']) for item in items], [('Latte', [self.tax.id])])
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.get(response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'inventory_' in q['sql']])
+
+    def test_catalog_edits_invalidate_the_etag(self):
+        response = self.get()
+        etag, version = response['ETag'], int(response['X-Catalog-Version'])
+
+        edits = [
+            lambda: ModifierOptions.objects.create(modifier=self.modifier, name='Oat', price='0.50'),
+            lambda: self.latte.taxes.clear(),
+            lambda: Menu.objects.filter(pk=self.latte.pk).first().save(),
+            lambda: self.tax.delete(),
+        ]
+        for edit in edits:
+            with self.captureOnCommitCallbacks(execute=True):
+                edit()
+            response = self.get(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertGreater(int(response['X-Catalog-Version']), version)
+            etag, version = response['ETag'], int(response['X-Catalog-Version'])
+            self.assertEqual(self.get(etag).status_code, 304)
+
+        self.assertEqual(response.json()['items'][0]['tax_ids'], [])
+
+    def test_another_stores_edit_keeps_the_etag(self):
+        etag = self.get()['ETag']
+        other = Store.objects.create(name='Other', store_code='OTHER1', owner_name='Owner', business_type='cafe')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tax.objects.create(store=other, tax_name='VAT', tax_percentage=Decimal('10.00'))
+        self.assertEqual(self.get(etag).status_code, 304)
+
+
+class MenuSearchTests(MenuTestCase):
+    def add(self, name, code=None, barcode=None, description='', status=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Menu.objects.create(
+                store=self.store, category=self.category, name=name, portion='Small', diet='Veg',
+                price=Decimal('5.00'), code=code, barcode=barcode, description=description, status=status,
+            )
+
+    def names(self, query):
+        return [row['name'] for row in search.search_menu(self.store.pk, query)]
+
+    def test_matches_are_ranked(self):
+        self.add('Iced Tea', code='LT1', barcode='8901234500017')
+        self.add('Cold Latte', code='CL1')
+        self.add('Lattice Cookie', code='LC1')
+        self.add('Mocha', code='MO1', description='Like a latte with chocolate')
+        self.add('Chai', code='XLT9')
+
+        # Exact barcode, then exact code, then code prefix
+        self.assertEqual(self.names('8901234500017'), ['Iced Tea'])
+        self.assertEqual(self.names('LT1')[0], 'Iced Tea')
+        self.assertEqual(self.names('lt'), ['Iced Tea', 'Chai'])
+        # Name prefix, word prefix, name substring, code substring, description
+        self.assertEqual(
+            self.names('lat'),
+            ['Latte', 'Lattice Cookie', 'Cold Latte', 'Mocha'],
+        )
+        self.assertEqual(self.names('atte'), ['Cold Latte', 'Latte', 'Mocha'])
+
+    def test_code_and_barcode_substrings_match(self):
+        self.add('Iced Tea', code='TEA-042', barcode='8901234500017')
+        self.assertEqual(self.names('45000'), ['Iced Tea'])
+        self.assertEqual(self.names('a-04'), ['Iced Tea'])
+        self.assertEqual(self.names('0'), ['Iced Tea'])
+
+    def test_substring_needs_every_slice_in_order(self):
+        # Long enough a name that the typo fallback doesn't match it either
+        self.add('Abcab Vanilla Almond Hazelnut Frappe')
+        self.add('Abcabc')
+        # "abcab" holds every three-letter slice of "abcabc" but not the string
+        self.assertEqual(self.names('abcabc'), ['Abcabc'])
+
+    def test_typos_fall_back_to_trigram_similarity(self):
+        self.add('Cappuccino')
+        self.assertEqual(self.names('capucino'), ['Cappuccino'])
+        self.assertEqual(self.names('zzzz'), [])
+
+    def test_index_is_reused_until_the_menu_changes(self):
+        self.assertEqual(self.names('latte'), ['Latte'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names('latte'), ['Latte'])
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'inventory_menu' in q['sql']])
+
+        self.add('Latte Grande')
+        self.add('Latte Hidden', status=False)
+        self.assertEqual(self.names('latte'), ['Latte', 'Latte Grande'])
+
+    def test_endpoint_returns_ranked_items(self):
+        self.add('Cold Latte')
+        response = self.client.get('/menu/menu/search/', {'q': 'latte'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([item['name'] for item in response.json()['menu_items']], ['Latte', 'Cold Latte'])
+        self.assertEqual(self.client.get('/menu/menu/search/').status_code, 400)
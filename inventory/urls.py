@@ -28,6 +28,7 @@ urlpatterns = [
     path('menu/by-category/<int:category_id>/', views.menu_by_category, name='menu-by-category'),
     path('menu/bulk-update-status/', views.bulk_update_menu_status, name='menu-bulk-update-status'),
     path('menu/search/', views.search_menu_items, name='menu-search'),
+    path('catalog/', views.catalog_snapshot, name='catalog-snapshot'),
     path('menu/<int:menu_id>/duplicate/', views.duplicate_menu_item, name='menu-duplicate'),
     
     # Dashboard
@@ -1,15 +1,18 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.db import models
 
-from authentication.models import Store, StoreUser
+from authentication.claims import StoreClaimsAuthentication
+from authentication.models import StoreUser
 from authentication.permissions import IsStoreOwner
 from .models import Tax, Modifiers, ModifierOptions, FoodCategory, Menu
+from . import catalog, search
 from .serializers import (
     TaxSerializer, ModifiersSerializer, ModifiersCreateSerializer,
     ModifierOptionsSerializer, FoodCategorySerializer, MenuListSerializer,
@@ -21,30 +24,21 @@ class StoreContextMixin:
     """Mixin to automatically get user's store and filter queryset"""
     
     def get_user_store(self):
-        """Get the user's store from StoreUser relationship"""
-        if not hasattr(self.request, 'user_store'):
-            try:
-                # Get the user's active store membership
-                store_user = StoreUser.objects.select_related('store').get(
-                    user=self.request.user,
-                    is_active=True,
-                    store__is_active=True
-                )
-                self.request.user_store = store_user.store
-                self.request.user_store_role = store_user.role
-            except StoreUser.DoesNotExist:
-                # Instead of raising Response, use a proper exception
-                from rest_framework.exceptions import PermissionDenied
-                raise PermissionDenied("You are not associated with any active store.")
-        return self.request.user_store
+        """Get the user's store from the request's store context"""
+        store = self.request.store_ctx.store
+        if store is None or not store.is_active:
+            # Instead of raising Response, use a proper exception
+            from rest_framework.exceptions import PermissionDenied
+            raise PermissionDenied("You are not associated with any active store.")
+        return store
     
     def initial(self, request, *args, **kwargs):
         """
-        Called before anything else. This ensures user_store is set
-        before serializer validation happens.
+        Called before anything else. This rejects users without an active
+        store before serializer validation happens.
         """
         super().initial(request, *args, **kwargs)
-        # Set user_store early so it's available during serializer initialization
+        # Check the store early so serializers can rely on it
         self.get_user_store()
     
     def get_queryset(self):
@@ -154,11 +148,7 @@ class ModifierOptionsListCreateView(generics.ListCreateAPIView):
         modifier_id = self.kwargs.get('modifier_id')
         # Ensure modifier belongs to user's store
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                is_active=True,
-                store__is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership(active_store=True)
             modifier = get_object_or_404(
                 Modifiers, 
                 id=modifier_id, 
@@ -176,11 +166,7 @@ class ModifierOptionsListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         modifier_id = self.kwargs.get('modifier_id')
         # Ensure modifier belongs to user's store
-        store_user = StoreUser.objects.get(
-            user=self.request.user,
-            is_active=True,
-            store__is_active=True
-        )
+        store_user = self.request.store_ctx.get_membership(active_store=True)
         modifier = get_object_or_404(
             Modifiers, 
             id=modifier_id, 
@@ -200,11 +186,7 @@ class ModifierOptionsRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPI
     def get_queryset(self):
         # Ensure option's modifier belongs to user's store
         try:
-            store_user = StoreUser.objects.get(
-                user=self.request.user,
-                is_active=True,
-                store__is_active=True
-            )
+            store_user = self.request.store_ctx.get_membership(active_store=True)
             return ModifierOptions.objects.filter(modifier__store=store_user.store)
         except StoreUser.DoesNotExist:
             return ModifierOptions.objects.none()
@@ -258,6 +240,7 @@ class MenuListCreateView(StoreContextMixin, generics.ListCreateAPIView):
     post: Create a new menu item (store owners only)
     """
     queryset = Menu.objects.select_related('category').prefetch_related('taxes', 'modifiers')
+    authentication_classes = [StoreClaimsAuthentication]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'diet', 'portion', 'category', 'stock_track']
     search_fields = ['name', 'description', 'code', 'barcode']
@@ -273,15 +256,8 @@ class MenuListCreateView(StoreContextMixin, generics.ListCreateAPIView):
         if self.request.method == 'POST':
             return [IsStoreOwner()]
         return [IsAuthenticated()]
-    
-    def get_serializer_context(self):
-        """Ensure request is in context with user_store"""
-        context = super().get_serializer_context()
-        print(f"VIEW: get_serializer_context called")
-        print(f"VIEW: Request has user_store: {hasattr(self.request, 'user_store')}")
-        if hasattr(self.request, 'user_store'):
-            print(f"VIEW: user_store value: {self.request.user_store}")
-        return context
+
+
 class MenuRetrieveUpdateDestroyView(StoreContextMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     get: Get menu item details (authenticated users)
@@ -308,11 +284,7 @@ def menu_by_category(request, category_id):
     """Get all menu items for a specific category in user's store"""
     try:
         # Get user's store
-        store_user = StoreUser.objects.select_related('store').get(
-            user=request.user,
-            is_active=True,
-            store__is_active=True
-        )
+        store_user = request.store_ctx.get_membership(active_store=True)
         store = store_user.store
         
         # Get category that belongs to user's store
@@ -336,17 +308,42 @@ def menu_by_category(request, category_id):
         )
 
 
+@api_view(['GET'])
+@authentication_classes([StoreClaimsAuthentication])
+@permission_classes([IsAuthenticated])
+def catalog_snapshot(request):
+    """
+    Whole menu catalog of the user's store in one cached document.
+
+    Send the last ETag back as If-None-Match; an unchanged catalog answers
+    304 with no body.
+    """
+    store = request.store_ctx.store
+    if store is None:
+        return Response(
+            {"detail": "You are not associated with any active store."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    version, etag, body = catalog.get_snapshot(store.id)
+    if catalog.etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['X-Catalog-Version'] = str(version)
+    # Terminals keep their copy but must revalidate before using it
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([IsStoreOwner])
 def bulk_update_menu_status(request):
     """Bulk update menu item status for user's store"""
     try:
         # Get user's store
-        store_user = StoreUser.objects.select_related('store').get(
-            user=request.user,
-            is_active=True,
-            store__is_active=True
-        )
+        store_user = request.store_ctx.get_membership(active_store=True)
         store = store_user.store
         
         menu_ids = request.data.get('menu_ids', [])
@@ -362,6 +359,8 @@ def bulk_update_menu_status(request):
             id__in=menu_ids,
             store=store
         ).update(status=new_status)
+        # update() sends no signals
+        catalog.bump_version(store.id)
         
         return Response({
             "detail": f"Updated {updated_count} menu items",
@@ -381,11 +380,7 @@ def menu_dashboard(request):
     """Get menu dashboard data for user's store"""
     try:
         # Get user's store
-        store_user = StoreUser.objects.select_related('store').get(
-            user=request.user,
-            is_active=True,
-            store__is_active=True
-        )
+        store_user = request.store_ctx.get_membership(active_store=True)
         store = store_user.store
         
         # Get dashboard statistics
@@ -434,11 +429,7 @@ def search_menu_items(request):
     """Search menu items across categories in user's store"""
     try:
         # Get user's store
-        store_user = StoreUser.objects.select_related('store').get(
-            user=request.user,
-            is_active=True,
-            store__is_active=True
-        )
+        store_user = request.store_ctx.get_membership(active_store=True)
         store = store_user.store
         
         query = request.GET.get('q', '')
@@ -448,16 +439,10 @@ def search_menu_items(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Search across menu items
-        menu_items = Menu.objects.filter(
-            store=store,
-            status=True
-        ).filter(
-            models.Q(name__icontains=query) |
-            models.Q(description__icontains=query) |
-            models.Q(code__icontains=query) |
-            models.Q(barcode__icontains=query)
-        ).select_related('category').prefetch_related('taxes', 'modifiers')[:20]  # Limit results
+        # Ranked ids from the store's in-memory index, then one page of rows
+        ranked_ids = [row['id'] for row in search.search_menu(store.id, query, limit=20)]
+        found = Menu.objects.filter(id__in=ranked_ids).select_related('category').prefetch_related('taxes', 'modifiers').in_bulk()
+        menu_items = [found[item_id] for item_id in ranked_ids if item_id in found]
         
         serializer = MenuListSerializer(menu_items, many=True)
         return Response({
@@ -479,11 +464,7 @@ def duplicate_menu_item(request, menu_id):
     """Duplicate a menu item with modifications"""
     try:
         # Get user's store
-        store_user = StoreUser.objects.select_related('store').get(
-            user=request.user,
-            is_active=True,
-            store__is_active=True
-        )
+        store_user = request.store_ctx.get_membership(active_store=True)
         store = store_user.store
         
         # Get original menu item
@@ -6,3 +6,4 @@ class OrdersConfig(AppConfig):
     name = 'orders'
     def ready(self):
         import orders.signals
+        import orders.sqlite
@@ -0,0 +1,76 @@
+"""
+Change cursors for the ``?since=`` delta feeds (kitchen display, active B2B orders).
+
+A cursor is an opaque string handed back with every response. It is taken
+before the feed is queried and wound back by ``CURSOR_OVERLAP`` so a write
+that commits while the poll is running is picked up by the next one; clients
+replace rows by id, so seeing an order twice is harmless.
+
+Deleted orders leave a DeletedOrder tombstone, which feeds return as
+``deleted``. Tombstones are kept for TOMBSTONE_RETENTION; older cursors are
+refused, and the client reloads the full feed.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DeletedOrder, OrderItem
+
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+CURSOR_HEADER = 'X-Cursor'
+
+# How long deleted orders are remembered, and so the oldest usable cursor
+TOMBSTONE_RETENTION = timedelta(days=2)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def make_cursor():
+    """Cursor for a feed that is about to be read"""
+    since = timezone.now() - CURSOR_OVERLAP
+    return str(int(since.timestamp() * 1_000_000))
+
+
+def parse_cursor(value):
+    """Turn a cursor back into an aware datetime"""
+    try:
+        micros = int(value)
+        since = datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise InvalidCursor(f"Invalid cursor: {value!r}")
+    if since < timezone.now() - TOMBSTONE_RETENTION:
+        raise InvalidCursor("Cursor expired; reload the feed without ?since=")
+    return since
+
+
+def changed_order_ids(orders, since):
+    """
+    Ids of orders in ``orders`` whose row or any of whose items changed after ``since``.
+
+    Uses the updated_at indexes on both tables; item deletes bump the order
+    through the totals engine.
+    """
+    changed_items = OrderItem.objects.filter(order__in=orders, updated_at__gt=since).values('order_id')
+    return set(
+        orders.filter(Q(updated_at__gt=since) | Q(pk__in=changed_items))
+        .order_by()
+        .values_list('pk', flat=True)
+    )
+
+
+def record_deleted(order):
+    """Leave a tombstone for a deleted order and drop the store's expired ones"""
+    DeletedOrder.objects.filter(store_id=order.store_id, deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+    DeletedOrder.objects.create(store_id=order.store_id, order_id=order.pk)
+
+
+def deleted_order_ids(store_ids, since):
+    """Ids of the stores' orders deleted after ``since``"""
+    return sorted(set(
+        DeletedOrder.objects.filter(store_id__in=store_ids, deleted_at__gt=since)
+        .values_list('order_id', flat=True)
+    ))
@@ -0,0 +1,202 @@
+"""
+Per-store order event channel for kitchen displays and POS terminals.
+
+Mutating views call ``publish_order_event()``; once the transaction commits the
+order is serialized once and handed to the broker, which fans it out to every
+stream subscribed to that store. The default broker keeps subscribers in
+process memory, so it only reaches streams served by the same process; set
+``ORDER_EVENTS_BROKER`` to the dotted path of another broker class to share
+events between workers.
+
+Browsers' EventSource cannot send an Authorization header, so a screen first
+POSTs for a stream ticket with its JWT (issue_ticket) and opens the stream
+with ``?ticket=``. A ticket is random, names only the user, expires after
+STREAM_TICKET_TTL seconds and is redeemed once, so the URLs that end up in
+access logs and browser history carry nothing reusable.
+"""
+import asyncio
+import json
+import secrets
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+ORDER_CREATED = 'order.created'
+ITEM_ADDED = 'order.item_added'
+ITEM_UPDATED = 'order.item_updated'
+ITEM_REMOVED = 'order.item_removed'
+STATUS_CHANGED = 'order.status_changed'
+CHECKED_OUT = 'order.checked_out'
+
+# Events the subscriber queue may hold before the stream is considered stalled
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Seconds of silence before a keep-alive comment is sent
+HEARTBEAT_SECONDS = 15
+
+# Seconds a stream ticket can be redeemed for after it is issued
+STREAM_TICKET_TTL = 30
+
+
+def _ticket_key(ticket):
+    return f'stream_ticket:{ticket}'
+
+
+def issue_ticket(user):
+    """A single-use ticket opening one event stream as ``user``"""
+    ticket = secrets.token_urlsafe(32)
+    cache.set(_ticket_key(ticket), user.pk, STREAM_TICKET_TTL)
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """The user id a ticket was issued to, or None; the ticket is spent either way"""
+    key = _ticket_key(ticket)
+    user_id = cache.get(key)
+    # Only the request whose delete removed the key gets in
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+class Subscription:
+    """One stream's view of the broker: an asyncio queue bound to its event loop"""
+
+    def __init__(self, store_ids):
+        self.store_ids = [str(store_id) for store_id in store_ids]
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, event):
+        """Queue an event from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(_offer, self.queue, event)
+        except RuntimeError:
+            # The stream's loop has already shut down
+            pass
+
+    async def get(self, timeout):
+        """Wait for the next event; None if nothing arrived within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """
+    In-process broker.
+
+    Brokers implement has_subscribers(), subscribe(), unsubscribe() and
+    publish(); subscribe() is called from the stream's event loop, publish()
+    from whichever thread committed the change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def has_subscribers(self, store_id):
+        return bool(self._subscribers.get(str(store_id)))
+
+    def subscribe(self, store_ids):
+        subscription = Subscription(store_ids)
+        with self._lock:
+            for store_id in subscription.store_ids:
+                self._subscribers[store_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for store_id in subscription.store_ids:
+                subscribers = self._subscribers.get(store_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[store_id]
+
+    def publish(self, store_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(store_id), ()))
+        for subscription in subscribers:
+            subscription.offer(event)
+
+
+def _offer(queue, event):
+    # A screen that stops reading is dropped from the backlog rather than
+    # holding events in memory; it resyncs with a full poll on reconnect
+    if queue.full():
+        return
+    queue.put_nowait(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'ORDER_EVENTS_BROKER', 'orders.events.LocalBroker')
+                _broker = import_string(broker_path)()
+    return _broker
+
+
+def publish_order_event(order, event_type, **extra):
+    """
+    Publish an order event after the current transaction commits.
+
+    The payload carries the same order representation the kitchen display
+    endpoint returns, so screens can replace the row in place.
+    """
+    store_id = order.store_id
+    order_id = order.pk
+
+    def send():
+        broker = get_broker()
+        if not broker.has_subscribers(store_id):
+            return
+
+        from .models import Order
+        from .serializers import OrderReadSerializer
+
+        order = Order.objects.select_related('table', 'user', 'store').filter(pk=order_id).first()
+        event = {
+            'type': event_type,
+            'store_id': str(store_id),
+            'order_id': order_id,
+            'order': OrderReadSerializer(order).data if order is not None else None,
+        }
+        event.update(extra)
+        broker.publish(store_id, event)
+
+    transaction.on_commit(send)
+
+
+def format_sse(event):
+    """Encode an event dict as a server-sent event frame"""
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def stream_events(store_ids):
+    """Async generator of SSE frames for the given stores, with keep-alives"""
+    broker = get_broker()
+    subscription = broker.subscribe(store_ids)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,78 @@
+"""
+Helpers for the load test and benchmark commands (load_test_orders,
+benchmark_sqlite). They drive the real endpoints through test clients against
+the configured database, inside a scratch store that is deleted afterwards.
+"""
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.db import connection
+
+from authentication.models import CustomUser, Store, StoreUser
+from inventory.models import FoodCategory, Menu, Tax
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def scratch_store(user_count, role='cashier'):
+    """A store with a taxed menu and ``user_count`` members, plus an order payload"""
+    code = f"LOADTEST-{uuid.uuid4().hex[:8]}"
+    store = Store.objects.create(name=f"Load test {code}", store_code=code, owner_name='Load test', business_type='cafe')
+    category = FoodCategory.objects.create(store=store, name='Drinks')
+    tax = Tax.objects.create(store=store, tax_name='GST', tax_percentage=Decimal('5.00'))
+    menu = [
+        Menu.objects.create(store=store, category=category, name=name, portion='Regular', diet='Veg', price=price)
+        for name, price in [('Latte', Decimal('10.00')), ('Mocha', Decimal('12.00'))]
+    ]
+    menu[0].taxes.set([tax])
+
+    users = []
+    for number in range(user_count):
+        user = CustomUser.objects.create_user(
+            email=f"{code.lower()}-{number}@loadtest.invalid", password=None,
+            first_name='Cashier', last_name=str(number), pin='000000',
+        )
+        StoreUser.objects.create(store=store, user=user, role=role, permissions=['all'])
+        users.append(user)
+
+    payload = {'order_method': 'Takeaway', 'items': [
+        {'menu_item_id': menu[0].id, 'quantity': 2, 'taxes': [tax.id]},
+        {'menu_item_id': menu[1].id, 'quantity': 1},
+    ]}
+    return store, users, payload
+
+
+def drop_scratch_store(store, users):
+    store.delete()
+    CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+
+def run_concurrently(workers):
+    """
+    Start every ``worker`` callable in its own thread at the same moment and
+    wait for all of them; returns their results and the elapsed seconds.
+    Each thread closes its database connection when done.
+    """
+    results = [None] * len(workers)
+    start = threading.Barrier(len(workers) + 1)
+
+    def run(index, worker):
+        try:
+            start.wait()
+            results[index] = worker()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index, worker)) for index, worker in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - began
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders import totals
+from orders.models import OrderItem
+
+
+class Command(BaseCommand):
+    help = "Fill the stored line pricing columns on existing order items and re-total their orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--store', help="Only backfill orders of this store id")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        items = OrderItem.objects.order_by('id')
+        if options['store']:
+            items = items.filter(order__store_id=options['store'])
+
+        done = 0
+        last_id = 0
+        while True:
+            chunk = list(items.filter(id__gt=last_id).values_list('id', 'order_id')[:batch_size])
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                totals.refresh(
+                    {item_id: [] for item_id, _ in chunk},
+                    {order_id: [] for _, order_id in chunk},
+                )
+
+            done += len(chunk)
+            last_id = chunk[-1][0]
+            self.stdout.write(f"Repriced {done} order items")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {done} order items"))
@@ -0,0 +1,158 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from rest_framework.test import APIClient
+
+from orders.loadtest import drop_scratch_store, percentile, run_concurrently, scratch_store
+
+ENDPOINTS = {
+    'orders': '/orders/order-list/',
+    'dashboard': '/dashboard/dashboard/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the order list and dashboard under concurrent checkouts on SQLite; "
+        "--compare runs it with the default and the tuned (SQLITE_TUNED) connection settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help="Threads loading the order list and dashboard")
+        parser.add_argument('--writers', type=int, default=4, help="Threads creating and checking out orders")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+        parser.add_argument('--seed', type=int, default=200, help="Checked-out orders created before measuring")
+        parser.add_argument('--compare', action='store_true', help="Run with SQLITE_TUNED off and on, in separate processes")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"benchmark_sqlite runs on SQLite, not {connection.vendor}")
+        if options['compare']:
+            return self._compare(options)
+
+        results = self._benchmark(options)
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        self.stdout.write(f"SQLite {'tuned' if getattr(settings, 'SQLITE_TUNED', False) else 'default'} mode, "
+                          f"{options['readers']} readers, {options['writers']} writers, {options['duration']:.0f}s")
+        for name, result in results.items():
+            self.stdout.write(self._line(name, result))
+
+    def _compare(self, options):
+        arguments = [
+            f"--readers={options['readers']}", f"--writers={options['writers']}",
+            f"--duration={options['duration']}", f"--seed={options['seed']}", '--json',
+        ]
+        runs = {}
+        for mode, tuned in [('default', '0'), ('tuned', '1')]:
+            self.stdout.write(f"Running {mode} mode...")
+            completed = subprocess.run(
+                [sys.executable, '-m', 'django', 'benchmark_sqlite', *arguments],
+                env={**os.environ, 'SQLITE_TUNED': tuned}, cwd=settings.BASE_DIR,
+                capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                raise CommandError(f"{mode} run failed:\n{completed.stderr}")
+            runs[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        for name in runs['default']:
+            self.stdout.write(self._line(f"{name} (default)", runs['default'][name]))
+            self.stdout.write(self._line(f"{name} (tuned)", runs['tuned'][name]))
+
+    def _line(self, name, result):
+        return (
+            f"{name:<20} {result['requests']:>6} requests {result['per_second']:>8.1f}/s  "
+            f"p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms  errors {result['errors']}"
+        )
+
+    def _benchmark(self, options):
+        store, users, payload = scratch_store(options['readers'] + options['writers'], role='store_owner')
+        try:
+            seeder = APIClient()
+            seeder.force_authenticate(users[0])
+            for _ in range(options['seed']):
+                self._sell(seeder, payload)
+
+            workers = [self._reader(user, options['duration']) for user in users[:options['readers']]]
+            workers += [self._writer(user, payload, options['duration']) for user in users[options['readers']:]]
+            samples, elapsed = run_concurrently(workers)
+        finally:
+            drop_scratch_store(store, users)
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        for timings, failures in samples:
+            for name, values in timings.items():
+                latencies[name].extend(values)
+            for name, count in failures.items():
+                errors[name] += count
+
+        return {
+            name: {
+                'requests': len(latencies[name]),
+                'per_second': len(latencies[name]) / elapsed,
+                'p50_ms': percentile(latencies[name], 0.5) * 1000 if latencies[name] else 0,
+                'p95_ms': percentile(latencies[name], 0.95) * 1000 if latencies[name] else 0,
+                'errors': errors[name],
+            }
+            for name in [*ENDPOINTS, 'checkout']
+        }
+
+    def _sell(self, client, payload):
+        """Create and check out one order; True on success"""
+        response = client.post('/orders/create/', payload, format='json')
+        if response.status_code != 201:
+            return False
+        response = client.post('/orders/checkout/', {
+            'order': response.json()['id'], 'payment_method': 'Cash', 'payment_status': 'Paid', 'total_price': '0',
+        }, format='json')
+        return response.status_code == 201
+
+    def _reader(self, user, duration):
+        """A worker alternating the order list and dashboard until ``duration`` has passed"""
+        def work():
+            api = APIClient(raise_request_exception=False)
+            api.force_authenticate(user)
+            web = Client(raise_request_exception=False)
+            web.force_login(user)
+            clients = {'orders': api, 'dashboard': web}
+            timings = defaultdict(list)
+            failures = defaultdict(int)
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                for name, url in ENDPOINTS.items():
+                    began = time.perf_counter()
+                    response = clients[name].get(url)
+                    if response.status_code == 200:
+                        timings[name].append(time.perf_counter() - began)
+                    else:
+                        failures[name] += 1
+            return timings, failures
+        return work
+
+    def _writer(self, user, payload, duration):
+        """A worker creating and checking out orders until ``duration`` has passed"""
+        def work():
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user)
+            timings = defaultdict(list)
+            failures = defaultdict(int)
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                if self._sell(client, payload):
+                    timings['checkout'].append(time.perf_counter() - began)
+                else:
+                    failures['checkout'] += 1
+            return timings, failures
+        return work
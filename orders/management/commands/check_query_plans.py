@@ -0,0 +1,82 @@
+import uuid
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from authentication.models import Store
+from orders.models import Checkout, DailyStoreSales, Order, OrderItem
+from orders import rollups
+
+ACTIVE_STATUSES = ['Pending', 'In Progress', 'In Kitchen']
+
+
+def hot_queries():
+    """
+    (label, queryset, acceptable indexes) for the order and report filters
+    the POS and dashboards run most; shaped like the views build them
+    """
+    store_id = uuid.uuid4()
+    day = Store(id=store_id, timezone='UTC').date_lookups
+    orders = Order.objects.filter(store_id=store_id)
+    items = OrderItem.objects.filter(order__store_id=store_id)
+    return [
+        ("orders of a day", orders.filter(**day('create_date', date.today())),
+         ['order_store_created_idx', 'order_checked_out_idx', 'order_store_status_idx']),
+        ("sales of a date range", orders.filter(checkout_status=True, **day('create_date', date(2025, 1, 1), date.today())),
+         ['order_checked_out_idx']),
+        ("paid sales of a date range", orders.filter(checkout_status=True, payment_status='Paid', **day('create_date', date(2025, 1, 1), date.today())),
+         ['order_checked_out_idx']),
+        ("open orders by status", orders.filter(status__in=ACTIVE_STATUSES).order_by(),
+         ['order_store_status_idx']),
+        ("orders of a branch", Order.objects.filter(branch_id=uuid.uuid4(), checkout_status=True, **day('create_date', date.today())),
+         ['order_branch_created_idx']),
+        ("active orders of a method", orders.filter(order_method='B2B', completion_status=False),
+         ['order_active_idx']),
+        ("checkout lines of an order", OrderItem.objects.filter(order_id=1, is_saved_for_later=False),
+         ['orderitem_checkout_idx']),
+        ("item sales of a date range", items.filter(order__checkout_status=True, is_saved_for_later=False, **day('order__create_date', date.today())),
+         ['order_checked_out_idx']),
+        # Rollups are read through their unique (store, date, ...) index
+        ("sales of a month", DailyStoreSales.objects.filter(store_id=store_id, date__gte=date(2025, 1, 1), date__lte=date.today()),
+         ['orders_dailystoresales_store_id_date']),
+        ("top items of a month", rollups.item_sales(store_id, date(2025, 1, 1), date.today())[:10],
+         ['orders_menuitemdailysales_store_id_date']),
+        ("payments of a day", Checkout.objects.filter(order__store_id=store_id, **day('datetime', date.today())),
+         ['order_store_created_idx', 'order_checked_out_idx', 'order_store_status_idx', 'orders_order_store_id']),
+    ]
+
+
+def explain(queryset):
+    """EXPLAIN output of a queryset; PostgreSQL is kept off sequential scans,
+    which it prefers on small tables whatever indexes exist. SQLite gets a
+    plain read: its transactions are IMMEDIATE and would take the write lock."""
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = "Check that the hot order and report queries are planned on their indexes (SQLite and PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every query plan")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Query plans are only checked on SQLite and PostgreSQL, not {connection.vendor}")
+
+        failures = []
+        for label, queryset, indexes in hot_queries():
+            plan = explain(queryset)
+            if options['verbose_plans']:
+                self.stdout.write(f"{label}:\n{plan}\n")
+            if not any(index in plan for index in indexes):
+                failures.append(f"{label}: expected one of {', '.join(indexes)}\n{plan}")
+
+        if failures:
+            raise CommandError("Queries not using their indexes:\n\n" + "\n\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("All hot queries use their indexes"))
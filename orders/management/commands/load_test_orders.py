@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from orders.loadtest import drop_scratch_store, percentile, run_concurrently, scratch_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure order-create throughput with concurrent cashiers against the configured database "
+        "(writes to a scratch store that is deleted afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cashiers', type=int, default=20, help="Concurrent cashiers, one thread each")
+        parser.add_argument('--orders', type=int, default=25, help="Orders each cashier creates")
+        parser.add_argument('--keep', action='store_true', help="Keep the scratch store and its orders")
+
+    def handle(self, *args, **options):
+        if options['cashiers'] < 1 or options['orders'] < 1:
+            raise CommandError("--cashiers and --orders must be at least 1")
+
+        store, users, payload = scratch_store(options['cashiers'])
+        try:
+            results, elapsed = run_concurrently([
+                self._cashier(user, payload, options['orders']) for user in users
+            ])
+        finally:
+            if not options['keep']:
+                drop_scratch_store(store, users)
+
+        latencies = [latency for timings, errors in results for latency in timings]
+        failures = [error for timings, errors in results for error in errors]
+        created = len(latencies)
+        settings_dict = connection.settings_dict
+        if 'pool' in settings_dict.get('OPTIONS', {}):
+            mode = "pooled"
+        else:
+            mode = f"CONN_MAX_AGE={settings_dict.get('CONN_MAX_AGE')}"
+        self.stdout.write(f"Backend: {connection.vendor} ({mode})")
+        self.stdout.write(f"Cashiers: {options['cashiers']}, orders each: {options['orders']}")
+        self.stdout.write(f"Created: {created}, failed: {len(failures)} in {elapsed:.2f}s")
+        if latencies:
+            self.stdout.write(
+                f"Latency ms: p50 {percentile(latencies, 0.5) * 1000:.1f}, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.1f}, max {max(latencies) * 1000:.1f}"
+            )
+        for failure in failures[:5]:
+            self.stderr.write(failure)
+        self.stdout.write(self.style.SUCCESS(f"Throughput: {created / elapsed:.1f} orders/s"))
+
+    def _cashier(self, user, payload, order_count):
+        """A worker creating ``order_count`` orders; returns (latencies, errors)"""
+        def work():
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user)
+            timings = []
+            errors = []
+            for _ in range(order_count):
+                began = time.perf_counter()
+                response = client.post('/orders/create/', payload, format='json')
+                if response.status_code == 201:
+                    timings.append(time.perf_counter() - began)
+                else:
+                    errors.append(f"{user.email}: {response.status_code} {response.content[:200]!r}")
+            return timings, errors
+        return work
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import Store
+from orders import rollups
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily and hourly sales rollups from checked-out orders (backfill or repair)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help="Only rebuild this store id")
+        parser.add_argument('--from', dest='start_date', help="First store-local day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='end_date', help="Last store-local day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        start_date = _date(options['start_date']) if options['start_date'] else None
+        end_date = _date(options['end_date']) if options['end_date'] else None
+
+        stores = Store.objects.order_by('name')
+        if options['store']:
+            stores = stores.filter(pk=options['store'])
+
+        total = 0
+        for store in stores:
+            days = rollups.rebuild(store, start_date, end_date)
+            total += days
+            self.stdout.write(f"{store.name}: {days} days")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} store days"))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:33
+
+import django.db.models.deletion
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_today_counters(apps, schema_editor):
+    """Start today's counters after the tokens already handed out today"""
+    Store = apps.get_model('authentication', 'Store')
+    Order = apps.get_model('orders', 'Order')
+    DailyTokenCounter = apps.get_model('orders', 'DailyTokenCounter')
+
+    for store in Store.objects.all():
+        try:
+            tz = ZoneInfo(store.timezone or 'UTC')
+        except (ZoneInfoNotFoundError, ValueError):
+            tz = ZoneInfo('UTC')
+        today = timezone.localtime(timezone.now(), tz).date()
+        start = datetime.combine(today, time.min, tzinfo=tz)
+        last_token = Order.objects.filter(
+            store=store,
+            create_date__gte=start,
+            create_date__lt=start + timedelta(days=1),
+        ).aggregate(max_token=models.Max('token'))['max_token']
+        if last_token:
+            DailyTokenCounter.objects.create(store=store, business_date=today, last_token=last_token)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_remove_customuser_username'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTokenCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('last_token', models.IntegerField(default=0)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_counters', to='authentication.store')),
+            ],
+            options={
+                'unique_together': {('store', 'business_date')},
+            },
+        ),
+        migrations.RunPython(seed_today_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:38
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+TWO_PLACES = Decimal('0.01')
+
+
+def money(value):
+    return value.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+def price_existing_lines(apps, schema_editor):
+    """
+    Fill the new columns of existing lines, which order totals are summed from.
+
+    The pricing rules of orders/pricing.py as they stand in this migration,
+    written out against the historical models so later changes to the live
+    code cannot alter it: add-ons and the subtotal are rounded per line, and
+    the line's tax is its subtotal times the sum of its tax rates, rounded.
+    """
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    AddOn = OrderItem.add_ons.through
+    LineTax = OrderItem.tax.through
+    last_id = 0
+    while True:
+        rows = list(
+            OrderItem.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'quantity', 'price')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+
+        addon_totals = defaultdict(Decimal)
+        for item_id, price in AddOn.objects.filter(orderitem_id__in=ids).values_list('orderitem_id', 'modifiers__price'):
+            # Modifiers.price is a FloatField
+            addon_totals[item_id] += Decimal(str(price or 0))
+        percentages = defaultdict(Decimal)
+        for item_id, percentage in LineTax.objects.filter(orderitem_id__in=ids).values_list('orderitem_id', 'tax__tax_percentage'):
+            percentages[item_id] += percentage or Decimal('0')
+
+        lines = []
+        for item_id, quantity, price in rows:
+            addon_total = money(addon_totals[item_id])
+            subtotal = money((price + addon_total) * quantity)
+            tax = money(subtotal * percentages[item_id] / 100)
+            lines.append(OrderItem(
+                pk=item_id, addon_total=addon_total, line_subtotal=subtotal, line_tax=tax, line_total=subtotal + tax,
+            ))
+        OrderItem.objects.bulk_update(lines, ['addon_total', 'line_subtotal', 'line_tax', 'line_total'])
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_dailytokencounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='addon_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_tax',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(price_existing_lines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_remove_customuser_username'),
+        ('orders', '0003_orderitem_line_pricing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['store', 'updated_at'], name='orders_orde_store_i_2d8de6_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_auth_version'),
+        ('inventory', '0003_catalogversion'),
+        ('orders', '0004_order_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['store', 'create_date'], name='order_store_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['store', 'status', 'create_date'], name='order_store_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('checkout_status', True)), fields=['store', 'create_date'], name='order_checked_out_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('completion_status', False)), fields=['store', 'order_method', 'create_date'], name='order_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(condition=models.Q(('is_saved_for_later', False)), fields=['order'], name='orderitem_checkout_idx'),
+        ),
+    ]
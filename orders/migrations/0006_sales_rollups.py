@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_auth_version'),
+        ('orders', '0005_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStoreSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_method', models.CharField(max_length=20)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('tax', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('paid_orders_count', models.PositiveIntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='authentication.store')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily store sales',
+                'unique_together': {('store', 'date', 'order_method', 'payment_method')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyStoreSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_sales', to='authentication.store')),
+            ],
+            options={
+                'verbose_name_plural': 'Hourly store sales',
+                'unique_together': {('store', 'date', 'hour')},
+            },
+        ),
+    ]
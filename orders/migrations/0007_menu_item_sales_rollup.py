@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:04
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_auth_version'),
+        ('inventory', '0003_catalogversion'),
+        ('orders', '0006_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='inventory.menu')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_item_sales', to='authentication.store')),
+            ],
+            options={
+                'verbose_name_plural': 'Menu item daily sales',
+                'unique_together': {('store', 'date', 'menu_item')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_auth_version'),
+        ('orders', '0007_menu_item_sales_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='branch',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='authentication.branch'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pos_device',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='authentication.posdevice'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['branch', 'create_date'], name='order_branch_created_idx'),
+        ),
+    ]
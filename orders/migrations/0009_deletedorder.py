@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_auth_version'),
+        ('orders', '0008_order_branch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('store', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='deleted_orders', to='authentication.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', 'deleted_at'], name='orders_dele_store_i_68a8f2_idx')],
+            },
+        ),
+    ]
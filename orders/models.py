@@ -1,9 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from inventory.models import Menu, Tax, FoodCategory, Modifiers
-from authentication.models import CustomUser, Store
-from datetime import datetime as dt
+from authentication.models import Branch, CustomUser, POSDevice, Store
 from decimal import Decimal
 
+from . import rollups
+
 # Create your models here.
 
 class Tables(models.Model):
@@ -24,6 +25,33 @@ class Tables(models.Model):
         ordering = ['Table_number']
 
 
+class DailyTokenCounter(models.Model):
+    """Per-store, per-business-day order token sequence"""
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='token_counters')
+    business_date = models.DateField()
+    last_token = models.IntegerField(default=0)
+
+    @classmethod
+    def next_token(cls, store):
+        """
+        Allocate the next token for the store's current business day.
+
+        The counter row is bumped with a single atomic UPDATE, so concurrent
+        cashiers serialize on that one row instead of scanning the day's orders.
+        """
+        business_date = store.business_date()
+        with transaction.atomic():
+            counter, _ = cls.objects.get_or_create(store=store, business_date=business_date)
+            cls.objects.filter(pk=counter.pk).update(last_token=models.F('last_token') + 1)
+            return cls.objects.values_list('last_token', flat=True).get(pk=counter.pk)
+
+    def __str__(self):
+        return f"{self.store} - {self.business_date}: {self.last_token}"
+
+    class Meta:
+        unique_together = ['store', 'business_date']
+
+
 class Order(models.Model):
     token = models.IntegerField(default=0)
     table = models.ForeignKey(Tables, on_delete=models.CASCADE, null=True, blank=True)
@@ -36,7 +64,13 @@ class Order(models.Model):
     order_method = models.CharField(max_length=20, choices=ORDER_METHOD_CHOICES)
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='orders')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='created_orders')
+    # Where the order was taken, stamped at creation (StoreContext.order_attribution);
+    # indexed with create_date in Meta
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders', db_index=False)
+    pos_device = models.ForeignKey(POSDevice, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
     create_date = models.DateTimeField(auto_now_add=True)
+    # Bumped on every write (including totals updates); drives the ?since= delta feeds
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     status_options = (
         ("Pending", "Pending"), 
@@ -76,40 +110,34 @@ class Order(models.Model):
         default="Pending"
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the row counts for in the sales rollups, so a save can tell what it changes
+        instance._rollup_state = rollups.stored_state(instance, rollups.ORDER_FIELDS)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        rollups.refreshed(self, rollups.ORDER_FIELDS, fields)
+
     def save(self, *args, **kwargs):
         if not self.pk:
-            today = dt.now().date()
-            last_token = Order.objects.filter(
-                create_date__date=today,
-                store=self.store
-            ).aggregate(max_token=models.Max('token'))['max_token'] or 0
-            self.token = last_token + 1
-            print(f"Generated token: {self.token}")
+            with transaction.atomic():
+                self.token = DailyTokenCounter.next_token(self.store)
+                super().save(*args, **kwargs)
+            return
 
         super().save(*args, **kwargs)
     
     def calculate_totals(self):
-        """Recalculate order totals based on items"""
-        total_before_tax = Decimal('0.00')
-        total_tax = Decimal('0.00')
-        
-        # Only calculate for items that are not saved for later (i.e., items in checkout)
-        items_to_calculate = self.items.filter(is_saved_for_later=False)
-        
-        for item in items_to_calculate:
-            # Base item price + addons
-            addon_total = sum(Decimal(str(addon.price)) for addon in item.add_ons.all())
-            item_base_total = (Decimal(str(item.price)) + addon_total) * item.quantity
-            
-            # Calculate tax for this item
-            item_tax_total = Decimal('0.00')
-            for tax in item.tax.all():
-                tax_amount = (item_base_total * tax.tax_percentage) / 100
-                item_tax_total += tax_amount
-            
-            total_before_tax += item_base_total
-            total_tax += item_tax_total
-        
+        """Recalculate order totals from the items' current prices, add-ons and taxes"""
+        from .pricing import price_items
+
+        priced = price_items(self.items.all())
+        total_before_tax, total_tax = priced.order_totals().get(
+            self.pk, (Decimal('0.00'), Decimal('0.00'))
+        )
         self.total_before_tax = total_before_tax
         self.total_tax = total_tax
         self.total_price = total_before_tax + total_tax
@@ -119,6 +147,27 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-create_date']
+        indexes = [
+            models.Index(fields=['store', 'updated_at']),
+            # Date-range reports and listings; filter create_date as a
+            # half-open range (Store.date_lookups), not with __date.
+            # Boolean flags go in partial index conditions: Django filters
+            # them as bare column tests, which SQLite cannot seek on.
+            models.Index(fields=['store', 'create_date'], name='order_store_created_idx'),
+            models.Index(fields=['store', 'status', 'create_date'], name='order_store_status_idx'),
+            models.Index(fields=['branch', 'create_date'], name='order_branch_created_idx'),
+            models.Index(
+                fields=['store', 'create_date'],
+                name='order_checked_out_idx',
+                condition=models.Q(checkout_status=True),
+            ),
+            # Open orders only: active B2B/POS order lists
+            models.Index(
+                fields=['store', 'order_method', 'create_date'],
+                name='order_active_idx',
+                condition=models.Q(completion_status=False),
+            ),
+        ]
 
 
 class OrderItem(models.Model):
@@ -133,10 +182,28 @@ class OrderItem(models.Model):
     
     # New field to track if item is saved for later or ready for checkout
     is_saved_for_later = models.BooleanField(default=False)
+
+    # Line pricing, written by the totals engine whenever the line changes
+    addon_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))  # per unit
+    line_subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    line_tax = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    line_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     
     # Timestamps for tracking
     added_to_order_date = models.DateTimeField(auto_now_add=True)
     moved_to_checkout_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the row counts for in the menu item rollup, so a save can tell what it changes
+        instance._rollup_state = rollups.stored_state(instance, rollups.LINE_FIELDS)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        rollups.refreshed(self, rollups.LINE_FIELDS, fields)
 
     def save(self, *args, **kwargs):
         # Round price to 2 decimal places
@@ -145,14 +212,11 @@ class OrderItem(models.Model):
 
     def get_total_price_with_addons(self):
         """Get total price including addons"""
-        addon_total = sum(addon.price for addon in self.add_ons.all())
-        return (self.price + addon_total) * self.quantity
+        return self.line_subtotal
     
     def get_tax_amount(self):
-        """Calculate total tax amount for this item"""
-        base_price = self.get_total_price_with_addons()
-        total_tax_percentage = sum(tax.tax_percentage for tax in self.tax.all())
-        return (base_price * total_tax_percentage) / 100
+        """Get total tax amount for this item"""
+        return self.line_tax
 
     def move_to_checkout(self):
         """Move item from saved to checkout"""
@@ -167,37 +231,20 @@ class OrderItem(models.Model):
         self.moved_to_checkout_date = None
         self.save()
     
-    def get_total_price_with_addons(self):
-        """Get total price including addons"""
-        from decimal import Decimal
-        
-        # Base price * quantity
-        total = self.price * self.quantity
-        
-        # Add addon prices
-        for addon in self.add_ons.all():
-            total += addon.price * self.quantity
-        
-        return total
-    
-    def get_tax_amount(self):
-        """Calculate total tax for this item"""
-        from decimal import Decimal
-        
-        base_amount = self.get_total_price_with_addons()
-        tax_amount = Decimal('0.00')
-        
-        for tax in self.tax.all():
-            tax_amount += (base_amount * tax.percentage) / 100
-        
-        return tax_amount
-
     def __str__(self):
         status = " (Saved)" if self.is_saved_for_later else " (In Checkout)"
         return f"{self.quantity} x {self.menu_item.name}{status}"
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            # Checkout lines of an order (totals, kitchen, receipts)
+            models.Index(
+                fields=['order'],
+                name='orderitem_checkout_idx',
+                condition=models.Q(is_saved_for_later=False),
+            ),
+        ]
 
 
 class Checkout(models.Model):
@@ -293,4 +340,85 @@ class SavedItems(models.Model):
         return f"Saved items for Order #{self.order.id} - {self.items_count} items"
     
     class Meta:
-        ordering = ['-saved_date']
\ No newline at end of file
+        ordering = ['-saved_date']
+
+class DeletedOrder(models.Model):
+    """
+    Tombstone of a deleted order, so ``?since=`` delta feeds can tell clients
+    to drop it (orders/delta.py). Kept for delta.TOMBSTONE_RETENTION.
+    """
+    # No database constraint: tombstones are written while a store's orders
+    # are being deleted along with the store itself
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='deleted_orders', db_constraint=False)
+    order_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.store_id} - #{self.order_id} deleted {self.deleted_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'deleted_at']),
+        ]
+
+
+class DailyStoreSales(models.Model):
+    """
+    Checked-out orders of one store-local day, per order method and payment
+    method. Maintained by orders/rollups.py; rebuild with rebuild_sales_rollups.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    order_method = models.CharField(max_length=20)
+    payment_method = models.CharField(max_length=50)
+
+    orders_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    tax = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    paid_orders_count = models.PositiveIntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"{self.store} - {self.date} {self.order_method}/{self.payment_method}: {self.revenue}"
+
+    class Meta:
+        unique_together = ['store', 'date', 'order_method', 'payment_method']
+        verbose_name_plural = "Daily store sales"
+
+
+class HourlyStoreSales(models.Model):
+    """Checked-out orders of one store-local hour; companion of DailyStoreSales"""
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='hourly_sales')
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+
+    orders_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"{self.store} - {self.date} {self.hour:02d}:00: {self.revenue}"
+
+    class Meta:
+        unique_together = ['store', 'date', 'hour']
+        verbose_name_plural = "Hourly store sales"
+
+
+class MenuItemDailySales(models.Model):
+    """
+    Checked-out quantity and revenue of one menu item on one store-local day;
+    category figures are summed from these rows. Maintained with
+    DailyStoreSales by orders/rollups.py.
+    """
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='menu_item_sales')
+    date = models.DateField()
+    menu_item = models.ForeignKey(Menu, on_delete=models.CASCADE, related_name='daily_sales')
+
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"{self.store} - {self.date} {self.menu_item_id}: {self.quantity}"
+
+    class Meta:
+        unique_together = ['store', 'date', 'menu_item']
+        verbose_name_plural = "Menu item daily sales"
@@ -0,0 +1,181 @@
+"""
+Batch pricing for order lines.
+
+A set of lines is loaded as columns from three values() queries (the items,
+their add-on prices and their tax rates) and priced in a single pass, with no
+model instances and no per-line m2m queries. The same rules are used when the
+totals engine stores line columns, so stored and recomputed figures agree to
+the cent.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from .models import OrderItem
+
+TWO_PLACES = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def money(value):
+    """Round a Decimal to cents"""
+    return value.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+class PricedLines:
+    """
+    Columnar pricing result.
+
+    Position ``i`` of every list describes the same line. Per-tax amounts are
+    kept separately, keyed by item id, since a line can carry any number of
+    taxes.
+    """
+
+    def __init__(self):
+        self.item_ids = []
+        self.order_ids = []
+        self.names = []
+        self.quantities = []
+        self.saved = []
+        self.addon_totals = []
+        self.subtotals = []
+        self.taxes = []
+        self.tax_amounts = defaultdict(dict)  # item_id -> {tax_id: amount}
+        self.tax_rates = {}  # tax_id -> (name, percentage)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def lines(self):
+        """Return {item_id: {addon_total, line_subtotal, line_tax, line_total}}"""
+        return {
+            item_id: {
+                'addon_total': addon_total,
+                'line_subtotal': subtotal,
+                'line_tax': tax,
+                'line_total': subtotal + tax,
+            }
+            for item_id, addon_total, subtotal, tax in zip(
+                self.item_ids, self.addon_totals, self.subtotals, self.taxes
+            )
+        }
+
+    def order_totals(self, include_saved=False):
+        """Return {order_id: (total_before_tax, total_tax)}"""
+        totals = defaultdict(lambda: [ZERO, ZERO])
+        for order_id, saved, subtotal, tax in zip(self.order_ids, self.saved, self.subtotals, self.taxes):
+            if saved and not include_saved:
+                continue
+            totals[order_id][0] += subtotal
+            totals[order_id][1] += tax
+        return {order_id: tuple(values) for order_id, values in totals.items()}
+
+    def item_taxes(self, item_id):
+        """Per-tax detail for one line, in the shape receipts use"""
+        return [
+            {
+                'name': self.tax_rates[tax_id][0],
+                'percentage': float(self.tax_rates[tax_id][1]),
+                'amount': float(money(amount)),
+            }
+            for tax_id, amount in self.tax_amounts[item_id].items()
+        ]
+
+    def tax_breakdown(self, include_saved=False):
+        """
+        Return per-tax rows: name, percentage, taxable amount and tax amount.
+
+        Amounts are summed unrounded per line and rounded once per tax.
+        """
+        return TaxBreakdown().add(self, include_saved).rows()
+
+
+class TaxBreakdown:
+    """
+    Per-tax totals accumulated over any number of PricedLines, so a long
+    period can be priced in chunks and still be rounded once per tax.
+    """
+
+    def __init__(self):
+        self._rows = {}
+
+    def add(self, priced, include_saved=False):
+        for index, item_id in enumerate(priced.item_ids):
+            if priced.saved[index] and not include_saved:
+                continue
+            for tax_id, amount in priced.tax_amounts[item_id].items():
+                row = self._rows.get(tax_id)
+                if row is None:
+                    name, percentage = priced.tax_rates[tax_id]
+                    row = self._rows[tax_id] = {
+                        'tax_id': tax_id,
+                        'name': name,
+                        'percentage': percentage,
+                        'taxable_amount': ZERO,
+                        'tax_amount': ZERO,
+                        'line_count': 0,
+                    }
+                row['taxable_amount'] += priced.subtotals[index]
+                row['tax_amount'] += amount
+                row['line_count'] += 1
+        return self
+
+    def rows(self):
+        """The per-tax rows, tax amounts rounded, sorted by name and rate"""
+        rows = [dict(row, tax_amount=money(row['tax_amount'])) for row in self._rows.values()]
+        return sorted(rows, key=lambda row: (row['name'], row['percentage']))
+
+
+def price_items(items):
+    """
+    Price every line in the ``items`` queryset.
+
+    Three queries in total; pass ``OrderItem.objects.filter(...)`` for whatever
+    set of lines (one order, a day, a month) needs pricing.
+    """
+    priced = PricedLines()
+
+    rows = list(items.order_by().values_list(
+        'id', 'order_id', 'menu_item__name', 'quantity', 'price', 'is_saved_for_later'
+    ))
+    if not rows:
+        return priced
+
+    # Subquery rather than a list of ids, so month-sized sets stay one statement
+    item_ids = items.order_by().values('id')
+
+    addon_totals = defaultdict(Decimal)
+    addon_rows = OrderItem.add_ons.through.objects.filter(
+        orderitem_id__in=item_ids
+    ).values_list('orderitem_id', 'modifiers__price')
+    for item_id, addon_price in addon_rows:
+        # Modifiers.price is a FloatField
+        addon_totals[item_id] += Decimal(str(addon_price or 0))
+
+    line_taxes = defaultdict(list)
+    tax_rows = OrderItem.tax.through.objects.filter(
+        orderitem_id__in=item_ids
+    ).values_list('orderitem_id', 'tax_id', 'tax__tax_name', 'tax__tax_percentage')
+    for item_id, tax_id, tax_name, percentage in tax_rows:
+        percentage = percentage or Decimal('0')
+        line_taxes[item_id].append((tax_id, percentage))
+        priced.tax_rates[tax_id] = (tax_name, percentage)
+
+    for item_id, order_id, name, quantity, price, saved in rows:
+        addon_total = money(addon_totals[item_id])
+        subtotal = money((price + addon_total) * quantity)
+
+        total_percentage = Decimal('0')
+        for tax_id, percentage in line_taxes[item_id]:
+            priced.tax_amounts[item_id][tax_id] = subtotal * percentage / 100
+            total_percentage += percentage
+
+        priced.item_ids.append(item_id)
+        priced.order_ids.append(order_id)
+        priced.names.append(name)
+        priced.quantities.append(quantity)
+        priced.saved.append(saved)
+        priced.addon_totals.append(addon_total)
+        priced.subtotals.append(subtotal)
+        priced.taxes.append(money(subtotal * total_percentage / 100))
+
+    return priced
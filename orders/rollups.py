@@ -0,0 +1,450 @@
+"""
+Sales rollups.
+
+DailyStoreSales and HourlyStoreSales hold each store-local day's checked-out
+orders already aggregated, and MenuItemDailySales the quantity and revenue
+of each menu item sold that day (categories are summed from it). Dashboards
+read one row per day, hour or item instead of grouping raw orders and lines
+on every page load.
+
+The rows are kept current with deltas. A change to what an order counts for
+(checkout, payment or order method, a re-total, a line added, edited or
+removed on a sold order, deletion) takes away its old contribution and adds
+its new one, as F() updates of the rows it touches, so a checkout costs the
+same however many orders its day already has. The old contribution is taken
+from the values the order or line was loaded with (from_db), so saves that
+leave ORDER_FIELDS and LINE_FIELDS alone skip the rollups without a query.
+rebuild() recomputes days from the orders themselves, to backfill or repair.
+
+Writes run inside the caller's transaction, so a checkout and its rollup
+commit together. Rollup writers of one store first lock the store row FOR
+NO KEY UPDATE, so two of them never both create the same missing row; unlike
+a full row lock it does not hold up orders being inserted for the store.
+Once committed, the store's sales version changes, which is what caches of
+figures derived from the rollups key on.
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+from authentication.models import Store
+
+ZERO = Decimal('0.00')
+
+# Order fields the daily and hourly rollups aggregate
+ORDER_FIELDS = ('checkout_status', 'payment_status', 'payment_method', 'order_method', 'total_price', 'total_tax')
+
+# OrderItem fields the menu item rollup aggregates
+LINE_FIELDS = ('menu_item_id', 'quantity', 'is_saved_for_later', 'line_total')
+
+
+def _lock_store(store_id):
+    """The store row, locked against other rollup writers of the store until commit"""
+    return Store.objects.select_for_update(no_key=True).get(pk=store_id)
+
+
+def _version_key(store_id):
+    return f'sales_version:{store_id}'
+
+
+def sales_version(store_id):
+    """Opaque stamp that changes whenever the store's rollups do"""
+    key = _version_key(store_id)
+    version = cache.get(key)
+    if version is None:
+        # A fresh stamp rather than 0, so an evicted key never revives old entries
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(store_id):
+    key = _version_key(store_id)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def stored_state(instance, fields):
+    """{field: value} of ``fields`` on a model instance, or None if any of them is not loaded"""
+    values = instance.__dict__
+    if any(field not in values for field in fields):
+        return None
+    return {field: values[field] for field in fields}
+
+
+def remember(instance, values):
+    """Record values written to an instance's row without save(), such as a totals refresh"""
+    state = getattr(instance, '_rollup_state', None)
+    if state is not None:
+        state.update((field, value) for field, value in values.items() if field in state)
+
+
+def refreshed(instance, fields, refreshed_fields=None):
+    """Bring an instance's stored state up to date after refresh_from_db(fields)"""
+    if refreshed_fields is None:
+        instance._rollup_state = stored_state(instance, fields)
+        return
+    state = getattr(instance, '_rollup_state', None)
+    if state is None:
+        # The other fields may hold unsaved values; pre_save reads the row instead
+        return
+    refreshed_fields = set(refreshed_fields)
+    for field in fields:
+        if field in refreshed_fields or field.removesuffix('_id') in refreshed_fields:
+            state[field] = getattr(instance, field)
+
+
+def _known_unsold(order):
+    """Whether an order instance was loaded or last saved without being checked out"""
+    state = getattr(order, '_rollup_state', None)
+    return state is not None and not state['checkout_status']
+
+
+def _counts(state):
+    """Whether an order in this state counts towards sales"""
+    return state is not None and state['checkout_status']
+
+
+def _line(state):
+    """(menu_item_id, quantity, revenue) a line in this state adds to its item, if it counts"""
+    if state is None or state['is_saved_for_later']:
+        return None
+    return state['menu_item_id'], state['quantity'], state['line_total']
+
+
+class _Changes:
+    """Deltas to one store's rollup rows, summed per row before any is written"""
+
+    def __init__(self, store):
+        self.store = store
+        self.rows = defaultdict(lambda: defaultdict(int))
+
+    def _add(self, model, day, key, values):
+        row = self.rows[(model, day, tuple(sorted(key.items())))]
+        for field, value in values.items():
+            row[field] += value
+
+    def order(self, create_date, state, sign):
+        """Add (sign 1) or take away (sign -1) what an order in ``state`` counts for"""
+        from .models import DailyStoreSales, HourlyStoreSales
+
+        if not _counts(state):
+            return
+        day = self.store.business_date(create_date)
+        revenue = state['total_price'] * sign
+        paid = state['payment_status'] == 'Paid'
+        self._add(DailyStoreSales, day, {'order_method': state['order_method'], 'payment_method': state['payment_method']}, {
+            'orders_count': sign,
+            'revenue': revenue,
+            'tax': state['total_tax'] * sign,
+            'paid_orders_count': sign if paid else 0,
+            'paid_revenue': revenue if paid else ZERO,
+        })
+        hour = timezone.localtime(create_date, self.store.tzinfo).hour
+        self._add(HourlyStoreSales, day, {'hour': hour}, {'orders_count': sign, 'revenue': revenue})
+
+    def lines(self, create_date, lines, sign):
+        """Add or take away (menu_item_id, quantity, revenue) lines of a sold order"""
+        from .models import MenuItemDailySales
+
+        day = self.store.business_date(create_date)
+        for menu_item_id, quantity, revenue in lines:
+            self._add(MenuItemDailySales, day, {'menu_item_id': menu_item_id}, {
+                'quantity': quantity * sign,
+                'revenue': revenue * sign,
+            })
+
+    def save(self):
+        from .models import DailyStoreSales, HourlyStoreSales, MenuItemDailySales
+
+        # One model and key order for every writer, so concurrent ones never deadlock
+        models = [DailyStoreSales, HourlyStoreSales, MenuItemDailySales]
+        written = False
+        for (model, day, key), deltas in sorted(self.rows.items(), key=lambda row: (models.index(row[0][0]), row[0][1], repr(row[0][2]))):
+            deltas = {field: value for field, value in deltas.items() if value}
+            if deltas:
+                _add_to_row(model, self.store.pk, day, dict(key), deltas)
+                written = True
+        if written:
+            _bump_version(self.store.pk)
+
+
+def _count_field(model):
+    from .models import MenuItemDailySales
+
+    return 'quantity' if model is MenuItemDailySales else 'orders_count'
+
+
+def _add_to_row(model, store_id, day, key, deltas):
+    """Add ``deltas`` to one rollup row, creating it or dropping it as its count says"""
+    count_field = _count_field(model)
+    rows = model.objects.filter(store_id=store_id, date=day, **key)
+    if rows.update(**{field: F(field) + value for field, value in deltas.items()}):
+        if deltas.get(count_field, 0) < 0:
+            # Nothing counts towards it any more, as after a recompute
+            rows.filter(**{f'{count_field}__lte': 0}).delete()
+        return
+    if deltas.get(count_field, 0) > 0:
+        model.objects.create(store_id=store_id, date=day, **key, **deltas)
+
+
+@contextmanager
+def _changes(store_id):
+    with transaction.atomic():
+        changes = _Changes(_lock_store(store_id))
+        yield changes
+        changes.save()
+
+
+def _order_lines(order_id):
+    """(menu_item_id, quantity, revenue) of an order's counted lines, per menu item"""
+    from .models import OrderItem
+
+    return OrderItem.objects.filter(order_id=order_id, is_saved_for_later=False).order_by().values('menu_item_id').annotate(
+        quantity=Sum('quantity'), revenue=Sum('line_total'),
+    ).values_list('menu_item_id', 'quantity', 'revenue')
+
+
+def order_changed(order, old_state, new_state):
+    """
+    Apply an order going from ``old_state`` to ``new_state`` ({field: value} of
+    ORDER_FIELDS as stored; None before it is created and once it is deleted).
+    Checking out or un-checking an order also adds or takes away its lines.
+    """
+    if not (_counts(old_state) or _counts(new_state)):
+        return
+    with _changes(order.store_id) as changes:
+        changes.order(order.create_date, old_state, -1)
+        changes.order(order.create_date, new_state, 1)
+        if _counts(old_state) != _counts(new_state):
+            changes.lines(order.create_date, _order_lines(order.pk), 1 if _counts(new_state) else -1)
+
+
+def line_changed(order_id, old_state, new_state, order=None):
+    """
+    Apply a line going from ``old_state`` to ``new_state`` ({field: value} of
+    LINE_FIELDS as stored, None when absent), if its order is checked out.
+    Pass the line's order if it is loaded, to skip looking that up.
+    """
+    from .models import Order
+
+    old_line, new_line = _line(old_state), _line(new_state)
+    if old_line == new_line or (order is not None and _known_unsold(order)):
+        return
+    sold = Order.objects.filter(pk=order_id, checkout_status=True).values_list('store_id', 'create_date').first()
+    if sold is None:
+        return
+    store_id, create_date = sold
+    with _changes(store_id) as changes:
+        changes.lines(create_date, [old_line] if old_line else [], -1)
+        changes.lines(create_date, [new_line] if new_line else [], 1)
+
+
+def sold_orders(orders):
+    """
+    {order_id: stored row} of the checked-out orders among {order_id: [loaded
+    instances]}, for totals_refreshed(). Orders whose instances show them open
+    are not looked up.
+    """
+    from .models import Order
+
+    order_ids = [order_id for order_id, instances in orders.items() if not any(map(_known_unsold, instances))]
+    if not order_ids:
+        return {}
+    return {
+        row['id']: row
+        for row in Order.objects.filter(pk__in=order_ids, checkout_status=True).values(
+            'id', 'store_id', 'create_date', *ORDER_FIELDS
+        )
+    }
+
+
+def sold_lines(sold, item_ids):
+    """{item_id: (order_id, menu_item_id, line_total)} of the counted lines of ``sold`` orders, as stored"""
+    from .models import OrderItem
+
+    if not sold or not item_ids:
+        return {}
+    return {
+        item_id: (order_id, menu_item_id, line_total)
+        for item_id, order_id, menu_item_id, line_total in OrderItem.objects.filter(
+            pk__in=list(item_ids), order_id__in=list(sold), is_saved_for_later=False,
+        ).values_list('id', 'order_id', 'menu_item_id', 'line_total')
+    }
+
+
+def totals_refreshed(sold, old_lines, lines, totals):
+    """
+    Apply a totals refresh: ``sold`` and ``old_lines`` as read before it,
+    ``lines`` the {item_id: {line_total, ...}} it wrote and ``totals`` the
+    {order_id: (total_before_tax, total_tax)} it wrote.
+    """
+    by_store = defaultdict(list)
+    for order_id, row in sold.items():
+        total_before_tax, total_tax = totals[order_id]
+        new_row = dict(row, total_price=total_before_tax + total_tax, total_tax=total_tax)
+        repriced = [
+            (menu_item_id, 0, lines[item_id]['line_total'] - line_total)
+            for item_id, (line_order_id, menu_item_id, line_total) in old_lines.items()
+            if line_order_id == order_id and item_id in lines and lines[item_id]['line_total'] != line_total
+        ]
+        if new_row['total_price'] != row['total_price'] or new_row['total_tax'] != row['total_tax'] or repriced:
+            by_store[row['store_id']].append((row, new_row, repriced))
+
+    for store_id, changed in by_store.items():
+        with _changes(store_id) as changes:
+            for row, new_row, repriced in changed:
+                changes.order(row['create_date'], row, -1)
+                changes.order(row['create_date'], new_row, 1)
+                changes.lines(row['create_date'], repriced, 1)
+
+
+def _recompute_day(store, day):
+    """Rewrite the rollup rows of one store-local day from its orders"""
+    from .models import DailyStoreSales, HourlyStoreSales, MenuItemDailySales, Order, OrderItem
+
+    start, end = store.day_range(day)
+    orders = Order.objects.filter(
+        store=store, checkout_status=True, create_date__gte=start, create_date__lt=end
+    ).order_by()
+    lines = OrderItem.objects.filter(
+        order__store=store, order__checkout_status=True,
+        order__create_date__gte=start, order__create_date__lt=end,
+        is_saved_for_later=False,
+    ).order_by()
+
+    paid = Q(payment_status='Paid')
+    daily = [
+        DailyStoreSales(store=store, date=day, **row)
+        for row in orders.values('order_method', 'payment_method').annotate(
+            orders_count=Count('id'),
+            revenue=Sum('total_price'),
+            tax=Sum('total_tax'),
+            paid_orders_count=Count('id', filter=paid),
+            paid_revenue=Sum('total_price', filter=paid, default=ZERO),
+        )
+    ]
+    hourly = [
+        HourlyStoreSales(store=store, date=day, **row)
+        for row in orders.annotate(hour=ExtractHour('create_date', tzinfo=store.tzinfo))
+        .values('hour').annotate(orders_count=Count('id'), revenue=Sum('total_price'))
+    ]
+    items = [
+        MenuItemDailySales(store=store, date=day, **row)
+        for row in lines.values('menu_item_id').annotate(quantity=Sum('quantity'), revenue=Sum('line_total'))
+    ]
+
+    for model in (DailyStoreSales, HourlyStoreSales, MenuItemDailySales):
+        model.objects.filter(store=store, date=day).delete()
+    DailyStoreSales.objects.bulk_create(daily)
+    HourlyStoreSales.objects.bulk_create(hourly)
+    MenuItemDailySales.objects.bulk_create(items)
+
+
+def rebuild(store, start_date=None, end_date=None):
+    """Recompute every day of a store, or the days in [start_date, end_date]; returns the day count"""
+    from .models import DailyStoreSales, HourlyStoreSales, MenuItemDailySales, Order
+
+    orders = Order.objects.filter(store=store, checkout_status=True).order_by()
+    stale = {}
+    if start_date is not None:
+        orders = orders.filter(create_date__gte=store.day_range(start_date)[0])
+        stale['date__gte'] = start_date
+    if end_date is not None:
+        orders = orders.filter(create_date__lt=store.day_range(end_date)[1])
+        stale['date__lte'] = end_date
+
+    days = {store.business_date(created) for created in orders.values_list('create_date', flat=True).iterator()}
+    with transaction.atomic():
+        _lock_store(store.pk)
+        for model in (DailyStoreSales, HourlyStoreSales, MenuItemDailySales):
+            model.objects.filter(store=store, **stale).delete()
+        for day in sorted(days):
+            _recompute_day(store, day)
+        _bump_version(store.pk)
+    return len(days)
+
+
+# Readers
+
+def _daily(store, start_date, end_date):
+    from .models import DailyStoreSales
+
+    return DailyStoreSales.objects.filter(store=store, date__gte=start_date, date__lte=end_date).order_by()
+
+
+def sales_totals(store, start_date, end_date=None):
+    """Orders, revenue, tax and paid figures of the store-local days from start_date through end_date"""
+    totals = _daily(store, start_date, end_date or start_date).aggregate(
+        orders_count=Sum('orders_count', default=0),
+        revenue=Sum('revenue', default=ZERO),
+        tax=Sum('tax', default=ZERO),
+        paid_orders_count=Sum('paid_orders_count', default=0),
+        paid_revenue=Sum('paid_revenue', default=ZERO),
+    )
+    totals['avg_order_value'] = totals['revenue'] / totals['orders_count'] if totals['orders_count'] else ZERO
+    return totals
+
+
+def daily_sales(store, start_date, end_date):
+    """[{'date', 'orders_count', 'revenue'}] for the days with sales, oldest first"""
+    return list(
+        _daily(store, start_date, end_date).values('date')
+        .annotate(orders_count=Sum('orders_count'), revenue=Sum('revenue'))
+        .order_by('date')
+    )
+
+
+def sales_by_method(store, start_date, end_date):
+    """[{'order_method', 'count', 'revenue'}], best-selling method first"""
+    return list(
+        _daily(store, start_date, end_date).values('order_method')
+        .annotate(count=Sum('orders_count'), revenue=Sum('revenue'))
+        .order_by('-revenue')
+    )
+
+
+def hourly_orders(store, day):
+    """Checked-out orders per store-local hour of the day, as 24 counts"""
+    from .models import HourlyStoreSales
+
+    counts = [0] * 24
+    for hour, orders_count in HourlyStoreSales.objects.filter(store=store, date=day).values_list('hour', 'orders_count'):
+        counts[hour] = orders_count
+    return counts
+
+
+def _item_sales(store, start_date, end_date):
+    from .models import MenuItemDailySales
+
+    return MenuItemDailySales.objects.filter(store=store, date__gte=start_date, date__lte=end_date).order_by()
+
+
+def item_sales(store, start_date, end_date=None):
+    """
+    Per-item [{'menu_item_id', 'menu_item__name', 'menu_item__price',
+    'menu_item__category__name', 'total_quantity', 'total_revenue'}],
+    best seller first
+    """
+    return (
+        _item_sales(store, start_date, end_date or start_date)
+        .values('menu_item_id', 'menu_item__name', 'menu_item__price', 'menu_item__category__name')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+        .order_by('-total_quantity', 'menu_item__name')
+    )
+
+
+def category_sales(store, start_date, end_date=None):
+    """Per-category [{'menu_item__category__name', 'total_quantity', 'total_revenue'}], highest revenue first"""
+    return (
+        _item_sales(store, start_date, end_date or start_date)
+        .values('menu_item__category__name')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+        .order_by('-total_revenue')
+    )
@@ -3,6 +3,7 @@ from django.db import transaction
 from decimal import Decimal
 from django.utils import timezone
 from .models import Order, OrderItem, Tables, Checkout, SavedItems
+from . import totals
 from inventory.models import Menu, Tax, Modifiers
 from authentication.models import CustomUser, Store
 
@@ -70,21 +71,17 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
         ]
 
     def get_item_total(self, obj):
-        addon_total = sum(addon.price for addon in obj.add_ons.all())
-        return float((obj.price + addon_total) * obj.quantity)
+        return float(obj.line_subtotal)
 
     def get_item_tax_amount(self, obj):
-        base_price = obj.price + sum(addon.price for addon in obj.add_ons.all())
-        total_tax_percentage = sum(tax.tax_percentage for tax in obj.tax.all())
-        tax_amount = (base_price * obj.quantity * total_tax_percentage) / 100
-        return float(tax_amount)
+        return float(obj.line_tax)
 
     def validate_menu_item_id(self, value):
         request = self.context.get('request')
-        if not request or not hasattr(request.user, 'store_memberships'):
+        if not request or not request.store_ctx.store_ids:
             raise serializers.ValidationError("User must be associated with a store")
         
-        user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = request.store_ctx.store_ids
         
         try:
             menu_item = Menu.objects.get(id=value, store_id__in=user_stores, status=True)
@@ -97,7 +94,7 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
             return value
         
         request = self.context.get('request')
-        user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = request.store_ctx.store_ids
         
         valid_modifiers = Modifiers.objects.filter(
             id__in=value, 
@@ -115,7 +112,7 @@ class OrderItemCreateSerializer(serializers.ModelSerializer):
             return value
         
         request = self.context.get('request')
-        user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = request.store_ctx.store_ids
         
         valid_taxes = Tax.objects.filter(
             id__in=value, 
@@ -177,14 +174,10 @@ class OrderItemReadSerializer(serializers.ModelSerializer):
         ]
 
     def get_item_total(self, obj):
-        addon_total = sum(addon.price for addon in obj.add_ons.all())
-        return float((obj.price + addon_total) * obj.quantity)
+        return float(obj.line_subtotal)
 
     def get_item_tax_amount(self, obj):
-        base_price = obj.price + sum(addon.price for addon in obj.add_ons.all())
-        total_tax_percentage = sum(tax.tax_percentage for tax in obj.tax.all())
-        tax_amount = (base_price * obj.quantity * total_tax_percentage) / 100
-        return float(tax_amount)
+        return float(obj.line_tax)
 
 
 class OrderCreateSerializer(serializers.ModelSerializer):
@@ -213,67 +206,48 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         
         # Get user's active store
-        user_store = request.user.store_memberships.filter(is_active=True).first()
+        user_store = request.store_ctx.membership
         if not user_store:
             raise serializers.ValidationError("User is not associated with any active store")
         
-        # Set store and user automatically
+        # Set store, user and where the order is taken automatically
         validated_data['store'] = user_store.store
         validated_data['user'] = request.user
+        validated_data['branch'], validated_data['pos_device'] = request.store_ctx.order_attribution()
         
         # Set table if provided
         if table_id:
             validated_data['table_id'] = table_id
 
-        # Create order
-        order = Order.objects.create(**validated_data)
-        
-        # Calculate totals
-        total_before_tax = Decimal('0.00')
-        total_tax = Decimal('0.00')
-        
-        # Create order items
-        for item_data in items_data:
-            menu_item = Menu.objects.get(id=item_data['menu_item_id'])
-            is_saved = item_data.pop('is_saved_for_later', False)
-            
-            # Create order item
-            order_item = OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=item_data['quantity'],
-                price=menu_item.price,
-                special_instructions=item_data.get('special_instructions', ''),
-                is_saved_for_later=is_saved
-            )
+        # Create order; item signals are batched into one totals update
+        with totals.batch():
+            order = Order.objects.create(**validated_data)
             
-            # Add modifiers
-            if 'add_ons' in item_data:
-                order_item.add_ons.set(item_data['add_ons'])
-            
-            # Add taxes
-            if 'taxes' in item_data:
-                order_item.tax.set(item_data['taxes'])
-            else:
-                # Use menu item's default taxes
-                order_item.tax.set(menu_item.taxes.all())
-            
-            # Calculate totals only for items not saved for later
-            if not is_saved:
-                addon_total = sum(addon.price for addon in order_item.add_ons.all())
-                item_base_price = (order_item.price + addon_total) * order_item.quantity
+            # Create order items
+            for item_data in items_data:
+                menu_item = Menu.objects.get(id=item_data['menu_item_id'])
+                is_saved = item_data.pop('is_saved_for_later', False)
                 
-                total_tax_percentage = sum(tax.tax_percentage for tax in order_item.tax.all())
-                item_tax_amount = (item_base_price * total_tax_percentage) / 100
+                # Create order item
+                order_item = OrderItem.objects.create(
+                    order=order,
+                    menu_item=menu_item,
+                    quantity=item_data['quantity'],
+                    price=menu_item.price,
+                    special_instructions=item_data.get('special_instructions', ''),
+                    is_saved_for_later=is_saved
+                )
                 
-                total_before_tax += item_base_price
-                total_tax += item_tax_amount
-        
-        # Update order totals
-        order.total_before_tax = float(total_before_tax)
-        order.total_tax = float(total_tax)
-        order.total_price = float(total_before_tax + total_tax)
-        order.save()
+                # Add modifiers
+                if 'add_ons' in item_data:
+                    order_item.add_ons.set(item_data['add_ons'])
+                
+                # Add taxes
+                if 'taxes' in item_data:
+                    order_item.tax.set(item_data['taxes'])
+                else:
+                    # Use menu item's default taxes
+                    order_item.tax.set(menu_item.taxes.all())
         
         return order
 
@@ -290,7 +264,7 @@ class OrderReadSerializer(serializers.ModelSerializer):
         model = Order
         fields = [
             'id', 'token', 'table_details', 'order_method', 'store_name',
-            'user_name', 'create_date', 'status', 'checkout_status',
+            'branch', 'pos_device', 'user_name', 'create_date', 'status', 'checkout_status',
             'take_order', 'completion_status', 'total_price', 'total_tax',
             'total_before_tax', 'payment_method', 'payment_status', 'items',
             'checkout_items', 'saved_items', 'is_saved_for_later'
@@ -358,7 +332,7 @@ class CheckoutSerializer(serializers.ModelSerializer):
 
     def validate_order(self, value):
         request = self.context.get('request')
-        user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = request.store_ctx.store_ids
         
         if value.store_id not in user_stores:
             raise serializers.ValidationError("Order not found or not accessible")
@@ -400,7 +374,6 @@ class CheckoutSerializer(serializers.ModelSerializer):
         
         # Recalculate order totals based only on checkout items
         order.calculate_totals()
-        order.save()
         
         # Update order checkout status
         order.checkout_status = True
@@ -469,8 +442,8 @@ class OrderItemTaxModifierSerializer(serializers.ModelSerializer):
             return value
         
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             taxes = Tax.objects.filter(id__in=value, store=store, is_active=True)
             if len(taxes) != len(value):
                 raise serializers.ValidationError("Some tax IDs are invalid or don't belong to your store.")
@@ -482,8 +455,8 @@ class OrderItemTaxModifierSerializer(serializers.ModelSerializer):
             return value
         
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             modifiers = Modifiers.objects.filter(id__in=value, store=store, status=True)
             if len(modifiers) != len(value):
                 raise serializers.ValidationError("Some modifier IDs are invalid or don't belong to your store.")
@@ -493,27 +466,23 @@ class OrderItemTaxModifierSerializer(serializers.ModelSerializer):
         tax_ids = validated_data.get('tax_ids')
         modifier_ids = validated_data.get('modifier_ids')
         
-        # Update taxes if provided
-        if tax_ids is not None:
-            if tax_ids:
-                taxes = Tax.objects.filter(id__in=tax_ids)
-                instance.tax.set(taxes)
-            else:
-                instance.tax.clear()
-        
-        # Update modifiers if provided
-        if modifier_ids is not None:
-            if modifier_ids:
-                modifiers = Modifiers.objects.filter(id__in=modifier_ids)
-                instance.add_ons.set(modifiers)
-            else:
-                instance.add_ons.clear()
-        
-        instance.save()
-        
-        # Recalculate order totals
-        instance.order.calculate_totals()
-        instance.order.save()
+        # Order totals are recalculated once when the batch exits
+        with totals.batch():
+            # Update taxes if provided
+            if tax_ids is not None:
+                if tax_ids:
+                    taxes = Tax.objects.filter(id__in=tax_ids)
+                    instance.tax.set(taxes)
+                else:
+                    instance.tax.clear()
+            
+            # Update modifiers if provided
+            if modifier_ids is not None:
+                if modifier_ids:
+                    modifiers = Modifiers.objects.filter(id__in=modifier_ids)
+                    instance.add_ons.set(modifiers)
+                else:
+                    instance.add_ons.clear()
         
         return instance
 
@@ -539,8 +508,8 @@ class BulkOrderItemTaxModifierSerializer(serializers.Serializer):
     def validate_order_item_ids(self, value):
         """Validate order item IDs exist"""
         request = self.context.get('request')
-        if request and hasattr(request, 'user_store'):
-            store = request.user_store
+        if request and request.store_ctx.store is not None:
+            store = request.store_ctx.store
             items = OrderItem.objects.filter(
                 id__in=value,
                 order__store=store
@@ -1,19 +1,123 @@
-# Signal to update order totals when items change
-from .models import OrderItem
-from django.db.models.signals import post_save, post_delete, m2m_changed
+# Signals to update order totals when items change, sales rollups when checked-out orders do,
+# and delta feed tombstones when orders are deleted
+from .models import Order, OrderItem
+from . import delta, rollups, totals
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-@receiver([post_save, post_delete], sender=OrderItem)
-def update_order_totals_on_item_change(sender, instance, **kwargs):
-    """Update order totals when items are added/removed/modified"""
-    if hasattr(instance, 'order'):
-        instance.order.calculate_totals()
-        instance.order.save(update_fields=['total_price', 'total_tax', 'total_before_tax'])
+
+def _cached_order(item):
+    """Return the item's order if it is already loaded, without querying for it"""
+    return item._state.fields_cache.get('order')
+
+
+def _written_state(instance, fields, update_fields):
+    """
+    {field: value} the row holds after this save: the saved fields from the
+    instance, the others as they were stored. None if the stored state is
+    unknown and the save did not write every field.
+    """
+    previous = getattr(instance, '_rollup_state', None)
+    if update_fields is None:
+        return {field: getattr(instance, field) for field in fields}
+    if previous is None:
+        return None
+    written = {field for field in fields if field in update_fields or field.removesuffix('_id') in update_fields}
+    return {field: getattr(instance, field) if field in written else previous[field] for field in fields}
+
+
+def _remember_stored_state(sender, instance, fields):
+    """For an instance that was not loaded from its row: read what the row counts for now"""
+    if not instance._state.adding and getattr(instance, '_rollup_state', None) is None:
+        instance._rollup_state = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _counted_fields_saved(fields, update_fields):
+    return update_fields is None or any(
+        field in update_fields or field.removesuffix('_id') in update_fields for field in fields
+    )
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_line_state(sender, instance, update_fields=None, **kwargs):
+    if _counted_fields_saved(rollups.LINE_FIELDS, update_fields):
+        _remember_stored_state(sender, instance, rollups.LINE_FIELDS)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_order_totals_on_item_save(sender, instance, created=False, update_fields=None, **kwargs):
+    """Reprice the line and update order totals when items are added or modified"""
+    if _counted_fields_saved(rollups.LINE_FIELDS, update_fields):
+        previous = None if created else getattr(instance, '_rollup_state', None)
+        current = _written_state(instance, rollups.LINE_FIELDS, update_fields)
+        instance._rollup_state = current
+        if current != previous:
+            rollups.line_changed(instance.order_id, previous, current, _cached_order(instance))
+
+    if update_fields is not None and not totals.PRICED_FIELDS.intersection(update_fields):
+        return
+    totals.item_changed(instance, _cached_order(instance))
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals_on_item_delete(sender, instance, **kwargs):
+    """Update order totals when items are removed"""
+    stored = getattr(instance, '_rollup_state', None) or {field: getattr(instance, field) for field in rollups.LINE_FIELDS}
+    rollups.line_changed(instance.order_id, stored, None, _cached_order(instance))
+    totals.order_changed(instance.order_id, _cached_order(instance))
+
 
 @receiver(m2m_changed, sender=OrderItem.add_ons.through)
 @receiver(m2m_changed, sender=OrderItem.tax.through)
-def update_order_totals_on_m2m_change(sender, instance, **kwargs):
-    """Update order totals when addons or taxes are modified"""
-    if kwargs['action'] in ['post_add', 'post_remove', 'post_clear']:
-        instance.order.calculate_totals()
-        instance.order.save(update_fields=['total_price', 'total_tax', 'total_before_tax'])
\ No newline at end of file
+def update_order_totals_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reprice the line and update order totals when addons or taxes are modified"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        totals.item_changed(instance, _cached_order(instance))
+        return
+
+    # Changed from the Modifiers/Tax side: pk_set holds the affected items
+    if pk_set:
+        with totals.batch():
+            for item in OrderItem.objects.filter(pk__in=pk_set).only('id', 'order_id'):
+                totals.item_changed(item)
+
+
+@receiver(pre_save, sender=Order)
+def remember_rollup_state(sender, instance, update_fields=None, **kwargs):
+    if _counted_fields_saved(rollups.ORDER_FIELDS, update_fields):
+        _remember_stored_state(sender, instance, rollups.ORDER_FIELDS)
+
+
+@receiver(post_save, sender=Order)
+def update_rollups_on_order_save(sender, instance, created=False, update_fields=None, **kwargs):
+    """Move the order's sales figures if the save changed what it counts for"""
+    if not _counted_fields_saved(rollups.ORDER_FIELDS, update_fields):
+        return
+    previous = None if created else getattr(instance, '_rollup_state', None)
+    current = _written_state(instance, rollups.ORDER_FIELDS, update_fields)
+    instance._rollup_state = current
+    if current != previous:
+        rollups.order_changed(instance, previous, current)
+
+
+@receiver(pre_delete, sender=Order)
+def update_rollups_on_order_delete(sender, instance, **kwargs):
+    """Take a sold order out of the rollups before its lines go"""
+    _remember_stored_state(sender, instance, rollups.ORDER_FIELDS)
+    stored = instance._rollup_state
+    if stored is None or not stored['checkout_status']:
+        return
+    rollups.order_changed(instance, stored, None)
+    # Its lines are deleted next; un-checked they no longer count, so they leave
+    # the rollups with the order instead of one by one
+    sender.objects.filter(pk=instance.pk).update(checkout_status=False)
+    instance._rollup_state = dict(stored, checkout_status=False)
+
+
+@receiver(post_delete, sender=Order)
+def record_order_tombstone(sender, instance, **kwargs):
+    """Let ?since= feeds tell clients the order is gone"""
+    delta.record_deleted(instance)
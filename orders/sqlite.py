@@ -0,0 +1,82 @@
+"""
+SQLite tuned mode for single-box deployments (settings.SQLITE_TUNED).
+
+Every SQLite connection already runs in WAL mode with a busy timeout
+(init_command in settings). Tuned mode adds, on each new connection:
+
+- memory-mapped reads (mmap_size), so POS screens read pages straight from
+  the OS cache instead of copying them through SQLite's own;
+- a larger page cache (cache_size), kept for the connection's lifetime
+  because tuned mode also keeps connections open between requests;
+- temp_store=MEMORY for the sorts and GROUP BYs of the dashboards.
+
+It also runs ``PRAGMA optimize`` on each open connection at most every
+SQLITE_OPTIMIZE_INTERVAL seconds, at the start of a request. SQLite only
+re-analyzes the tables a connection has queried, so the pragma has to run
+on a connection that has served requests, not on a new one.
+
+``manage.py check --deploy`` warns when DEBUG is off and SQLite was not
+chosen with DB_ENGINE, since it is also the development default.
+"""
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+DEFAULT_CACHE_SIZE = 64 * 1024  # KiB
+DEFAULT_OPTIMIZE_INTERVAL = 60 * 60  # seconds
+
+
+def tuned():
+    return getattr(settings, 'SQLITE_TUNED', False)
+
+
+def tuning_pragmas():
+    mmap_size = getattr(settings, 'SQLITE_MMAP_SIZE', DEFAULT_MMAP_SIZE)
+    cache_size = getattr(settings, 'SQLITE_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+    return [
+        f'PRAGMA mmap_size={int(mmap_size)}',
+        # Negative: size in KiB rather than in pages
+        f'PRAGMA cache_size=-{int(cache_size)}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def _next_optimize():
+    return time.monotonic() + getattr(settings, 'SQLITE_OPTIMIZE_INTERVAL', DEFAULT_OPTIMIZE_INTERVAL)
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not tuned():
+        return
+    for pragma in tuning_pragmas():
+        connection.connection.execute(pragma)
+    connection.sqlite_optimize_at = _next_optimize()
+
+
+@receiver(request_started)
+def optimize_if_due(sender, **kwargs):
+    if not tuned():
+        return
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is None or time.monotonic() < getattr(connection, 'sqlite_optimize_at', float('inf')):
+            continue
+        connection.sqlite_optimize_at = _next_optimize()
+        connection.connection.execute('PRAGMA optimize')
+
+
+@checks.register(checks.Tags.database, deploy=True)
+def check_database_engine(app_configs, **kwargs):
+    if settings.DEBUG or getattr(settings, 'DB_ENGINE_EXPLICIT', True) or settings.DB_ENGINE != 'sqlite':
+        return []
+    return [checks.Warning(
+        "DB_ENGINE is not set, so the database falls back to SQLite.",
+        hint="Set DB_ENGINE=postgres, or DB_ENGINE=sqlite for a deliberate single-box deployment.",
+        id='orders.W001',
+    )]
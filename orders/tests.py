@@ -1,3 +1,639 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import os
+import runpy
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication import store_cache
+from authentication.models import Branch, BranchUser, CustomUser, POSDevice, Store, StoreUser
+from inventory.models import FoodCategory, Menu, Modifiers, Tax
+
+from . import delta, events, rollups, sqlite, totals
+from .management.commands.check_query_plans import explain, hot_queries
+from .models import DailyStoreSales, DailyTokenCounter, HourlyStoreSales, MenuItemDailySales, Order, OrderItem
+from .pricing import TaxBreakdown, price_items
+
+# Tests run against a private in-memory cache, never the configured shared one
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OrderTestCase(TestCase):
+    """A store with an owner, two taxes, an add-on and two menu items"""
+
+    def setUp(self):
+        cache.clear()
+        # Hand the hit/miss counts to the test cache, not to the exit-time flush
+        self.addCleanup(store_cache.flush_stats)
+        self.store = Store.objects.create(
+            name='Cafe', store_code='CAFE1', owner_name='Owner', business_type='cafe', timezone='Asia/Kolkata',
+        )
+        self.user = CustomUser.objects.create_user(
+            email='owner@example.com', first_name='Own', last_name='Er', pin='123456',
+        )
+        StoreUser.objects.create(store=self.store, user=self.user, role='store_owner', permissions=['all'])
+        category = FoodCategory.objects.create(store=self.store, name='Drinks')
+        self.gst = Tax.objects.create(store=self.store, tax_name='GST', tax_percentage=Decimal('5.00'))
+        self.cess = Tax.objects.create(store=self.store, tax_name='CESS', tax_percentage=Decimal('2.50'))
+        self.shot = Modifiers.objects.create(store=self.store, name='Extra shot', price=1.5)
+        self.latte = Menu.objects.create(
+            store=self.store, category=category, name='Latte', portion='Small', diet='Veg', price=Decimal('10.30'),
+        )
+        self.mocha = Menu.objects.create(
+            store=self.store, category=category, name='Mocha', portion='Small', diet='Veg', price=Decimal('12.00'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, items=None, **extra):
+        payload = {
+            'order_method': 'Takeaway',
+            'items': items if items is not None else [
+                {'menu_item_id': self.latte.id, 'quantity': 1, 'taxes': [self.gst.id, self.cess.id]},
+            ],
+        }
+        payload.update(extra)
+        response = self.client.post('/orders/create/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Order.objects.get(pk=response.json()['id'])
+
+    def checkout(self, order, payment_status='Paid'):
+        response = self.client.post('/orders/checkout/', {
+            'order': order.id, 'payment_method': 'Cash', 'payment_status': payment_status, 'total_price': '0',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        order.refresh_from_db()
+        return order
+
+
+class TokenTests(OrderTestCase):
+    def test_tokens_are_unique_per_store_and_day(self):
+        other = Store.objects.create(
+            name='Other', store_code='OTHER1', owner_name='Owner', business_type='cafe', timezone='UTC',
+        )
+        StoreUser.objects.create(store=other, user=self.user, role='store_owner', permissions=['all'])
+
+        tokens = [self.create_order().token for _ in range(3)]
+        other_tokens = [
+            Order.objects.create(store=other, order_method='Takeaway').token for _ in range(2)
+        ]
+        tokens.append(self.create_order().token)
+
+        self.assertEqual(tokens, [1, 2, 3, 4])
+        self.assertEqual(other_tokens, [1, 2])
+        self.assertEqual(DailyTokenCounter.objects.get(store=self.store).last_token, 4)
+
+    def test_deleted_orders_do_not_free_their_token(self):
+        first = self.create_order()
+        second = self.create_order()
+        second.delete()
+        self.assertEqual(self.create_order().token, 3)
+        self.assertEqual(first.token, 1)
+
+    def test_tokens_restart_on_the_next_business_day(self):
+        self.create_order()
+        self.create_order()
+        tomorrow = self.store.business_date() + timedelta(days=1)
+        with mock.patch.object(Store, 'business_date', return_value=tomorrow):
+            self.assertEqual(self.create_order().token, 1)
+        self.assertEqual(
+            list(DailyTokenCounter.objects.filter(store=self.store).order_by('business_date')
+                 .values_list('last_token', flat=True)),
+            [2, 1],
+        )
+
+
+class TotalsTests(OrderTestCase):
+    def assertTotals(self, order, before_tax, tax):
+        order.refresh_from_db()
+        self.assertEqual(order.total_before_tax, Decimal(before_tax))
+        self.assertEqual(order.total_tax, Decimal(tax))
+        self.assertEqual(order.total_price, Decimal(before_tax) + Decimal(tax))
+
+    def test_totals_follow_item_add_edit_and_delete(self):
+        order = self.create_order()
+        self.assertTotals(order, '10.30', '0.77')
+
+        # Add: (12.00 + 1.50 add-on) * 3 = 40.50, GST 2.025 rounds half up to 2.03
+        added = OrderItem.objects.create(order=order, menu_item=self.mocha, quantity=3, price=self.mocha.price)
+        added.add_ons.add(self.shot)
+        added.tax.add(self.gst)
+        self.assertTotals(order, '50.80', '2.80')
+
+        # Edit: 10.30 * 3 = 30.90, 7.5% is 2.3175
+        latte_line = order.items.get(menu_item=self.latte)
+        latte_line.quantity = 3
+        latte_line.save()
+        self.assertTotals(order, '71.40', '4.35')
+
+        # Saved-for-later lines stay on the order but out of its totals
+        added.is_saved_for_later = True
+        added.save()
+        self.assertTotals(order, '30.90', '2.32')
+
+        latte_line.delete()
+        self.assertTotals(order, '0.00', '0.00')
+
+    def test_batch_writes_totals_once_on_exit(self):
+        order = self.create_order()
+        with totals.batch():
+            for _ in range(3):
+                line = OrderItem.objects.create(order=order, menu_item=self.mocha, quantity=1, price=self.mocha.price)
+                line.tax.add(self.gst)
+            # Nothing is written until the outermost batch exits
+            self.assertTotals(order, '10.30', '0.77')
+        self.assertTotals(order, '46.30', '2.57')
+
+
+class LinePricingTests(OrderTestCase):
+    def test_lines_store_their_own_pricing(self):
+        # 10.30 at 7.5% is 0.7725 a line: two lines are 0.77 + 0.77, not 1.545 rounded once
+        order = self.create_order(items=[
+            {'menu_item_id': self.latte.id, 'quantity': 1, 'taxes': [self.gst.id, self.cess.id]},
+            {'menu_item_id': self.mocha.id, 'quantity': 2, 'taxes': [self.gst.id], 'add_ons': [self.shot.id]},
+        ])
+        self.assertEqual(
+            sorted(order.items.values_list('addon_total', 'line_subtotal', 'line_tax', 'line_total')),
+            [
+                (Decimal('0.00'), Decimal('10.30'), Decimal('0.77'), Decimal('11.07')),
+                (Decimal('1.50'), Decimal('27.00'), Decimal('1.35'), Decimal('28.35')),
+            ],
+        )
+
+
+class BatchPricingTests(OrderTestCase):
+    def test_price_items_matches_the_stored_lines_in_three_queries(self):
+        for quantity in (1, 2, 3):
+            self.create_order(items=[
+                {'menu_item_id': self.latte.id, 'quantity': quantity, 'taxes': [self.gst.id, self.cess.id]},
+                {'menu_item_id': self.mocha.id, 'quantity': 1, 'taxes': [self.gst.id], 'add_ons': [self.shot.id]},
+            ])
+        items = OrderItem.objects.filter(order__store=self.store)
+        with CaptureQueriesContext(connection) as queries:
+            priced = price_items(items)
+        self.assertEqual(len(queries.captured_queries), 3)
+        self.assertEqual(len(priced), 6)
+
+        stored = {
+            row['id']: row
+            for row in items.values('id', 'addon_total', 'line_subtotal', 'line_tax', 'line_total')
+        }
+        for item_id, line in priced.lines().items():
+            self.assertEqual(line, {field: stored[item_id][field] for field in line})
+        for order_id, (before_tax, tax) in priced.order_totals().items():
+            order = Order.objects.get(pk=order_id)
+            self.assertEqual((order.total_before_tax, order.total_tax), (before_tax, tax))
+
+    def test_tax_breakdown_rounds_once_per_tax_across_chunks(self):
+        orders = [self.create_order() for _ in range(3)]
+        breakdown = TaxBreakdown()
+        for order in orders:
+            breakdown.add(price_items(order.items.all()))
+        rows = {row['name']: row for row in breakdown.rows()}
+        # 3 * 0.515 = 1.545 and 3 * 0.2575 = 0.7725, rounded once each
+        self.assertEqual(
+            (rows['GST']['taxable_amount'], rows['GST']['tax_amount'], rows['GST']['line_count']),
+            (Decimal('30.90'), Decimal('1.55'), 3),
+        )
+        self.assertEqual(rows['CESS']['tax_amount'], Decimal('0.77'))
+        self.assertEqual(breakdown.rows(), price_items(OrderItem.objects.all()).tax_breakdown())
+
+
+class OrderEventStreamTests(OrderTestCase):
+    def ticket(self):
+        response = self.client.post('/orders/events/ticket/')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['ticket']
+
+    def test_tickets_are_single_use(self):
+        ticket = self.ticket()
+        self.assertEqual(events.redeem_ticket(ticket), self.user.pk)
+        self.assertIsNone(events.redeem_ticket(ticket))
+        self.assertIsNone(events.redeem_ticket('not-a-ticket'))
+
+    def test_stream_is_refused_outside_asgi(self):
+        ticket = self.ticket()
+        response = Client().get('/orders/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('error', response.json())
+        # The refused request leaves the ticket unspent
+        self.assertEqual(events.redeem_ticket(ticket), self.user.pk)
+
+    def create_order_and_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.create_order()
+
+    async def test_stream_redeems_the_ticket_and_delivers_events(self):
+        ticket = await sync_to_async(self.ticket)()
+        response = await AsyncClient().get('/orders/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            order = await sync_to_async(self.create_order_and_commit)()
+            frame = await asyncio.wait_for(anext(stream), timeout=5)
+        finally:
+            await stream.aclose()
+        self.assertTrue(frame.startswith(f'event: {events.ORDER_CREATED}\n'.encode()), frame)
+        self.assertIn(f'"order_id": {order.pk}'.encode(), frame)
+
+        # The ticket was spent opening the stream
+        response = await AsyncClient().get('/orders/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+
+def rollup_rows():
+    return (
+        sorted(DailyStoreSales.objects.values_list(
+            'date', 'order_method', 'payment_method', 'orders_count', 'revenue', 'tax',
+            'paid_orders_count', 'paid_revenue',
+        )),
+        sorted(HourlyStoreSales.objects.values_list('date', 'hour', 'orders_count', 'revenue')),
+        sorted(MenuItemDailySales.objects.values_list('date', 'menu_item_id', 'quantity', 'revenue')),
+    )
+
+
+class RollupTests(OrderTestCase):
+    def assertMatchesRecompute(self):
+        applied = rollup_rows()
+        rollups.rebuild(self.store)
+        self.assertEqual(applied, rollup_rows())
+
+    def test_rollups_match_a_recompute_after_status_changes(self):
+        paid = self.checkout(self.create_order())
+        pending = self.checkout(self.create_order(), payment_status='Pending')
+        self.create_order()  # never checked out
+        self.assertMatchesRecompute()
+        totals = rollups.sales_totals(self.store, self.store.business_date())
+        self.assertEqual((totals['orders_count'], totals['paid_orders_count']), (2, 1))
+
+        pending.payment_status = 'Paid'
+        pending.payment_method = 'Card'
+        pending.save()
+        self.assertMatchesRecompute()
+
+        paid.status = 'Completed'
+        paid.save()
+        self.assertMatchesRecompute()
+
+        paid.checkout_status = False
+        paid.save()
+        self.assertMatchesRecompute()
+        paid.checkout_status = True
+        paid.save()
+        self.assertMatchesRecompute()
+
+        line = paid.items.first()
+        line.quantity = 4
+        line.save()
+        self.assertMatchesRecompute()
+
+        pending.delete()
+        self.assertMatchesRecompute()
+        paid.delete()
+        self.assertMatchesRecompute()
+        self.assertEqual(rollup_rows(), ([], [], []))
+
+    def test_sales_totals_sum_the_days_in_range(self):
+        day = self.store.business_date()
+        order = self.checkout(self.create_order())
+        self.checkout(self.create_order(), payment_status='Pending')
+
+        totals = rollups.sales_totals(self.store, day)
+        self.assertEqual((totals['orders_count'], totals['paid_orders_count']), (2, 1))
+        self.assertEqual(totals['revenue'], totals['paid_revenue'] * 2)
+        self.assertEqual(totals['avg_order_value'], totals['revenue'] / 2)
+        hour = timezone.localtime(order.create_date, self.store.tzinfo).hour
+        self.assertEqual(rollups.hourly_orders(self.store, day)[hour], 2)
+
+        empty = rollups.sales_totals(self.store, day - timedelta(days=3), day - timedelta(days=1))
+        self.assertEqual((empty['orders_count'], empty['revenue'], empty['avg_order_value']), (0, 0, 0))
+
+
+class MenuItemRollupTests(OrderTestCase):
+    def test_item_and_category_sales_follow_line_edits(self):
+        day = self.store.business_date()
+        order = self.checkout(self.create_order([
+            {'menu_item_id': self.latte.id, 'quantity': 2, 'taxes': [self.gst.id]},
+            {'menu_item_id': self.mocha.id, 'quantity': 1, 'taxes': []},
+        ]))
+        self.checkout(self.create_order([{'menu_item_id': self.mocha.id, 'quantity': 1, 'taxes': []}]))
+        self.create_order([{'menu_item_id': self.latte.id, 'quantity': 5, 'taxes': []}])  # never checked out
+
+        sold = [(row['menu_item__name'], row['total_quantity']) for row in rollups.item_sales(self.store, day)]
+        self.assertEqual(sold, [('Latte', 2), ('Mocha', 2)])
+
+        latte_line = order.items.get(menu_item=self.latte)
+        latte_line.quantity = 1
+        latte_line.save()
+        sold = [(row['menu_item__name'], row['total_quantity']) for row in rollups.item_sales(self.store, day)]
+        self.assertEqual(sold, [('Mocha', 2), ('Latte', 1)])
+
+        order.items.get(menu_item=self.mocha).delete()
+        categories = list(rollups.category_sales(self.store, day))
+        self.assertEqual(
+            [(row['menu_item__category__name'], row['total_quantity']) for row in categories], [('Drinks', 2)],
+        )
+        # 10.30 + 5% GST on the latte, plus the second order's mocha
+        self.assertEqual(categories[0]['total_revenue'], Decimal('22.82'))
+        applied = rollup_rows()
+        rollups.rebuild(self.store)
+        self.assertEqual(applied, rollup_rows())
+
+    def test_refreshed_instance_is_not_counted_twice(self):
+        order = self.create_order()
+        stale = Order.objects.get(pk=order.pk)
+        # Checked out through another instance, then picked up by refresh_from_db
+        self.checkout(order)
+        stale.refresh_from_db()
+        stale.special_instructions = 'No sugar'
+        stale.save()
+        self.assertEqual(rollups.sales_totals(self.store, self.store.business_date())['orders_count'], 1)
+
+        order.payment_status = 'Pending'
+        order.save()
+        stale.refresh_from_db(fields=['payment_status'])
+        stale.save()
+        totals = rollups.sales_totals(self.store, self.store.business_date())
+        self.assertEqual((totals['orders_count'], totals['paid_orders_count']), (1, 0))
+
+        line = order.items.get()
+        other = OrderItem.objects.get(pk=line.pk)
+        other.quantity = 3
+        other.save()
+        line.refresh_from_db(fields=['quantity'])
+        line.save()
+        sold = rollups.item_sales(self.store, self.store.business_date())
+        self.assertEqual([row['total_quantity'] for row in sold], [3])
+
+
+class BranchAttributionTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.main = Branch.objects.create(store=self.store, name='Main', branch_code='M')
+        self.annex = Branch.objects.create(store=self.store, name='Annex', branch_code='A')
+
+    def assign(self, branch):
+        with self.captureOnCommitCallbacks(execute=True):
+            BranchUser.objects.create(branch=branch, user=self.user, role='cashier')
+
+    def attribution(self, order):
+        return order.branch, order.pos_device
+
+    def test_orders_take_the_device_branch_else_the_only_branch(self):
+        self.assertEqual(self.attribution(self.create_order()), (None, None))
+
+        self.assign(self.main)
+        self.assertEqual(self.attribution(self.create_order()), (self.main, None))
+
+        self.assign(self.annex)
+        self.assertEqual(self.attribution(self.create_order()), (None, None))
+
+        till = POSDevice.objects.create(
+            branch=self.annex, device_name='Till', device_code='TILL1', device_type='main_counter',
+        )
+        self.client.credentials(HTTP_X_DEVICE_CODE='till1')
+        self.assertEqual(self.attribution(self.create_order()), (self.annex, till))
+
+        till.is_active = False
+        till.save()
+        self.assertEqual(self.attribution(self.create_order()), (None, None))
+
+    def test_orders_filter_by_branch(self):
+        self.assign(self.main)
+        main_order = self.create_order()
+        Order.objects.create(store=self.store, order_method='Takeaway', branch=self.annex)
+
+        response = self.client.get('/orders/order-list/', {'branch': str(self.main.id)})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([row['id'] for row in response.json()], [main_order.id])
+
+        response = self.client.get('/orders/statistics/', {'branch': str(self.annex.id)})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['today_orders'], 1)
+        self.assertEqual(self.client.get('/orders/order-list/', {'branch': 'nope'}).status_code, 400)
+
+
+class OrderCsvExportTests(OrderTestCase):
+    def test_filtered_orders_stream_as_csv(self):
+        paid = self.checkout(self.create_order())
+        self.create_order(order_method='Dine In')
+
+        response = self.client.get('/orders/order-list/', {'export': 'csv', 'checkout_status': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['id'], row['payment_status'], row['total_price']) for row in rows], [
+            (str(paid.id), 'Paid', str(paid.total_price)),
+        ])
+        local = timezone.localtime(paid.create_date, self.store.tzinfo)
+        self.assertEqual(rows[0]['create_date'], local.isoformat())
+
+
+class DeltaFeedTests(OrderTestCase):
+    def kitchen_order(self):
+        order = self.create_order()
+        order.take_order = True
+        order.save()
+        return order
+
+    def poll(self, cursor=None):
+        response = self.client.get('/orders/kitchen-display/', {'since': cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_write_committed_after_a_poll_is_in_the_next_delta(self):
+        order = self.kitchen_order()
+        idle = self.kitchen_order()
+        # A write whose transaction stamped updated_at before the poll began...
+        stamped = timezone.now()
+        cursor = self.poll()[delta.CURSOR_HEADER]
+        # ...and only commits once the poll has read the queue
+        with mock.patch('django.utils.timezone.now', return_value=stamped):
+            order.special_instructions = 'No sugar'
+            order.save()
+        line = idle.items.first()
+        with mock.patch('django.utils.timezone.now', return_value=stamped):
+            line.completion_status = True
+            line.save()
+
+        body = self.poll(cursor).json()
+        self.assertEqual(sorted(o['id'] for o in body['orders']), sorted([order.id, idle.id]))
+        self.assertEqual((body['removed'], body['deleted']), ([], []))
+
+    def test_delta_reports_removed_and_deleted_orders(self):
+        done = self.kitchen_order()
+        gone = self.kitchen_order()
+        cursor = self.poll()[delta.CURSOR_HEADER]
+        done.status = 'Completed'
+        done.save()
+        gone_id = gone.id
+        gone.delete()
+
+        body = self.poll(cursor).json()
+        self.assertEqual(body['orders'], [])
+        self.assertEqual(body['removed'], [done.id])
+        self.assertEqual(body['deleted'], [gone_id])
+
+    def test_bad_and_expired_cursors_are_refused(self):
+        expired = timezone.now() - delta.TOMBSTONE_RETENTION - timedelta(minutes=1)
+        for cursor in ('bad', str(int(expired.timestamp() * 1_000_000))):
+            response = self.client.get('/orders/kitchen-display/', {'since': cursor})
+            self.assertEqual(response.status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_their_indexes(self):
+        for label, queryset, indexes in hot_queries():
+            with self.subTest(label):
+                plan = explain(queryset)
+                self.assertTrue(any(index in plan for index in indexes), f"expected one of {indexes}:\n{plan}")
+
+
+def load_settings(**environ):
+    """The settings module as it evaluates under ``environ``, with no file cache directory"""
+    path = os.path.join(settings.BASE_DIR, 'coffybyte', 'settings.py')
+    environ.setdefault('CACHE_BACKEND', 'locmem')
+    with mock.patch.dict(os.environ, environ):
+        for name in ('DB_ENGINE', 'DB_POOL', 'SQLITE_TUNED'):
+            if name not in environ:
+                os.environ.pop(name, None)
+        return runpy.run_path(path)
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_sqlite_is_the_default(self):
+        config = load_settings()
+        database = config['DATABASES']['default']
+        self.assertEqual(database['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertFalse(config['DB_ENGINE_EXPLICIT'])
+
+    def test_postgres_pool_replaces_persistent_connections(self):
+        database = load_settings(DB_ENGINE='postgres')['DATABASES']['default']
+        self.assertEqual((database['CONN_MAX_AGE'], database['OPTIONS']), (600, {}))
+
+        database = load_settings(DB_ENGINE='postgres', DB_POOL='1', DB_POOL_MAX_SIZE='8')['DATABASES']['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 2, 'max_size': 8, 'timeout': 10})
+
+    def test_unknown_engine_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            load_settings(DB_ENGINE='oracle')
+
+    def test_sqlite_connections_wait_for_the_write_lock(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+    def test_deploy_check_warns_about_an_implicit_sqlite(self):
+        with override_settings(DEBUG=False, DB_ENGINE='sqlite', DB_ENGINE_EXPLICIT=False):
+            self.assertEqual([w.id for w in sqlite.check_database_engine(None)], ['orders.W001'])
+        with override_settings(DEBUG=False, DB_ENGINE='sqlite', DB_ENGINE_EXPLICIT=True):
+            self.assertEqual(sqlite.check_database_engine(None), [])
+        with override_settings(DEBUG=True, DB_ENGINE='sqlite', DB_ENGINE_EXPLICIT=False):
+            self.assertEqual(sqlite.check_database_engine(None), [])
+
+
+class SqliteTuningTests(TestCase):
+    def pragmas(self, db):
+        with db.cursor() as cursor:
+            return {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('mmap_size', 'cache_size', 'temp_store')
+            }
+
+    def fresh_connection(self):
+        """A new connection to a scratch database, outside the test's transaction"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db = connection.copy()
+        db.settings_dict = {**db.settings_dict, 'NAME': os.path.join(directory.name, 'db.sqlite3')}
+        self.addCleanup(db.close)
+        return db
+
+    def test_tuned_connections_get_the_pragmas(self):
+        with override_settings(SQLITE_TUNED=True, SQLITE_CACHE_SIZE=1024):
+            tuned = self.pragmas(self.fresh_connection())
+        self.assertEqual(
+            (tuned['mmap_size'], tuned['cache_size'], tuned['temp_store']), (sqlite.DEFAULT_MMAP_SIZE, -1024, 2),
+        )
+
+        plain = self.pragmas(self.fresh_connection())
+        self.assertNotEqual(plain['cache_size'], -1024)
+        self.assertEqual(plain['temp_store'], 0)
+
+    @override_settings(SQLITE_TUNED=True)
+    def test_optimize_runs_once_per_interval(self):
+        connection.ensure_connection()
+        self.addCleanup(vars(connection).pop, 'sqlite_optimize_at', None)
+        connection.sqlite_optimize_at = time.monotonic() - 1
+        with mock.patch.object(connection, 'connection', wraps=connection.connection) as raw:
+            sqlite.optimize_if_due(None)
+            sqlite.optimize_if_due(None)
+        self.assertEqual(raw.execute.call_args_list, [mock.call('PRAGMA optimize')])
+        self.assertGreater(connection.sqlite_optimize_at, time.monotonic())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LinePricingMigrationTests(TransactionTestCase):
+    before = ('orders', '0002_dailytokencounter')
+    after = ('orders', '0003_orderitem_line_pricing')
+
+    def migrate(self, target):
+        """Move orders to ``target`` and every other app to its latest migration"""
+        executor = MigrationExecutor(connection)
+        targets = [node for node in executor.loader.graph.leaf_nodes() if node[0] != 'orders'] + [target]
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_existing_lines_are_priced(self):
+        apps = self.migrate(self.before)
+        store = apps.get_model('authentication', 'Store').objects.create(
+            name='Cafe', store_code='CAFE1', owner_name='Owner', business_type='cafe',
+        )
+        category = apps.get_model('inventory', 'FoodCategory').objects.create(store=store, name='Drinks')
+        gst = apps.get_model('inventory', 'Tax').objects.create(store=store, tax_name='GST', tax_percentage=Decimal('5.00'))
+        cess = apps.get_model('inventory', 'Tax').objects.create(store=store, tax_name='CESS', tax_percentage=Decimal('2.50'))
+        shot = apps.get_model('inventory', 'Modifiers').objects.create(store=store, name='Extra shot', price=1.5)
+        latte = apps.get_model('inventory', 'Menu').objects.create(
+            store=store, category=category, name='Latte', portion='Small', diet='Veg', price=Decimal('10.30'),
+        )
+        order = apps.get_model('orders', 'Order').objects.create(store=store, order_method='Takeaway', token=1)
+        OrderItem = apps.get_model('orders', 'OrderItem')
+        plain = OrderItem.objects.create(order=order, menu_item=latte, quantity=1, price=latte.price)
+        plain.tax.set([gst, cess])
+        extra = OrderItem.objects.create(order=order, menu_item=latte, quantity=3, price=latte.price)
+        extra.add_ons.set([shot])
+        extra.tax.set([gst])
+
+        OrderItem = self.migrate(self.after).get_model('orders', 'OrderItem')
+        self.assertEqual(
+            list(OrderItem.objects.order_by('id').values_list('addon_total', 'line_subtotal', 'line_tax', 'line_total')),
+            [
+                (Decimal('0.00'), Decimal('10.30'), Decimal('0.77'), Decimal('11.07')),
+                # (10.30 + 1.50) * 3 = 35.40, 5% is 1.77
+                (Decimal('1.50'), Decimal('35.40'), Decimal('1.77'), Decimal('37.17')),
+            ],
+        )
@@ -0,0 +1,163 @@
+"""
+Order totals engine.
+
+OrderItem signals report which lines and orders changed instead of recomputing
+them on the spot. Outside a batch the change is applied straight away; inside
+``batch()`` the changed lines and orders are collected and written once, when
+the outermost batch exits.
+
+Each line stores its own addon_total, line_subtotal, line_tax and line_total,
+so order totals (and every reader) are plain sums over those columns.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+_local = threading.local()
+
+# OrderItem fields that affect money; saves touching none of them are ignored
+PRICED_FIELDS = frozenset({'price', 'quantity', 'is_saved_for_later', 'order'})
+
+LINE_FIELDS = ['addon_total', 'line_subtotal', 'line_tax', 'line_total']
+
+
+class _Pending:
+    def __init__(self):
+        self.items = defaultdict(list)
+        self.orders = defaultdict(list)
+
+
+def _remember(bucket, key, obj):
+    instances = bucket[key]
+    if obj is not None and not any(existing is obj for existing in instances):
+        instances.append(obj)
+
+
+def _pending():
+    return getattr(_local, 'pending', None)
+
+
+@contextmanager
+def batch():
+    """
+    Collect line and totals updates for the duration of the block.
+
+    Nested batches join the outermost one. Nothing is written if the block
+    raises, since the surrounding transaction is being rolled back anyway.
+    """
+    if _pending() is not None:
+        yield
+        return
+
+    _local.pending = _Pending()
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    refresh(pending.items, pending.orders)
+
+
+def order_changed(order_id, order=None):
+    """Mark an order's totals as stale, passing the in-memory order if there is one"""
+    if not order_id:
+        return
+
+    pending = _pending()
+    if pending is None:
+        refresh({}, {order_id: [order] if order is not None else []})
+        return
+    _remember(pending.orders, order_id, order)
+
+
+def item_changed(item, order=None):
+    """Mark a line's pricing (and therefore its order's totals) as stale"""
+    pending = _pending()
+    if pending is None:
+        refresh({item.pk: [item]}, {item.order_id: [order] if order is not None else []})
+        return
+    _remember(pending.items, item.pk, item)
+    _remember(pending.orders, item.order_id, order)
+
+
+def compute_totals(order_ids):
+    """
+    Return {order_id: (total_before_tax, total_tax)} for the given orders.
+
+    Only items in checkout are counted. One grouped query over the stored
+    line columns.
+    """
+    from .models import OrderItem
+
+    order_ids = list(order_ids)
+    totals = {order_id: (Decimal('0.00'), Decimal('0.00')) for order_id in order_ids}
+    if not order_ids:
+        return totals
+
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids, is_saved_for_later=False)
+        .order_by()
+        .values('order_id')
+        .annotate(subtotal=Sum('line_subtotal'), tax=Sum('line_tax'))
+    )
+    for row in rows:
+        totals[row['order_id']] = (row['subtotal'] or Decimal('0.00'), row['tax'] or Decimal('0.00'))
+    return totals
+
+
+def refresh(items, orders):
+    """
+    Reprice {item_id: [in-memory items]} and re-total {order_id: [in-memory orders]}.
+
+    Lines are written with one bulk UPDATE and each order with one UPDATE of its
+    three totals columns. In-memory instances are updated to match so callers
+    can read them without a refetch.
+    """
+    from . import rollups
+    from .models import Order, OrderItem
+    from .pricing import price_items
+
+    # update()/bulk_update() bypass auto_now, so updated_at is set explicitly
+    now = timezone.now()
+
+    # What checked-out orders and their lines count for in the sales rollups
+    # until now, read before either is rewritten
+    sold = rollups.sold_orders(orders)
+    sold_lines = rollups.sold_lines(sold, items.keys())
+
+    lines = {}
+    if items:
+        lines = price_items(OrderItem.objects.filter(pk__in=list(items))).lines()
+        OrderItem.objects.bulk_update(
+            [OrderItem(pk=item_id, updated_at=now, **values) for item_id, values in lines.items()],
+            LINE_FIELDS + ['updated_at'],
+        )
+        for item_id, values in lines.items():
+            for item in items[item_id]:
+                for field, value in values.items():
+                    setattr(item, field, value)
+                rollups.remember(item, values)
+
+    if not orders:
+        return
+
+    order_totals = compute_totals(orders.keys())
+    for order_id, (total_before_tax, total_tax) in order_totals.items():
+        values = {
+            'total_before_tax': total_before_tax,
+            'total_tax': total_tax,
+            'total_price': total_before_tax + total_tax,
+            'updated_at': now,
+        }
+        Order.objects.filter(pk=order_id).update(**values)
+        for order in orders[order_id]:
+            for field, value in values.items():
+                setattr(order, field, value)
+            rollups.remember(order, values)
+
+    # Re-totalled orders that are already checked out move their day's sales
+    rollups.totals_refreshed(sold, sold_lines, lines, order_totals)
@@ -13,6 +13,8 @@ urlpatterns = [
     path('<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
     path('statistics/', views.order_statistics, name='order-statistics'),
     path('kitchen-display/', views.kitchen_display, name='kitchen-display'),
+    path('events/', views.order_event_stream, name='order-events'),
+    path('events/ticket/', views.order_event_ticket, name='order-events-ticket'),
     
     # Order Items Management
     path('<int:order_id>/manage-items/', views.manage_order_items, name='manage-order-items'),
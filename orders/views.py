@@ -1,17 +1,31 @@
 from rest_framework import status, generics, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.db import models
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
 from decimal import Decimal
+import uuid
 
+from authentication import context as store_context
+from authentication.models import CustomUser
+from authentication.claims import StoreClaimsAuthentication
 from .models import Order, OrderItem, Tables, Checkout, SavedItems
+from . import delta, events, totals
+from .pricing import price_items
 from inventory.models import Tax, ModifierOptions, Modifiers
+from dashboard.exports import CHUNK_SIZE, csv_response
 from .serializers import (
     OrderCreateSerializer, OrderReadSerializer, OrderUpdateSerializer,
     CheckoutSerializer, TableSerializer, ItemMoveSerializer, OrderItemCreateSerializer, OrderItemReadSerializer, OrderItemTaxModifierSerializer, BulkOrderItemTaxModifierSerializer
@@ -24,11 +38,11 @@ class IsStoreUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return (
             request.user.is_authenticated and 
-            request.user.store_memberships.filter(is_active=True).exists()
+            bool(request.store_ctx.store_ids)
         )
     
     def has_object_permission(self, request, view, obj):
-        user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = request.store_ctx.store_ids
         return obj.store_id in user_stores
 
 
@@ -80,19 +94,45 @@ class OrderCreateView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
+        events.publish_order_event(order, events.ORDER_CREATED)
         
         # Return the created order with full details
         response_serializer = OrderReadSerializer(order)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
+def _day_lookups(request, value):
+    """create_date filter kwargs for a ?date=YYYY-MM-DD, taken in the current store's timezone"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({'date': 'Use the YYYY-MM-DD format'})
+    return request.store_ctx.store.date_lookups('create_date', day)
+
+
+def _branch_id(value):
+    """A ?branch= value as a branch id"""
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValidationError({'branch': 'Not a valid branch id'})
+
+
+ORDER_CSV_COLUMNS = [
+    'id', 'token', 'create_date', 'store', 'branch', 'order_method', 'table', 'status',
+    'checkout_status', 'payment_status', 'payment_method', 'total_before_tax', 'total_tax', 'total_price',
+]
+
+
 class OrderListView(generics.ListAPIView):
     """List orders for the user's store"""
     serializer_class = OrderReadSerializer
     permission_classes = [IsAuthenticated, IsStoreUser]
     
     def get_queryset(self):
-        user_stores = self.request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = self.request.store_ctx.store_ids
         queryset = Order.objects.filter(store_id__in=user_stores).select_related(
             'table', 'user', 'store'
         ).prefetch_related('items__menu_item', 'items__add_ons', 'items__tax')
@@ -110,7 +150,12 @@ class OrderListView(generics.ListAPIView):
         # Filter by date
         date_filter = self.request.query_params.get('date')
         if date_filter:
-            queryset = queryset.filter(create_date__date=date_filter)
+            queryset = queryset.filter(**_day_lookups(self.request, date_filter))
+        
+        # Filter by branch
+        branch_filter = self.request.query_params.get('branch')
+        if branch_filter:
+            queryset = queryset.filter(branch_id=_branch_id(branch_filter))
         
         # Filter by checkout status
         checkout_filter = self.request.query_params.get('checkout_status')
@@ -129,13 +174,36 @@ class OrderListView(generics.ListAPIView):
             openapi.Parameter('status', openapi.IN_QUERY, description="Filter by order status", type=openapi.TYPE_STRING),
             openapi.Parameter('order_method', openapi.IN_QUERY, description="Filter by order method", type=openapi.TYPE_STRING),
             openapi.Parameter('date', openapi.IN_QUERY, description="Filter by date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('branch', openapi.IN_QUERY, description="Filter by branch id", type=openapi.TYPE_STRING),
             openapi.Parameter('checkout_status', openapi.IN_QUERY, description="Filter by checkout status", type=openapi.TYPE_BOOLEAN),
             openapi.Parameter('has_saved_items', openapi.IN_QUERY, description="Filter orders with saved items", type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('export', openapi.IN_QUERY, description="'csv' streams every matching order as CSV instead of a JSON page", type=openapi.TYPE_STRING),
         ]
     )
     def get(self, request, *args, **kwargs):
+        if request.query_params.get('export') == 'csv':
+            return self.export_csv()
         return super().get(request, *args, **kwargs)
 
+    def export_csv(self):
+        """Stream the filtered orders as CSV, one row per order"""
+        store = self.request.store_ctx.store
+        tz = store.tzinfo if store is not None else timezone.get_current_timezone()
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values_list(
+            'id', 'token', 'create_date', 'store__name', 'branch__name', 'order_method',
+            'table__Table_number', 'status', 'checkout_status', 'payment_status', 'payment_method',
+            'total_before_tax', 'total_tax', 'total_price',
+        ).iterator(chunk_size=CHUNK_SIZE)
+        return csv_response(
+            f"orders_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            ORDER_CSV_COLUMNS,
+            ([*row[:2], timezone.localtime(row[2], tz).isoformat(), *row[3:]] for row in rows),
+        )
+
+
+# Order fields that move it along (or off) the kitchen display
+KITCHEN_STATUS_FIELDS = ('status', 'take_order', 'completion_status', 'checkout_status')
+
 
 class OrderDetailView(generics.RetrieveUpdateAPIView):
     """Retrieve or update a specific order"""
@@ -143,7 +211,7 @@ class OrderDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated, IsStoreUser]
     
     def get_queryset(self):
-        user_stores = self.request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = self.request.store_ctx.store_ids
         return Order.objects.filter(store_id__in=user_stores).select_related(
             'table', 'user', 'store'
         ).prefetch_related('items__menu_item', 'items__add_ons', 'items__tax')
@@ -160,9 +228,13 @@ class OrderDetailView(generics.RetrieveUpdateAPIView):
     )
     def patch(self, request, *args, **kwargs):
         order = self.get_object()
+        previous = [getattr(order, field) for field in KITCHEN_STATUS_FIELDS]
         serializer = OrderUpdateSerializer(order, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        # Payment-only updates don't change what the kitchen display shows
+        if previous != [getattr(order, field) for field in KITCHEN_STATUS_FIELDS]:
+            events.publish_order_event(order, events.STATUS_CHANGED)
         
         # Return updated order with full details
         response_serializer = OrderReadSerializer(order)
@@ -183,7 +255,7 @@ class OrderDetailView(generics.RetrieveUpdateAPIView):
 @permission_classes([IsAuthenticated, IsStoreUser])
 def manage_order_items(request, order_id):
     """Move items between saved and checkout states"""
-    user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+    user_stores = request.store_ctx.store_ids
     
     try:
         order = Order.objects.get(id=order_id, store_id__in=user_stores)
@@ -207,19 +279,18 @@ def manage_order_items(request, order_id):
     
     with transaction.atomic():
         moved_items = []
-        for item in items:
-            if action == 'move_to_checkout':
-                if item.is_saved_for_later:
-                    item.move_to_checkout()
-                    moved_items.append(item.id)
-            elif action == 'save_for_later':
-                if not item.is_saved_for_later:
-                    item.save_for_later()
-                    moved_items.append(item.id)
-        
-        # Recalculate order totals
-        order.calculate_totals()
-        order.save()
+        # Order totals are recalculated once when the batch exits
+        with totals.batch():
+            for item in items:
+                item.order = order
+                if action == 'move_to_checkout':
+                    if item.is_saved_for_later:
+                        item.move_to_checkout()
+                        moved_items.append(item.id)
+                elif action == 'save_for_later':
+                    if not item.is_saved_for_later:
+                        item.save_for_later()
+                        moved_items.append(item.id)
         
         # Create saved items log if items were saved
         if action == 'save_for_later' and moved_items:
@@ -234,6 +305,9 @@ def manage_order_items(request, order_id):
                 total_saved_amount=total_saved,
                 notes=f"Items moved to saved list by {request.user.get_full_name()}"
             )
+        
+        if moved_items:
+            events.publish_order_event(order, events.ITEM_UPDATED, item_ids=moved_items)
     
     return Response({
         'message': f'{len(moved_items)} items {action.replace("_", " ")} successfully',
@@ -251,7 +325,7 @@ class OrderItemUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated, IsStoreUser]
     
     def get_queryset(self):
-        user_stores = self.request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+        user_stores = self.request.store_ctx.store_ids
         return OrderItem.objects.filter(order__store_id__in=user_stores)
     
     @swagger_auto_schema(
@@ -269,7 +343,7 @@ class OrderItemUpdateView(generics.UpdateAPIView):
         
         if completion_status is not None:
             order_item.completion_status = completion_status
-            order_item.save()
+            order_item.save(update_fields=['completion_status', 'updated_at'])
             
             # Check if all checkout items are completed to update order status
             order = order_item.order
@@ -278,7 +352,9 @@ class OrderItemUpdateView(generics.UpdateAPIView):
             
             if all_completed and checkout_items.exists() and order.status != "Order Ready":
                 order.status = "Order Ready"
-                order.save()
+                order.save(update_fields=['status', 'updated_at'])
+            
+            events.publish_order_event(order, events.ITEM_UPDATED, item_id=order_item.id)
         
         return Response({'message': 'Order item updated successfully'})
 
@@ -312,12 +388,14 @@ def save_ticket(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+    user_stores = request.store_ctx.store_ids
     
     try:
         order = Order.objects.get(id=order_id, store_id__in=user_stores)
         order.take_order = True
         order.save()
+        # take_order is what puts the ticket on the kitchen display
+        events.publish_order_event(order, events.STATUS_CHANGED)
         
         # Create saved items log
         saved_items_count = order.items.filter(is_saved_for_later=True).count()
@@ -386,6 +464,12 @@ class CheckoutCreateView(generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        # The checkout, the order and its day's sales rollup commit together
+        with transaction.atomic():
+            checkout = serializer.save()
+        events.publish_order_event(checkout.order, events.CHECKED_OUT)
+
 
 @swagger_auto_schema(
     method='get',
@@ -431,49 +515,40 @@ class CheckoutCreateView(generics.CreateAPIView):
 @permission_classes([IsAuthenticated, IsStoreUser])
 def get_receipt(request, order_id):
     """Get receipt data for an order (only shows checkout items)"""
-    user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+    user_stores = request.store_ctx.store_ids
     
     try:
         order = Order.objects.select_related(
             'store', 'table', 'user'
         ).prefetch_related(
-            'items__menu_item', 'items__add_ons', 'items__tax'
+            'items__menu_item', 'items__add_ons'
         ).get(id=order_id, store_id__in=user_stores)
         
-        # Get checkout items only
-        checkout_items = order.items.filter(is_saved_for_later=False)
-        saved_items = order.items.filter(is_saved_for_later=True)
+        # Get checkout items only (split in memory so the prefetch is used)
+        order_items = list(order.items.all())
+        checkout_items = [item for item in order_items if not item.is_saved_for_later]
+        saved_items = [item for item in order_items if item.is_saved_for_later]
+        
+        # Per-tax amounts for every line in one pass
+        priced = price_items(order.items.all())
         
         # Prepare receipt items (only checkout items)
         receipt_checkout_items = []
         for item in checkout_items:
-            addon_total = sum(addon.price for addon in item.add_ons.all())
-            item_total = (item.price + addon_total) * item.quantity
-            
-            tax_details = []
-            for tax in item.tax.all():
-                tax_amount = (item_total * tax.tax_percentage) / 100
-                tax_details.append({
-                    'name': tax.tax_name,
-                    'percentage': float(tax.tax_percentage),
-                    'amount': float(tax_amount)
-                })
-            
             receipt_checkout_items.append({
                 'name': item.menu_item.name,
                 'quantity': item.quantity,
                 'unit_price': float(item.price),
                 'add_ons': [{'name': addon.name, 'price': float(addon.price)} for addon in item.add_ons.all()],
-                'item_total': float(item_total),
-                'taxes': tax_details,
+                'item_total': float(item.line_subtotal),
+                'taxes': priced.item_taxes(item.id),
                 'special_instructions': item.special_instructions
             })
         
         # Prepare saved items info (for reference only, not in receipt)
         receipt_saved_items = []
         for item in saved_items:
-            addon_total = sum(addon.price for addon in item.add_ons.all())
-            item_total = (item.price + addon_total) * item.quantity
+            item_total = item.line_subtotal
             
             receipt_saved_items.append({
                 'name': item.menu_item.name,
@@ -533,7 +608,7 @@ def get_receipt(request, order_id):
             'payment_method': order.payment_method,
             'payment_status': order.payment_status,
             'payment_details': payment_details,
-            'has_saved_items': saved_items.exists(),
+            'has_saved_items': bool(saved_items),
         }
         
         return Response(receipt_data)
@@ -545,18 +620,8 @@ def get_receipt(request, order_id):
         )
 
 
-@swagger_auto_schema(
-    method='get',
-    operation_description="Get kitchen display orders (orders that are not completed)",
-    responses={200: OrderReadSerializer(many=True)}
-)
-@api_view(['GET'])
-@permission_classes([IsAuthenticated, IsStoreUser])
-def kitchen_display(request):
-    """Get orders for kitchen display (only checkout items)"""
-    user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
-    
-    orders = Order.objects.filter(
+def _kitchen_queue(user_stores):
+    return Order.objects.filter(
         store_id__in=user_stores,
         status__in=['Pending', 'In Progress', 'In Kitchen'],
         take_order=True,
@@ -566,9 +631,142 @@ def kitchen_display(request):
     ).prefetch_related(
         'items__menu_item', 'items__add_ons', 'items__tax'
     ).order_by('create_date')
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description=(
+        "Get kitchen display orders (orders that are not completed). "
+        "The response carries an X-Cursor header; pass it back as ?since= to get "
+        "only the orders changed since then plus the ids of orders that left the queue."
+    ),
+    manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, description="Cursor from a previous response", type=openapi.TYPE_STRING),
+    ],
+    responses={200: OrderReadSerializer(many=True)}
+)
+@api_view(['GET'])
+@authentication_classes([StoreClaimsAuthentication])
+@permission_classes([IsAuthenticated, IsStoreUser])
+def kitchen_display(request):
+    """Get orders for kitchen display (only checkout items)"""
+    user_stores = request.store_ctx.store_ids
+    cursor = delta.make_cursor()
     
-    serializer = OrderReadSerializer(orders, many=True)
-    return Response(serializer.data)
+    since = request.query_params.get('since')
+    if not since:
+        serializer = OrderReadSerializer(_kitchen_queue(user_stores), many=True)
+        response = Response(serializer.data)
+        response[delta.CURSOR_HEADER] = cursor
+        return response
+    
+    try:
+        since = delta.parse_cursor(since)
+    except delta.InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    changed_ids = delta.changed_order_ids(Order.objects.filter(store_id__in=user_stores), since)
+    orders = OrderReadSerializer(_kitchen_queue(user_stores).filter(id__in=changed_ids), many=True).data
+    
+    response = Response({
+        'cursor': cursor,
+        'orders': orders,
+        # Changed orders that are no longer on the queue
+        'removed': sorted(changed_ids - {order['id'] for order in orders}),
+        'deleted': delta.deleted_order_ids(user_stores, since),
+    })
+    response[delta.CURSOR_HEADER] = cursor
+    return response
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="Issue a single-use ticket for opening the order event stream (GET /orders/events/?ticket=...)",
+    responses={
+        201: openapi.Response(
+            description="Stream ticket",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'ticket': openapi.Schema(type=openapi.TYPE_STRING),
+                    'expires_in': openapi.Schema(type=openapi.TYPE_INTEGER),
+                }
+            )
+        )
+    }
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsStoreUser])
+def order_event_ticket(request):
+    """Issue a stream ticket, since EventSource can't send the JWT as a header"""
+    return Response(
+        {'ticket': events.issue_ticket(request.user), 'expires_in': events.STREAM_TICKET_TTL},
+        status=status.HTTP_201_CREATED,
+    )
+
+
+def _stream_user(request):
+    """Authenticate an event stream request by JWT header or single-use ?ticket="""
+    ticket = request.GET.get('ticket')
+    if ticket:
+        user_id = events.redeem_ticket(ticket)
+        return CustomUser.objects.filter(pk=user_id).first() if user_id is not None else None
+
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if not raw_token:
+        return None
+
+    try:
+        validated_token = authenticator.get_validated_token(raw_token)
+        return authenticator.get_user(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _stream_store_ids(user):
+    return [
+        str(store_id)
+        for store_id in store_context.for_user(user).store_ids
+    ]
+
+
+async def order_event_stream(request):
+    """
+    Server-sent event stream of order changes for the user's stores.
+
+    Replaces polling kitchen_display: screens load the queue once, then apply
+    order.created / item / status / checked_out events as they arrive.
+    Needs an ASGI server (coffybyte.asgi) to hold connections open; under
+    WSGI each stream would pin a worker thread for good, so it is refused
+    with 503 and screens keep polling. Browsers open it with a ticket from
+    order_event_ticket; other clients may send the JWT as an Authorization
+    header.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'The order event stream needs the ASGI server (coffybyte.asgi); poll kitchen-display instead'},
+            status=503,
+        )
+
+    user = await sync_to_async(_stream_user)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'error': 'Authentication credentials were not provided or are invalid'}, status=401)
+
+    store_ids = await sync_to_async(_stream_store_ids)(user)
+    if not store_ids:
+        return JsonResponse({'error': 'User is not associated with any active store'}, status=403)
+
+    response = StreamingHttpResponse(events.stream_events(store_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @swagger_auto_schema(
@@ -595,18 +793,31 @@ def kitchen_display(request):
 @permission_classes([IsAuthenticated, IsStoreUser])
 def order_statistics(request):
     """Get order statistics for dashboard"""
-    user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
-    today = timezone.now().date()
+    user_stores = request.store_ctx.store_ids
+    if not user_stores:
+        return Response(
+            {'error': 'User is not associated with any active store'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # "Today" is each store's own business day, in its own timezone
+    today = models.Q(pk__in=[])
+    for membership in request.store_ctx.memberships:
+        store = membership.store
+        today |= models.Q(store_id=store.pk, **store.date_lookups('create_date', store.business_date()))
     
     orders = Order.objects.filter(store_id__in=user_stores)
+    branch_filter = request.query_params.get('branch')
+    if branch_filter:
+        orders = orders.filter(branch_id=_branch_id(branch_filter))
     
     stats = {
-        'today_orders': orders.filter(create_date__date=today).count(),
+        'today_orders': orders.filter(today).count(),
         'pending_orders': orders.filter(status__in=['Pending', 'In Progress', 'In Kitchen']).count(),
-        'completed_orders': orders.filter(status='Completed', create_date__date=today).count(),
+        'completed_orders': orders.filter(today, status='Completed').count(),
         'today_revenue': float(
             orders.filter(
-                create_date__date=today, 
+                today,
                 payment_status='Paid'
             ).aggregate(total=models.Sum('total_price'))['total'] or 0
         ),
@@ -629,7 +840,7 @@ def order_statistics(request):
 @permission_classes([IsAuthenticated, IsStoreUser])
 def saved_items_list(request):
     """Get all orders that have saved items"""
-    user_stores = request.user.store_memberships.filter(is_active=True).values_list('store_id', flat=True)
+    user_stores = request.store_ctx.store_ids
     
     orders = Order.objects.filter(
         store_id__in=user_stores,
@@ -643,7 +854,7 @@ def saved_items_list(request):
     # Filter by date if provided
     date_filter = request.query_params.get('date')
     if date_filter:
-        orders = orders.filter(create_date__date=date_filter)
+        orders = orders.filter(**_day_lookups(request, date_filter))
     
     serializer = OrderReadSerializer(orders, many=True)
     return Response(serializer.data)
@@ -668,7 +879,7 @@ def add_taxes_modifiers_to_item(request, item_id):
         order_item = get_object_or_404(
             OrderItem, 
             id=item_id,
-            order__store=request.user_store
+            order__store=request.store_ctx.store
         )
         
         # Check if order is already checked out
@@ -719,43 +930,41 @@ def bulk_add_taxes_modifiers(request):
                 # Get order items
                 order_items = OrderItem.objects.filter(
                     id__in=order_item_ids,
-                    order__store=request.user_store
+                    order__store=request.store_ctx.store
                 )
                 
                 # Get taxes and modifiers
-                taxes = Tax.objects.filter(id__in=tax_ids, store=request.user_store) if tax_ids else []
-                modifiers = Modifiers.objects.filter(id__in=modifier_ids, store=request.user_store) if modifier_ids else []
+                taxes = Tax.objects.filter(id__in=tax_ids, store=request.store_ctx.store) if tax_ids else []
+                modifiers = Modifiers.objects.filter(id__in=modifier_ids, store=request.store_ctx.store) if modifier_ids else []
                 
                 updated_items = []
                 
-                for item in order_items:
-                    # Check if item can be modified
-                    if item.order.checkout_status and not item.is_saved_for_later:
-                        continue
-                    
-                    # Handle taxes
-                    if tax_ids is not None:
-                        if action == 'add':
-                            item.tax.add(*taxes)
-                        elif action == 'replace':
-                            item.tax.set(taxes)
-                        elif action == 'remove':
-                            item.tax.remove(*taxes)
-                    
-                    # Handle modifiers
-                    if modifier_ids is not None:
-                        if action == 'add':
-                            item.add_ons.add(*modifiers)
-                        elif action == 'replace':
-                            item.add_ons.set(modifiers)
-                        elif action == 'remove':
-                            item.add_ons.remove(*modifiers)
-                    
-                    updated_items.append(item)
-                    
-                    # Recalculate order totals
-                    item.order.calculate_totals()
-                    item.order.save()
+                # Each touched order is recalculated once when the batch exits
+                with totals.batch():
+                    for item in order_items.select_related('order'):
+                        # Check if item can be modified
+                        if item.order.checkout_status and not item.is_saved_for_later:
+                            continue
+                        
+                        # Handle taxes
+                        if tax_ids is not None:
+                            if action == 'add':
+                                item.tax.add(*taxes)
+                            elif action == 'replace':
+                                item.tax.set(taxes)
+                            elif action == 'remove':
+                                item.tax.remove(*taxes)
+                        
+                        # Handle modifiers
+                        if modifier_ids is not None:
+                            if action == 'add':
+                                item.add_ons.add(*modifiers)
+                            elif action == 'replace':
+                                item.add_ons.set(modifiers)
+                            elif action == 'remove':
+                                item.add_ons.remove(*modifiers)
+                        
+                        updated_items.append(item)
                 
                 # Return updated items
                 response_data = OrderItemTaxModifierSerializer(updated_items, many=True).data
@@ -781,7 +990,7 @@ def remove_taxes_modifiers_from_item(request, item_id):
         order_item = get_object_or_404(
             OrderItem,
             id=item_id,
-            order__store=request.user_store
+            order__store=request.store_ctx.store
         )
         
         if order_item.order.checkout_status and not order_item.is_saved_for_later:
@@ -793,12 +1002,12 @@ def remove_taxes_modifiers_from_item(request, item_id):
         tax_ids = request.data.get('tax_ids', [])
         modifier_ids = request.data.get('modifier_ids', [])
         
-        with transaction.atomic():
+        with transaction.atomic(), totals.batch():
             # Remove specific taxes
             if tax_ids:
                 taxes_to_remove = Tax.objects.filter(
                     id__in=tax_ids,
-                    store=request.user_store
+                    store=request.store_ctx.store
                 )
                 order_item.tax.remove(*taxes_to_remove)
             
@@ -806,13 +1015,9 @@ def remove_taxes_modifiers_from_item(request, item_id):
             if modifier_ids:
                 modifiers_to_remove = Modifiers.objects.filter(
                     id__in=modifier_ids,
-                    store=request.user_store
+                    store=request.store_ctx.store
                 )
                 order_item.add_ons.remove(*modifiers_to_remove)
-            
-            # Recalculate order totals
-            order_item.order.calculate_totals()
-            order_item.order.save()
         
         # Return updated item
         serializer = OrderItemTaxModifierSerializer(order_item)
@@ -833,7 +1038,7 @@ def clear_all_taxes_modifiers_from_item(request, item_id):
         order_item = get_object_or_404(
             OrderItem,
             id=item_id,
-            order__store=request.user_store
+            order__store=request.store_ctx.store
         )
         
         if order_item.order.checkout_status and not order_item.is_saved_for_later:
@@ -842,14 +1047,10 @@ def clear_all_taxes_modifiers_from_item(request, item_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        with transaction.atomic():
+        with transaction.atomic(), totals.batch():
             # Clear all taxes and modifiers
             order_item.tax.clear()
             order_item.add_ons.clear()
-            
-            # Recalculate order totals
-            order_item.order.calculate_totals()
-            order_item.order.save()
         
         return Response(
             {'message': 'All taxes and modifiers cleared successfully'},